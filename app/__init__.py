@@ -2,12 +2,23 @@
 谐波减速机测试系统 Flask 应用
 """
 import os
+import atexit
 from flask import Flask, request
 from flask_cors import CORS
 import logging
 
 from app.config import Config
-from app.utils.database import init_db
+from app.utils.database import init_db, get_pool_stats
+from app.utils.query_stats import configure_query_stats, get_query_stats
+from app.utils.http_session import configure_http_client, get_http_client, close_http_client
+from app.services.ingest_writer import start_ingest_writer, stop_ingest_writer, get_ingest_writer
+from app.services.command_dispatcher import (
+    start_command_dispatcher, stop_command_dispatcher, get_command_dispatcher, get_command_tracker
+)
+from app.services.priority_lane import start_priority_lane, stop_priority_lane, get_priority_lane
+from app.services.retention_service import create_retention_engine, start_retention_engine, stop_retention_engine
+from app.services.node_red_poller import start_node_red_poller, stop_node_red_poller, get_node_red_poller
+from app.services.config_store import init_config_store, start_config_watcher, stop_config_watcher
 
 
 def create_app(config_class=Config):
@@ -24,12 +35,14 @@ def create_app(config_class=Config):
     from app.api.export import bp as export_bp
     from app.api.settings import bp as settings_bp
     from app.api.motors import motors_bp
+    from app.api.stream import bp as stream_bp
     
     app.register_blueprint(data_bp)
     app.register_blueprint(command_bp)
     app.register_blueprint(export_bp)
     app.register_blueprint(settings_bp)
     app.register_blueprint(motors_bp)
+    app.register_blueprint(stream_bp)
     
     # 静态文件路由
     @app.route('/')
@@ -43,7 +56,10 @@ def create_app(config_class=Config):
     # 健康检查
     @app.route('/health')
     def health():
-        return {'status': 'ok', 'service': 'harmonic-reducer-test'}
+        from app.services.node_red_service import NodeRedService
+        circuit = NodeRedService.get_circuit_state()
+        status = 'ok' if circuit is None or circuit['state'] == 'closed' else 'degraded'
+        return {'status': status, 'service': 'harmonic-reducer-test', 'node_red': circuit}
     
     # 全局请求日志
     logger = logging.getLogger('request')
@@ -79,8 +95,121 @@ def create_app(config_class=Config):
             }
         return {'blueprints': blueprints, 'count': len(blueprints)}
     
+    # 调试路由 - 数据库连接池统计
+    @app.route('/debug/db/pool')
+    def debug_db_pool():
+        return {'pools': get_pool_stats()}
+    
+    # 调试路由 - SQL耗时统计（按总耗时排序的前N条语句与最近慢查询）
+    @app.route('/debug/db/queries', methods=['GET', 'DELETE'])
+    def debug_db_queries():
+        stats = get_query_stats()
+        if request.method == 'DELETE':
+            stats.reset()
+            return {'success': True}
+        top = max(1, min(request.args.get('top', 20, type=int), 500))
+        order_by = request.args.get('order', 'total_ms')
+        return {
+            'summary': stats.summary(),
+            'top': stats.top(top, order_by),
+            'slow_queries': stats.slow_queries()
+        }
+    
+    # 调试路由 - 共享HTTP会话按主机的连接复用统计
+    @app.route('/debug/http/pool')
+    def debug_http_pool():
+        return {'http': get_http_client().get_stats()}
+    
+    # 调试路由 - Node-RED 轮询线程与快照状态
+    @app.route('/debug/node-red/poller')
+    def debug_node_red_poller():
+        from app.api.stream import get_stream_client_count
+        from app.services.live_curve import get_live_curve_sampler
+        poller = get_node_red_poller()
+        return {
+            'poller': poller.get_stats() if poller else None,
+            'stream_clients': get_stream_client_count(),
+            'live_curve': get_live_curve_sampler(app).get_stats()
+        }
+    
+    # 调试路由 - Node-RED 采集请求合并统计
+    @app.route('/debug/node-red/fetch')
+    def debug_node_red_fetch():
+        from app.services.node_red_service import NodeRedService
+        stats = NodeRedService.get_fetch_stats()
+        profiles = stats.pop('profiles', {})
+        return {'single_flight': stats, 'profiles': profiles}
+    
+    # 调试路由 - 配置缓存状态
+    @app.route('/debug/config')
+    def debug_config():
+        from app.services.config_store import get_config_store
+        return {'config_store': get_config_store().get_stats()}
+    
+    # 调试路由 - 入库写线程统计
+    @app.route('/debug/db/writer')
+    def debug_db_writer():
+        writer = get_ingest_writer()
+        return {'writer': writer.get_stats() if writer else None}
+    
+    # 调试路由 - 异步命令调度、待处理命令与优先通道
+    @app.route('/debug/commands')
+    def debug_commands():
+        dispatcher = get_command_dispatcher()
+        return {
+            'dispatcher': dispatcher.get_stats() if dispatcher else None,
+            'tracker': get_command_tracker().get_stats(),
+            'priority_lane': get_priority_lane().get_stats()
+        }
+    
     # 初始化数据库
+    configure_query_stats(app.config)
+    configure_http_client(app.config)
+    atexit.register(close_http_client)
     with app.app_context():
         init_db()
     
-    return app
\ No newline at end of file
+    # 实时曲线采样线程按订阅启动，退出时统一停止
+    from app.services.live_curve import stop_live_curve_sampler
+    atexit.register(stop_live_curve_sampler)
+    
+    # 配置缓存：连接地址变化时通知 Node-RED 客户端，设置变化时递增数据版本
+    from app.services.node_red_service import NodeRedService
+    from app.utils import data_version
+    config_store = init_config_store(app)
+    config_store.subscribe(NodeRedService.on_config_changed)
+    config_store.subscribe(data_version.on_config_changed)
+    
+    # 启动后台服务
+    if _should_start_background(app):
+        start_config_watcher(app)
+        atexit.register(stop_config_watcher)
+        start_ingest_writer(app)
+        atexit.register(stop_ingest_writer)
+        with app.app_context():
+            from app.services.node_red_service import reserve_command_log_ids
+            reserve_command_log_ids()
+        # atexit 逆序执行：调度线程先于写线程停止，未发送命令的失败记录仍可进入写队列
+        start_command_dispatcher(app)
+        atexit.register(stop_command_dispatcher)
+        start_priority_lane(app)
+        atexit.register(stop_priority_lane)
+        start_retention_engine(app)
+        atexit.register(stop_retention_engine)
+        # 轮询线程最后启动、最先停止（atexit 逆序执行），停止前的最后一次入库仍可进入写队列
+        start_node_red_poller(app)
+        atexit.register(stop_node_red_poller)
+    else:
+        create_retention_engine(app)
+    
+    return app
+
+
+def _should_start_background(app):
+    """是否启动后台线程：测试环境不启动；调试重载模式下只在子进程中启动"""
+    if app.config.get('TESTING', False):
+        return False
+    if app.config.get('DEBUG', False) and os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+        # 重载器父进程只负责监控文件变化，不处理请求
+        return False
+    return True
\ No newline at end of file
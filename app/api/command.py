@@ -2,8 +2,12 @@
 命令相关API蓝图
 """
 import logging
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app.services.node_red_service import NodeRedService
+from app.services.priority_lane import get_priority_lane
+from app.services.command_dispatcher import (
+    run_command_batch, BATCH_MODES, submit_command, get_command_tracker
+)
 from app.utils.helpers import create_response, log_api_call, now_ms
 
 logger = logging.getLogger(__name__)
@@ -13,7 +17,11 @@ bp = Blueprint('command', __name__)
 
 @bp.route('/api/command/set/data', methods=['POST'])
 def send_command():
-    """发送命令到Node-RED"""
+    """
+    发送命令到Node-RED
+    请求体 async=true（或查询参数 async=1）时入队后立即返回 202 与日志ID，
+    通过 /api/command/status/<id> 查询或等待结果
+    """
     start_time = now_ms()
     
     try:
@@ -40,7 +48,17 @@ def send_command():
             return jsonify(error_response), status_code
         
         # 提取其他参数
-        params = {k: v for k, v in data.items() if k != 'command'}
+        async_mode = _is_true(data.get('async')) or _is_true(request.args.get('async'))
+        params = {k: v for k, v in data.items() if k not in ('command', 'async')}
+        
+        if async_mode:
+            return _send_command_async(command, params, data, start_time)
+        
+        lane = get_priority_lane()
+        if lane.is_priority(command):
+            # 安全命令：经优先通道立即发送，发送后再记录日志
+            result, _ = lane.send(command, params)
+            return _command_response(result, data, start_time)
         
         # 创建命令日志（pending），返回ID
         log_id = NodeRedService.create_command_log(command, params)
@@ -51,37 +69,125 @@ def send_command():
         # 完成命令日志（更新响应与状态）
         success = bool(result.get('success'))
         if log_id:
-            NodeRedService.complete_command_log(log_id, result, success)
+            NodeRedService.complete_command_log(log_id, result, success, command=command, params=params)
         else:
             # 兜底：旧方式记录最终状态
             NodeRedService.log_command(command, params, result, 'success' if success else 'failed')
         
-        # 记录API调用
-        duration = now_ms() - start_time
-        log_api_call('/api/command/set/data', 'POST', data, result, duration)
+        return _command_response(result, data, start_time)
         
-        if success:
-            response_data, status_code = create_response(
-                success=True,
-                data=result,
-                message="命令发送成功"
-            )
+    except Exception as e:
+        logger.error(f"发送命令失败: {e}")
+        error_response, status_code = create_response(
+            success=False,
+            error=str(e),
+            message="发送命令失败",
+            status_code=500
+        )
+        return jsonify(error_response), status_code
+
+
+def _command_response(result, data, start_time):
+    """同步发送命令的响应"""
+    # 记录API调用
+    duration = now_ms() - start_time
+    log_api_call('/api/command/set/data', 'POST', data, result, duration)
+    
+    if result.get('success'):
+        response_data, status_code = create_response(
+            success=True,
+            data=result,
+            message="命令发送成功"
+        )
+    else:
+        response_data, status_code = create_response(
+            success=False,
+            error=result.get('error', 'unknown_error'),
+            message=result.get('message', '命令发送失败'),
+            status_code=502
+        )
+    
+    return jsonify(response_data), status_code
+
+
+def _is_true(value) -> bool:
+    return value is True or str(value).lower() in ('1', 'true', 'yes')
+
+
+def _send_command_async(command, params, data, start_time):
+    """异步发送：入队后返回 202"""
+    entry = submit_command(command, params)
+    
+    duration = now_ms() - start_time
+    log_api_call('/api/command/set/data', 'POST', data, entry.to_dict() if entry else None, duration)
+    
+    if entry is None:
+        error_response, status_code = create_response(
+            success=False,
+            error='command_log_failed',
+            message="创建命令日志失败",
+            status_code=500
+        )
+        return jsonify(error_response), status_code
+    
+    if entry.result is not None and entry.result.get('error') == 'queue_full':
+        error_response, status_code = create_response(
+            success=False,
+            error='queue_full',
+            message=entry.result.get('message', '命令队列已满'),
+            status_code=503
+        )
+        return jsonify(error_response), status_code
+    
+    response_data, status_code = create_response(
+        success=True,
+        data={**entry.to_dict(), 'status_url': f"/api/command/status/{entry.log_id}"},
+        message="命令已受理",
+        status_code=202
+    )
+    return jsonify(response_data), status_code
+
+
+@bp.route('/api/command/status/<int:log_id>', methods=['GET'])
+def get_command_status(log_id):
+    """
+    查询命令状态
+    wait_ms>0 时在命令完成前最多等待该时长（长轮询），超时返回当前状态
+    """
+    start_time = now_ms()
+    
+    try:
+        wait_ms = max(0, min(request.args.get('wait_ms', 0, type=int), 30000))
+        tracker = get_command_tracker()
+        entry = tracker.wait(log_id, wait_ms / 1000.0) if wait_ms else tracker.get(log_id)
+        
+        if entry is not None:
+            status = entry.to_dict()
         else:
-            response_data, status_code = create_response(
+            # 已移出跟踪器的命令从命令日志中查询
+            status = NodeRedService.get_command_log(log_id)
+        
+        duration = now_ms() - start_time
+        log_api_call(f'/api/command/status/{log_id}', 'GET', {'wait_ms': wait_ms}, status, duration)
+        
+        if status is None:
+            error_response, status_code = create_response(
                 success=False,
-                error=result.get('error', 'unknown_error'),
-                message=result.get('message', '命令发送失败'),
-                status_code=502
+                error="命令不存在",
+                message=f"未找到命令: {log_id}",
+                status_code=404
             )
+            return jsonify(error_response), status_code
         
+        response_data, status_code = create_response(success=True, data=status)
         return jsonify(response_data), status_code
         
     except Exception as e:
-        logger.error(f"发送命令失败: {e}")
+        logger.error(f"查询命令状态失败: {e}")
         error_response, status_code = create_response(
             success=False,
             error=str(e),
-            message="发送命令失败",
+            message="查询命令状态失败",
             status_code=500
         )
         return jsonify(error_response), status_code
@@ -166,7 +272,11 @@ def test_node_red():
 
 @bp.route('/api/command/batch', methods=['POST'])
 def send_batch_commands():
-    """批量发送命令"""
+    """
+    批量发送命令
+    可选字段：mode（sequential/parallel/pipelined）、max_concurrency、deadline_ms；
+    命令中的 group 字段标记顺序组，同组命令按列表顺序执行
+    """
     start_time = now_ms()
     
     try:
@@ -191,28 +301,32 @@ def send_batch_commands():
             )
             return jsonify(error_response), status_code
         
-        results = []
-        success_count = 0
-        
-        # 逐个执行命令
-        for cmd_data in commands:
-            if not isinstance(cmd_data, dict) or 'command' not in cmd_data:
-                results.append({
-                    'success': False,
-                    'error': 'invalid_command_format',
-                    'message': '命令格式错误'
-                })
-                continue
-            
-            command = cmd_data['command']
-            params = {k: v for k, v in cmd_data.items() if k != 'command'}
-            
-            # 发送单个命令
-            result = NodeRedService.send_command_to_node_red(command, params)
-            results.append(result)
-            
-            if result.get('success'):
-                success_count += 1
+        mode = data.get('mode') or current_app.config.get('COMMAND_BATCH_DEFAULT_MODE', 'sequential')
+        limit = current_app.config.get('COMMAND_BATCH_MAX_CONCURRENCY', 8)
+        try:
+            max_concurrency = max(1, min(int(data.get('max_concurrency') or limit), limit))
+            deadline_ms = int(data['deadline_ms']) if data.get('deadline_ms') else None
+        except (TypeError, ValueError):
+            error_response, status_code = create_response(
+                success=False,
+                error="max_concurrency与deadline_ms必须是整数",
+                message="请求数据格式错误",
+                status_code=400
+            )
+            return jsonify(error_response), status_code
+        if mode not in BATCH_MODES:
+            error_response, status_code = create_response(
+                success=False,
+                error=f"mode必须是 {', '.join(BATCH_MODES)} 之一",
+                message="请求数据格式错误",
+                status_code=400
+            )
+            return jsonify(error_response), status_code
+        
+        # 按执行模式发送（同一 group 内保持顺序）
+        batch = run_command_batch(commands, mode, max_concurrency, deadline_ms)
+        results = batch.pop('results')
+        success_count = sum(1 for result in results if result.get('success'))
         
         # 记录API调用
         duration = now_ms() - start_time
@@ -223,6 +337,7 @@ def send_batch_commands():
             'total': len(commands),
             'success_count': success_count,
             'failed_count': len(commands) - success_count,
+            **batch,
             'timestamp': now_ms()
         }
         
@@ -2,10 +2,14 @@
 数据相关API蓝图
 """
 import logging
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from app.services.data_service import DataService
 from app.services.node_red_service import NodeRedService
-from app.utils.helpers import create_response, log_api_call, now_ms
+from app.services.node_red_poller import get_node_red_snapshot
+from app.services.retention_service import get_retention_engine
+from app.utils import data_version
+from app.utils.curve_codec import DTYPE_FLOAT32, DTYPE_FLOAT64
+from app.utils.helpers import create_response, log_api_call, now_ms, normalize_hysteresis_points
 
 logger = logging.getLogger(__name__)
 
@@ -18,52 +22,17 @@ def get_datas():
     start_time = now_ms()
     
     try:
-        # 尝试从Node-RED获取最新数据
-        node_red_data = NodeRedService.fetch_data_from_node_red()
+        # 读取Node-RED实时快照（后台轮询线程已负责入库）
+        snapshot = get_node_red_snapshot()
+        node_red_data = snapshot.values
         hysteresis_meta = {'saved': False, 'point_count': 0, 'timestamp': None}
         
         if node_red_data:
-            # 如果从Node-RED获取到数据，保存到数据库（指标类）
-            DataService.save_measurement_data(node_red_data)
-            
-            # 额外：保存Node-RED提供的滞回曲线（如存在）
-            try:
-                hyst = node_red_data.get('hysteresis_curve')
-                if isinstance(hyst, dict):
-                    raw_points = hyst.get('points')
-                    ts = hyst.get('timestamp')
-                    hysteresis_meta['timestamp'] = ts
-                    normalized_points = []
-                    
-                    def _pick_val(obj, keys):
-                        for k in keys:
-                            if k in obj:
-                                try:
-                                    return float(obj[k])
-                                except (TypeError, ValueError):
-                                    continue
-                        return None
-                    
-                    if isinstance(raw_points, list):
-                        for p in raw_points:
-                            if not isinstance(p, dict):
-                                continue
-                            # 支持 angle/torque 原始键或候选键名映射
-                            angle_val = p.get('angle')
-                            torque_val = p.get('torque')
-                            if angle_val is None:
-                                angle_val = _pick_val(p, ['position_deg', 'position', 'theta', 'angle_deg', 'angular_position'])
-                            if torque_val is None:
-                                torque_val = _pick_val(p, ['torque_nm', 'torque', 'load_torque', 'current_torque', 'torque_Nm'])
-                            if angle_val is not None and torque_val is not None:
-                                normalized_points.append({'angle': angle_val, 'torque': torque_val})
-                    
-                    if normalized_points:
-                        DataService.save_hysteresis_data(normalized_points, curve_type='hysteresis', timestamp=ts)
-                        hysteresis_meta['saved'] = True
-                        hysteresis_meta['point_count'] = len(normalized_points)
-            except Exception as e:
-                logger.warning(f"保存Node-RED滞回曲线失败: {e}")
+            if not snapshot.polled:
+                # 未启用后台轮询：由本次请求保存数据（指标类 + 滞回曲线）；
+                # 响应中报告了滞回曲线是否已保存，因此等待其提交完成
+                DataService.save_measurement_data(node_red_data)
+                hysteresis_meta = DataService.save_node_red_hysteresis(node_red_data, durable=True)
             
             result_data = node_red_data
             data_source = 'node_red'
@@ -83,7 +52,8 @@ def get_datas():
             '_meta': {
                 'source': data_source,
                 'timestamp': now_ms(),
-                'count': len(result_data)
+                'count': len(result_data),
+                **snapshot.meta()
             }
         }
         if hysteresis_meta['saved']:
@@ -119,18 +89,20 @@ def ingest_data():
             )
             return jsonify(error_response), status_code
         
-        # 保存数据到数据库
-        success = DataService.save_measurement_data(data)
+        # 保存数据到数据库（durable=true 时等待提交完成再返回）
+        durable = request.args.get('durable', 'false').lower() == 'true'
+        success = DataService.save_measurement_data(data, durable=durable)
         
         if success:
             # 记录API调用
             duration = now_ms() - start_time
             log_api_call('/api/ingest', 'POST', data, {'success': True}, duration)
             
+            # saved 保持原含义（已受理）；queued=true 表示只保证已进入写队列，尚未提交
             response_data, status_code = create_response(
                 success=True,
-                data={'saved': True, 'count': len(data)},
-                message="数据保存成功"
+                data={'saved': True, 'queued': not durable, 'count': len(data)},
+                message="数据保存成功" if durable else "数据已提交写入队列"
             )
         else:
             response_data, status_code = create_response(
@@ -153,12 +125,65 @@ def ingest_data():
         return jsonify(error_response), status_code
 
 
+# 曲线二进制格式：format 参数值 -> 浮点类型（None 表示沿用存储类型）
+_CURVE_BINARY_FORMATS = {'f32': DTYPE_FLOAT32, 'f64': DTYPE_FLOAT64, 'binary': None}
+
+
+def _curve_response_format():
+    """
+    内容协商：返回 (是否二进制, 浮点类型)
+    ?format=f32|f64|binary|json 优先；否则 Accept 偏好 application/octet-stream 时返回存储类型的二进制
+    """
+    fmt = request.args.get('format')
+    if fmt:
+        if fmt == 'json':
+            return False, None
+        if fmt not in _CURVE_BINARY_FORMATS:
+            raise ValueError(f"format必须是 json、{'、'.join(_CURVE_BINARY_FORMATS)} 之一")
+        return True, _CURVE_BINARY_FORMATS[fmt]
+    best = request.accept_mimetypes.best_match(['application/json', 'application/octet-stream'])
+    return best == 'application/octet-stream', None
+
+
 @bp.route('/api/data/hysteresis', methods=['GET'])
 def get_hysteresis():
-    """获取滞回曲线数据"""
+    """
+    获取滞回曲线数据（支持 If-None-Match 条件请求）
+    默认返回 JSON 点列表与曲线分析；Accept: application/octet-stream 或 format=f32/f64 时
+    返回二进制帧（小端头部 + 分段表 + 连续的角度数组与扭矩数组，格式见 curve_codec.pack_curve_frame），
+    可在浏览器中直接构造 Float32Array/Float64Array，不含曲线分析
+    """
     start_time = now_ms()
     
     try:
+        try:
+            binary, dtype = _curve_response_format()
+        except ValueError as e:
+            error_response, status_code = create_response(
+                success=False,
+                error=str(e),
+                message="请求参数错误",
+                status_code=400
+            )
+            return jsonify(error_response), status_code
+        
+        variant = f"{request.full_path}|{'binary:' + str(dtype) if binary else 'json'}"
+        etag, last_modified, not_modified = data_version.conditional(data_version.DATASET_HYSTERESIS, variant)
+        if not_modified is not None:
+            not_modified.vary.add('Accept')
+            return not_modified
+        
+        if binary:
+            frame, dtype, count = DataService.get_hysteresis_curve_frame(dtype)
+            duration = now_ms() - start_time
+            log_api_call('/api/data/hysteresis', 'GET', {'format': dtype}, {'bytes': len(frame), 'count': count}, duration)
+            response = Response(frame, mimetype='application/octet-stream', headers={
+                'X-Curve-Dtype': dtype,
+                'X-Curve-Points': str(count),
+            })
+            response.vary.add('Accept')
+            return data_version.with_validators(response, etag, last_modified)
+        
         # 获取滞回曲线数据
         points = DataService.get_hysteresis_curve_data()
         
@@ -176,7 +201,9 @@ def get_hysteresis():
             'timestamp': now_ms()
         }
         
-        return jsonify(response_data)
+        response = jsonify(response_data)
+        response.vary.add('Accept')
+        return data_version.with_validators(response, etag, last_modified)
         
     except Exception as e:
         logger.error(f"获取滞回曲线数据失败: {e}")
@@ -209,36 +236,15 @@ def save_hysteresis():
         raw_points = data['points']
         timestamp = data.get('timestamp')
         curve_type = data.get('curve_type', 'hysteresis')
+        durable = request.args.get('durable', 'false').lower() == 'true'
         
         # 兼容不同键名的点格式，将其标准化为 {angle, torque}
-        normalized_points = []
-        
-        def _pick_val(obj, keys):
-            for k in keys:
-                if k in obj:
-                    try:
-                        return float(obj[k])
-                    except (TypeError, ValueError):
-                        continue
-            return None
-        
-        if isinstance(raw_points, list):
-            for p in raw_points:
-                if not isinstance(p, dict):
-                    continue
-                angle_val = p.get('angle')
-                torque_val = p.get('torque')
-                if angle_val is None:
-                    angle_val = _pick_val(p, ['position_deg', 'position', 'theta', 'angle_deg', 'angular_position'])
-                if torque_val is None:
-                    torque_val = _pick_val(p, ['torque_nm', 'torque', 'load_torque', 'current_torque', 'torque_Nm'])
-                if angle_val is not None and torque_val is not None:
-                    normalized_points.append({'angle': angle_val, 'torque': torque_val})
+        normalized_points = normalize_hysteresis_points(raw_points)
         
         # 保存滞回曲线数据
         success = False
         if normalized_points:
-            success = DataService.save_hysteresis_data(normalized_points, curve_type=curve_type, timestamp=timestamp)
+            success = DataService.save_hysteresis_data(normalized_points, curve_type=curve_type, timestamp=timestamp, durable=durable)
         
         if success:
             # 记录API调用
@@ -247,8 +253,8 @@ def save_hysteresis():
             
             response_data, status_code = create_response(
                 success=True,
-                data={'saved': True, 'count': len(normalized_points)},
-                message="滞回曲线数据保存成功"
+                data={'saved': True, 'queued': not durable, 'count': len(normalized_points)},
+                message="滞回曲线数据保存成功" if durable else "滞回曲线数据已提交写入队列"
             )
         else:
             response_data, status_code = create_response(
@@ -280,8 +286,9 @@ def collect_data():
         data = request.get_json() or {}
         keys = data.get('keys', [])
         
-        # 从 Node-RED 获取实时测量数据
-        values = NodeRedService.fetch_data_from_node_red() or {}
+        # 从 Node-RED 实时快照获取测量数据
+        snapshot = get_node_red_snapshot()
+        values = snapshot.values
         
         # 如果指定了 keys，仅返回指定项
         if keys:
@@ -293,7 +300,8 @@ def collect_data():
         
         response_data, status_code = create_response(
             success=True,
-            data={'values': values, '_meta': {'source': 'node_red', 'timestamp': now_ms(), 'count': len(values)}},
+            data={'values': values, '_meta': {'source': 'node_red', 'timestamp': now_ms(), 'count': len(values),
+                                              **snapshot.meta()}},
             message="Node-RED实时数据"
         )
         
@@ -312,7 +320,7 @@ def collect_data():
 
 @bp.route('/api/data/write', methods=['POST'])
 def write_data():
-    """数据写入接口（向PLC写入电机配置）"""
+    """数据写入接口（向PLC写入电机配置，全部参数一次请求写入）"""
     start_time = now_ms()
     
     try:
@@ -331,11 +339,6 @@ def write_data():
         test_config = data.get('test_config', {})
         addresses = data.get('addresses', {})
         
-        # 模拟写入操作（实际应写入PLC）
-        write_results = {}
-        written_count = 0
-        failed_count = 0
-        
         # 处理电机配置参数
         motor_params = {
             'motor_model': motor_config.get('model'),
@@ -378,26 +381,27 @@ def write_data():
         # 使用提供的地址或默认地址
         addr_map = {**default_addresses, **addresses}
         
-        # 模拟写入每个参数
-        import random
-        for param_name, param_value in all_params.items():
-            if param_value is not None:
-                addr = addr_map.get(param_name, f'D{3000 + len(write_results)}')
-                
-                # 模拟写入成功/失败（90%成功率）
-                if random.random() < 0.9:
-                    write_results[param_name] = {
-                        'addr': addr,
-                        'status': 'success'
-                    }
-                    written_count += 1
-                else:
-                    write_results[param_name] = {
-                        'addr': addr,
-                        'status': 'failed',
-                        'error': '写入超时'
-                    }
-                    failed_count += 1
+        # 所有参数合并为连续寄存器块，经Node-RED一次写入
+        to_write = {
+            name: (addr_map[name], value)
+            for name, value in all_params.items()
+            if value is not None
+        }
+        write = NodeRedService.write_registers(to_write)
+        write_results = write['results']
+        written_count = sum(1 for item in write_results.values() if item['status'] == 'success')
+        failed_count = len(write_results) - written_count
+        result_data = {
+            'written_parameters': written_count,
+            'failed_parameters': failed_count,
+            'write_results': write_results,
+            'blocks': write['blocks'],
+            'round_trips': 1 if write_results else 0,
+            'timing': {
+                'node_red_ms': write['node_red_ms'],
+                'total_ms': now_ms() - start_time
+            }
+        }
         
         # 记录API调用
         duration = now_ms() - start_time
@@ -406,25 +410,25 @@ def write_data():
         if failed_count == 0:
             response_data, status_code = create_response(
                 success=True,
-                data={
-                    'written_parameters': written_count,
-                    'failed_parameters': failed_count,
-                    'write_results': write_results
-                },
+                data=result_data,
                 message="配置写入成功"
             )
+        elif written_count == 0:
+            response_data, status_code = create_response(
+                success=False,
+                error=write.get('error', "参数写入失败"),
+                message=write.get('message') or "参数写入失败",
+                status_code=502
+            )
+            response_data['data'] = result_data
         else:
             response_data, status_code = create_response(
                 success=False,
-                data={
-                    'written_parameters': written_count,
-                    'failed_parameters': failed_count,
-                    'write_results': write_results
-                },
                 error="部分参数写入失败",
                 message=f"成功写入{written_count}个参数，{failed_count}个参数写入失败",
                 status_code=207  # 207 Multi-Status
             )
+            response_data['data'] = result_data
         
         return jsonify(response_data), status_code
         
@@ -441,17 +445,25 @@ def write_data():
 
 @bp.route('/api/data/stats', methods=['GET'])
 def get_statistics():
-    """获取数据统计信息"""
+    """获取数据统计信息（支持 If-None-Match 条件请求）"""
     start_time = now_ms()
     
     try:
+        etag, last_modified, not_modified = data_version.conditional(
+            (data_version.DATASET_MEASUREMENTS, data_version.DATASET_HYSTERESIS)
+        )
+        if not_modified is not None:
+            return not_modified
+        
         stats = DataService.get_data_statistics()
         
         # 记录API调用
         duration = now_ms() - start_time
         log_api_call('/api/stats', 'GET', {}, stats, duration)
         
-        return jsonify(stats)
+        if 'error' in stats:
+            return jsonify(stats)
+        return data_version.with_validators(jsonify(stats), etag, last_modified)
         
     except Exception as e:
         logger.error(f"获取统计信息失败: {e}")
@@ -466,30 +478,73 @@ def get_statistics():
 
 @bp.route('/api/data/history/<key>', methods=['GET'])
 def get_measurement_history(key):
-    """获取指定测量项的历史数据"""
+    """
+    获取指定测量项的历史数据
+    指定 start_time/end_time 时按 max_points 点数预算返回自动降采样的曲线
+    支持 If-None-Match 条件请求
+    """
     start_time = now_ms()
     
     try:
-        # 获取查询参数
+        range_start = request.args.get('start_time', type=int)
+        range_end = request.args.get('end_time', type=int)
+        ranged = range_start is not None or range_end is not None
+        variant = request.full_path
+        if ranged:
+            # 缺省的 end 为当前时间：ETag 按解析后的区间区分，窗口随时间移动时不会命中旧缓存
+            range_end = range_end if range_end is not None else now_ms()
+            range_start = range_start if range_start is not None else range_end - 24 * 60 * 60 * 1000
+            variant = f"{variant}|{range_start}-{range_end}"
+        # 按测量项取版本：其他测量项的写入不使本序列的 ETag 失效
+        etag, last_modified, not_modified = data_version.conditional(data_version.DATASET_MEASUREMENTS, variant,
+                                                                     key=key)
+        if not_modified is not None:
+            return not_modified
+        
+        if ranged:
+            max_points = request.args.get('max_points', 500, type=int)
+            max_points = max(1, min(max_points, 10000))
+            
+            series = DataService.get_measurement_series(key, range_start, range_end, max_points)
+            
+            duration = now_ms() - start_time
+            log_api_call(f'/api/history/{key}', 'GET', {
+                'start_time': range_start, 'end_time': range_end, 'max_points': max_points
+            }, series, duration)
+            
+            return data_version.with_validators(jsonify({**series, 'timestamp': now_ms()}), etag, last_modified)
+        
+        # 获取查询参数（单页上限保护内存，更大范围通过 cursor 逐页遍历）
         limit = request.args.get('limit', 100, type=int)
-        limit = min(limit, 1000)  # 限制最大查询数量
+        limit = max(1, min(limit, 1000))
+        cursor = request.args.get('cursor')
         
         # 获取历史数据
-        history = DataService.get_measurement_history(key, limit)
+        try:
+            history, next_cursor = DataService.get_measurement_history_page(key, limit, cursor)
+        except ValueError as e:
+            error_response, status_code = create_response(
+                success=False,
+                error=str(e),
+                message="无效的分页游标",
+                status_code=400
+            )
+            return jsonify(error_response), status_code
         
         # 记录API调用
         duration = now_ms() - start_time
-        log_api_call(f'/api/history/{key}', 'GET', {'limit': limit}, history, duration)
+        log_api_call(f'/api/history/{key}', 'GET', {'limit': limit, 'cursor': cursor}, history, duration)
         
         response_data = {
             'key': key,
             'history': history,
             'count': len(history),
             'limit': limit,
+            'next_cursor': next_cursor,
             'timestamp': now_ms()
         }
         
-        return jsonify(response_data)
+        return data_version.with_validators(jsonify(response_data), etag, last_modified)
         
     except Exception as e:
         logger.error(f"获取历史数据失败: {e}")
@@ -502,82 +557,61 @@ def get_measurement_history(key):
         return jsonify(error_response), status_code
 
 
+@bp.route('/api/data/wait', methods=['GET'])
+def wait_for_data():
+    """
+    长轮询变化通知（供无法保持推送连接的客户端使用）
+    参数: since(上次响应的 version，缺省时立即返回全量), timeout(最长等待秒数，默认25，上限60),
+          keys(关注的测量项，逗号分隔，缺省为全部)
+    测量值或滞回曲线有新的写入提交时返回，只包含 since 之后数值发生变化的测量项；超时返回 changed=false
+    writer_active=false 表示后台没有持续入库的采样线程，客户端应改为按周期轮询
+    """
+    start_time = now_ms()
+    
+    try:
+        try:
+            since = request.args.get('since')
+            since = int(since) if since not in (None, '') else None
+            timeout = float(request.args.get('timeout', 25))
+        except ValueError:
+            error_response, status_code = create_response(
+                success=False,
+                error="since必须是整数，timeout必须是数字",
+                message="请求参数错误",
+                status_code=400
+            )
+            return jsonify(error_response), status_code
+        timeout = max(0.0, min(timeout, 60.0))
+        keys = [k.strip() for k in request.args.get('keys', '').split(',') if k.strip()] or None
+        
+        result = DataService.wait_for_changes(since, keys, timeout)
+        
+        duration = now_ms() - start_time
+        log_api_call('/api/data/wait', 'GET', {'since': since, 'timeout': timeout, 'keys': keys}, result, duration)
+        
+        response = jsonify(result)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+        
+    except Exception as e:
+        logger.error(f"等待数据变化失败: {e}")
+        error_response, status_code = create_response(
+            success=False,
+            error=str(e),
+            message="等待数据变化失败",
+            status_code=500
+        )
+        return jsonify(error_response), status_code
+
+
 @bp.route('/api/data/current', methods=['GET'])
 def get_current_data():
   start_time = now_ms()
   try:
-    values = NodeRedService.fetch_data_from_node_red() or {}
+    snapshot = get_node_red_snapshot()
+    values = snapshot.values
 
-    def _extract_numeric(val):
-      if isinstance(val, dict):
-        for key in ('value','val','data','v','current'):
-          if key in val:
-            try:
-              return float(val[key])
-            except (TypeError, ValueError):
-              continue
-        for _, v in val.items():
-          try:
-            return float(v)
-          except (TypeError, ValueError):
-            continue
-        return None
-      # 字符串中提取第一个数字（兼容如 "12.34 deg"）
-      if isinstance(val, str):
-        try:
-          import re
-          m = re.search(r"-?\d+(?:\.\d+)?", val)
-          if m:
-            return float(m.group(0))
-        except Exception:
-          pass
-        return None
-      try:
-        return float(val)
-      except (TypeError, ValueError):
-        return None
-
-    def _find_numeric_deep(obj, alias_keys, substrings):
-      try:
-        if obj is None:
-          return None
-        # 字典：先匹配当前层键，再递归子结构
-        if isinstance(obj, dict):
-          for k, v in obj.items():
-            k_lower = str(k).lower()
-            if k_lower in alias_keys or any(sub in k_lower for sub in substrings):
-              num = _extract_numeric(v)
-              if num is not None:
-                return num
-          for _, v in obj.items():
-            num = _find_numeric_deep(v, alias_keys, substrings)
-            if num is not None:
-              return num
-          return None
-        # 列表：逐项递归
-        if isinstance(obj, list):
-          for item in obj:
-            num = _find_numeric_deep(item, alias_keys, substrings)
-            if num is not None:
-              return num
-          return None
-        # 基本类型直接尝试转换（仅当无键匹配情况下，不作角/扭矩猜测）
-        return None
-      except Exception:
-        return None
-
-    angle_alias = {
-      'angle','position_deg','position','theta','angle_deg','angular_position','pos','deg',
-      'mechanical_angle','electrical_angle','encoder_position','encoder_deg','theta_deg','position_degree','angle_degree',
-      '角度','角位移','位置','机械角度','电角度','编码器位置','编码器角度'
-    }
-    torque_alias = {
-      'torque','torque_nm','load_torque','current_torque','torque_Nm','tq','load_torque_nm',
-      'load_torque_nm','motor_torque','output_torque','torque_value',
-      '扭矩','负载扭矩','输出扭矩','电机扭矩','当前扭矩'
-    }
-    angle = _find_numeric_deep(values, angle_alias, ['angle','position','theta','pos','deg','encoder','角','位移','位置'])
-    torque = _find_numeric_deep(values, torque_alias, ['torque','load','nm','tq','扭矩','负载'])
+    angle, torque = DataService.extract_angle_torque(values)
 
     source = 'node_red' if values else 'database'
 
@@ -596,11 +630,77 @@ def get_current_data():
     meta = {
       'source': source,
       'timestamp': now_ms(),
-      'keys': list(values.keys()) if isinstance(values, dict) else []
+      'keys': list(values.keys()) if isinstance(values, dict) else [],
+      **snapshot.meta()
     }
     log_api_call('/api/data/current','GET',{}, {'angle': angle, 'torque': torque, 'source': source, 'keys': meta['keys']}, duration)
     return jsonify({'angle': angle, 'torque': torque, '_meta': meta})
   except Exception as e:
     logger.error(f"获取当前实时数据失败: {e}")
     error_response, status_code = create_response(success=False, error=str(e), message='获取当前实时数据失败', status_code=500)
-    return jsonify(error_response), status_code
\ No newline at end of file
+    return jsonify(error_response), status_code
+
+
+@bp.route('/api/data/retention', methods=['GET'])
+def get_retention_status():
+    """获取数据保留策略与最近一次清理报告"""
+    engine = get_retention_engine()
+    if engine is None:
+        error_response, status_code = create_response(
+            success=False, error='retention_unavailable', message='数据保留引擎未初始化', status_code=503
+        )
+        return jsonify(error_response), status_code
+    response_data, status_code = create_response(success=True, data=engine.get_status(), message='数据保留状态')
+    return jsonify(response_data), status_code
+
+
+@bp.route('/api/data/retention', methods=['POST'])
+def run_retention():
+    """
+    立即执行一次数据清理
+    可选参数: policies(策略名列表), days(覆盖保留天数), enable_incremental_vacuum(切换库的VACUUM模式)
+    """
+    start_time = now_ms()
+    
+    try:
+        engine = get_retention_engine()
+        if engine is None:
+            error_response, status_code = create_response(
+                success=False, error='retention_unavailable', message='数据保留引擎未初始化', status_code=503
+            )
+            return jsonify(error_response), status_code
+        
+        data = request.get_json(silent=True) or {}
+        policies = data.get('policies')
+        days = data.get('days')
+        if days is not None:
+            try:
+                days = int(days)
+            except (TypeError, ValueError):
+                days = 0
+            if days <= 0:
+                error_response, status_code = create_response(
+                    success=False, error='invalid_days', message='days 必须为正整数', status_code=400
+                )
+                return jsonify(error_response), status_code
+        
+        result = {}
+        if data.get('enable_incremental_vacuum'):
+            result['vacuum_mode'] = engine.enable_incremental_vacuum()
+        result['report'] = engine.run(only=policies, days_override=days)
+        
+        duration = now_ms() - start_time
+        log_api_call('/api/data/retention', 'POST', data, result, duration)
+        
+        response_data, status_code = create_response(success=True, data=result, message='数据清理完成')
+        return jsonify(response_data), status_code
+        
+    except Exception as e:
+        logger.error(f"数据清理失败: {e}")
+        error_response, status_code = create_response(
+            success=False,
+            error=str(e),
+            message="数据清理失败",
+            status_code=500
+        )
+        return jsonify(error_response), status_code
@@ -9,7 +9,7 @@ from datetime import datetime
 from flask import Blueprint, request, jsonify, send_file, current_app
 from app.models.measurement import MeasurementModel
 from app.models.hysteresis import HysteresisModel
-from app.utils.helpers import create_response, log_api_call, now_ms, format_timestamp
+from app.utils.helpers import create_response, log_api_call, now_ms, format_timestamp, decode_cursor
 import base64
 from io import BytesIO
 
@@ -28,10 +28,9 @@ def export_csv():
         data_type = request.args.get('type', 'measurements')
         start_time_param = request.args.get('start_time')
         end_time_param = request.args.get('end_time')
-        limit = request.args.get('limit', 1000, type=int)
-        
-        # 限制最大导出数量
-        limit = min(limit, 10000)
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
+        next_cursor = None
         
         # 生成文件名
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -44,53 +43,47 @@ def export_csv():
         filepath = os.path.join(export_dir, filename)
         
         if data_type == 'measurements':
-            # 导出测量数据
-            if start_time_param and end_time_param:
-                data = MeasurementModel.get_measurements_by_timerange(
-                    int(start_time_param), int(end_time_param), limit
+            # 导出测量数据：按键集游标分块读取并逐行写入，内存占用与导出范围无关
+            range_start = int(start_time_param) if start_time_param else 0
+            range_end = int(end_time_param) if end_time_param else now_ms()
+            decode_cursor(cursor, 2)
+            
+            if limit:
+                # 指定 limit 时只导出一页，后续页通过 X-Next-Cursor 继续
+                limit = max(1, limit)
+                rows, next_cursor = MeasurementModel.get_measurements_page(
+                    range_start, range_end, limit=limit, cursor=cursor
                 )
             else:
-                data = MeasurementModel.get_latest_measurements(limit)
+                rows = MeasurementModel.iter_measurements_by_timerange(
+                    range_start, range_end, cursor=cursor
+                )
             
-            # 写入CSV文件
+            fieldnames = ['ts', 'formatted_time', 'key', 'value', 'unit', 'addr', 'created_at']
             with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-                if data:
-                    fieldnames = ['timestamp', 'formatted_time'] + list(data[0].keys())
-                    fieldnames = [f for f in fieldnames if f not in ['timestamp']]  # 避免重复
-                    
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                    writer.writeheader()
-                    
-                    for row in data:
-                        # 添加格式化时间
-                        row_data = dict(row)
-                        row_data['formatted_time'] = format_timestamp(row['timestamp'])
-                        writer.writerow(row_data)
-                else:
-                    # 空数据时写入表头
-                    writer = csv.writer(csvfile)
-                    writer.writerow(['timestamp', 'formatted_time', 'message'])
-                    writer.writerow([now_ms(), format_timestamp(now_ms()), 'No data available'])
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
+                writer.writeheader()
+                for row in rows:
+                    row['formatted_time'] = format_timestamp(row['ts'])
+                    writer.writerow(row)
         
         elif data_type == 'hysteresis':
-            # 导出磁滞回线数据
-            timestamps = HysteresisModel.get_hysteresis_timestamps(limit)
+            # 导出磁滞回线数据（逐条曲线展开，不一次性加载全部点）
+            timestamps = HysteresisModel.get_hysteresis_timestamps(min(limit or 1000, 10000))
             
             with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
                 writer = csv.writer(csvfile)
-                writer.writerow(['timestamp', 'formatted_time', 'h_field', 'b_field', 'curve_id'])
+                writer.writerow(['timestamp', 'formatted_time', 'angle', 'torque', 'curve_type'])
                 
                 for ts in timestamps:
-                    points = HysteresisModel.get_hysteresis_by_timestamp(ts)
                     formatted_time = format_timestamp(ts)
-                    
-                    for point in points:
+                    for point in HysteresisModel.iter_hysteresis_points(ts):
                         writer.writerow([
                             ts,
                             formatted_time,
-                            point.get('h_field', 0),
-                            point.get('b_field', 0),
-                            point.get('id', '')
+                            point['angle'],
+                            point['torque'],
+                            point['curve_type']
                         ])
         
         else:
@@ -106,17 +99,29 @@ def export_csv():
         duration = now_ms() - start_time
         log_api_call('/api/export/csv', 'GET', {
             'type': data_type,
-            'limit': limit
+            'limit': limit,
+            'cursor': cursor
         }, {'filename': filename}, duration)
         
         # 发送文件
-        return send_file(
+        response = send_file(
             filepath,
             as_attachment=True,
             download_name=filename,
             mimetype='text/csv'
         )
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
         
+    except ValueError as e:
+        error_response, status_code = create_response(
+            success=False,
+            error=str(e),
+            message="无效的参数或分页游标",
+            status_code=400
+        )
+        return jsonify(error_response), status_code
     except Exception as e:
         logger.error(f"导出CSV失败: {e}")
         error_response, status_code = create_response(
@@ -140,9 +145,10 @@ def export_json():
         end_time_param = request.args.get('end_time')
         limit = request.args.get('limit', 1000, type=int)
         pretty = request.args.get('pretty', 'false').lower() == 'true'
+        cursor = request.args.get('cursor')
         
-        # 限制最大导出数量
-        limit = min(limit, 10000)
+        # 单页上限保护内存，更大范围通过 cursor/next_cursor 逐页导出
+        limit = max(1, min(limit, 10000))
         
         export_data = {
             'export_info': {
@@ -162,19 +168,19 @@ def export_json():
             export_data['export_info']['filters']['end_time'] = int(end_time_param)
         
         if data_type == 'measurements':
-            # 导出测量数据
-            if start_time_param and end_time_param:
-                data = MeasurementModel.get_measurements_by_timerange(
-                    int(start_time_param), int(end_time_param), limit
-                )
-            else:
-                data = MeasurementModel.get_latest_measurements(limit)
+            # 导出测量数据（键集分页）
+            range_start = int(start_time_param) if start_time_param else 0
+            range_end = int(end_time_param) if end_time_param else now_ms()
+            data, next_cursor = MeasurementModel.get_measurements_page(
+                range_start, range_end, limit=limit, cursor=cursor
+            )
+            export_data['export_info']['cursor'] = cursor
+            export_data['export_info']['next_cursor'] = next_cursor
             
             # 添加格式化时间
             for row in data:
-                row_data = dict(row)
-                row_data['formatted_time'] = format_timestamp(row['timestamp'])
-                export_data['data'].append(row_data)
+                row['formatted_time'] = format_timestamp(row['ts'])
+                export_data['data'].append(row)
         
         elif data_type == 'hysteresis':
             # 导出磁滞回线数据
@@ -226,6 +232,14 @@ def export_json():
         
         return response
         
+    except ValueError as e:
+        error_response, status_code = create_response(
+            success=False,
+            error=str(e),
+            message="无效的参数或分页游标",
+            status_code=400
+        )
+        return jsonify(error_response), status_code
     except Exception as e:
         logger.error(f"导出JSON失败: {e}")
         error_response, status_code = create_response(
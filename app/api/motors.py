@@ -3,6 +3,7 @@
 """
 from flask import Blueprint, request, jsonify
 from app.utils.database import execute_query, execute_many
+from app.utils import data_version
 from app.utils.helpers import create_response
 import logging
 import json
@@ -13,8 +14,12 @@ motors_bp = Blueprint('motors', __name__)
 
 @motors_bp.route('/api/motors/custom', methods=['GET'])
 def get_custom_motors():
-    """获取所有自定义电机配置"""
+    """获取所有自定义电机配置（支持 If-None-Match 条件请求）"""
     try:
+        etag, last_modified, not_modified = data_version.conditional(data_version.DATASET_MOTORS)
+        if not_modified is not None:
+            return not_modified
+        
         motors = execute_query(
             '''SELECT id, name, rated_voltage, rated_current, max_torque, 
                       rated_speed, pole_pairs, inertia, encoder_resolution,
@@ -45,7 +50,7 @@ def get_custom_motors():
             message="获取自定义电机列表成功",
             data=motor_list
         )
-        return jsonify(response_data), status_code
+        return data_version.with_validators(jsonify(response_data), etag, last_modified), status_code
         
     except Exception as e:
         logger.error(f"获取自定义电机列表失败: {e}")
@@ -108,6 +113,7 @@ def create_custom_motor():
                 int(data.get('encoder_resolution', 0))
             ]
         )
+        data_version.bump(data_version.DATASET_MOTORS)
         
         # 获取创建的电机信息
         motor = execute_query(
@@ -208,6 +214,7 @@ def update_custom_motor(motor_id):
                 motor_id
             ]
         )
+        data_version.bump(data_version.DATASET_MOTORS)
         
         # 获取更新后的电机信息
         motor = execute_query(
@@ -272,6 +279,7 @@ def delete_custom_motor(motor_id):
             'DELETE FROM custom_motors WHERE id = ?',
             [motor_id]
         )
+        data_version.bump(data_version.DATASET_MOTORS)
         
         response_data, status_code = create_response(
             success=True,
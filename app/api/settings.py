@@ -1,14 +1,15 @@
-import os
-import json
 import logging
 from flask import Blueprint, request, jsonify, current_app
-from app.utils.database import execute_query
+from app.services.config_store import get_config_store
+from app.utils import data_version
 from app.utils.helpers import create_response
 
 logger = logging.getLogger(__name__)
 
 bp = Blueprint('settings', __name__)
 
+CONNECTION_CONFIG_KEYS = ('data_collection_url', 'data_write_url')
+
 DEFAULT_SETTINGS = {
     "model": "Custom",
     "rated_voltage": 48,
@@ -21,35 +22,14 @@ DEFAULT_SETTINGS = {
 }
 
 
-def _settings_file_path():
-    try:
-        data_dir = os.path.abspath(os.path.join(current_app.root_path, '..', 'data'))
-    except Exception:
-        # 兜底：按照项目结构推断
-        base = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-        data_dir = os.path.join(base, 'data')
-    os.makedirs(data_dir, exist_ok=True)
-    return os.path.join(data_dir, 'settings.json')
-
-
 def _load_settings():
-    path = _settings_file_path()
-    if os.path.exists(path):
-        try:
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if isinstance(data, dict):
-                    return { **DEFAULT_SETTINGS, **data }
-        except Exception as e:
-            logger.warning('读取设置失败: %s', e)
-    return DEFAULT_SETTINGS.copy()
+    """读取设置（内存缓存，文件被外部修改时自动重新加载）"""
+    return { **DEFAULT_SETTINGS, **get_config_store().get_settings() }
 
 
 def _save_settings(data: dict):
-    path = _settings_file_path()
     try:
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        get_config_store().save_settings(data)
         return True
     except Exception as e:
         logger.error('保存设置失败: %s', e)
@@ -59,16 +39,20 @@ def _save_settings(data: dict):
 @bp.route('/api/settings', methods=['GET'])
 def get_settings():
     """
-    获取当前设置（若不存在则返回默认值）
+    获取当前设置（若不存在则返回默认值），支持 If-None-Match 条件请求
     """
+    # 先读缓存：文件被外部修改时在此重新加载并递增版本
     settings = _load_settings()
+    etag, last_modified, not_modified = data_version.conditional(data_version.DATASET_SETTINGS)
+    if not_modified is not None:
+        return not_modified
     env = 'production' if not current_app.config.get('DEBUG', False) else 'development'
-    return jsonify({
+    return data_version.with_validators(jsonify({
         "success": True,
         "settings": settings,
         "env": env,
         "debug": current_app.config.get('DEBUG', False)
-    }), 200
+    }), etag, last_modified), 200
 
 
 @bp.route('/api/settings', methods=['POST'])
@@ -128,20 +112,7 @@ def reset_settings():
 def get_connection_settings():
     """获取数据连接配置"""
     try:
-        settings = execute_query(
-            '''SELECT config_key, config_value, updated_at 
-               FROM system_config 
-               WHERE config_key IN ('data_collection_url', 'data_write_url')
-               ORDER BY config_key''',
-            fetch_all=True
-        )
-        
-        config_data = {}
-        for setting in settings:
-            config_data[setting['config_key']] = {
-                'value': setting['config_value'],
-                'updated_at': setting['updated_at']
-            }
+        config_data = get_config_store().get_system_config_entries(CONNECTION_CONFIG_KEYS)
         
         # 如果没有配置，返回默认值
         if not config_data:
@@ -217,45 +188,8 @@ def update_connection_settings():
             ('data_write_url', data_write_url)
         ]
         
-        for config_key, config_value in configs:
-            # 检查配置是否存在
-            existing = execute_query(
-                'SELECT id FROM system_config WHERE config_key = ?',
-                [config_key],
-                fetch_one=True
-            )
-            
-            if existing:
-                # 更新现有配置
-                execute_query(
-                    '''UPDATE system_config 
-                       SET config_value = ?, updated_at = CURRENT_TIMESTAMP 
-                       WHERE config_key = ?''',
-                    [config_value, config_key]
-                )
-            else:
-                # 插入新配置
-                execute_query(
-                    '''INSERT INTO system_config (config_key, config_value) 
-                       VALUES (?, ?)''',
-                    [config_key, config_value]
-                )
-        
-        # 获取更新后的配置
-        updated_settings = execute_query(
-            '''SELECT config_key, config_value, updated_at 
-               FROM system_config 
-               WHERE config_key IN ('data_collection_url', 'data_write_url')
-               ORDER BY config_key''',
-            fetch_all=True
-        )
-        
-        config_data = {}
-        for setting in updated_settings:
-            config_data[setting['config_key']] = {
-                'value': setting['config_value'],
-                'updated_at': setting['updated_at']
-            }
+        # 写入数据库并刷新配置缓存（通知订阅方连接地址已变化）
+        config_data = get_config_store().set_system_config(dict(configs))
         
         response_data, status_code = create_response(
             success=True,
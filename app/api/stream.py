@@ -0,0 +1,260 @@
+"""
+推送流API蓝图（Server-Sent Events）
+客户端通过 EventSource 订阅，服务端只在数据变化时推送，空闲时发送心跳注释保持连接
+"""
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from flask import Blueprint, Response, request, jsonify, current_app
+
+from app.services.data_service import DataService
+from app.services.live_curve import get_live_curve_sampler
+from app.services.node_red_poller import get_node_red_poller, get_node_red_snapshot
+from app.utils.helpers import create_response, log_api_call, now_ms
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('stream', __name__)
+
+# 每个推送流占用一个服务线程，限制同时连接数
+_clients = 0
+_clients_lock = threading.Lock()
+
+_KEY_SETS = {
+    'static': DataService.STATIC_KEYS,
+    'dynamic': DataService.DYNAMIC_KEYS,
+    'all': DataService.ALL_KEYS,
+}
+
+_MISSING = object()
+
+
+def _acquire_client_slot() -> bool:
+    global _clients
+    limit = current_app.config.get('SSE_MAX_CLIENTS', 32)
+    with _clients_lock:
+        if _clients >= limit:
+            return False
+        _clients += 1
+        return True
+
+
+def _release_client_slot() -> None:
+    global _clients
+    with _clients_lock:
+        _clients = max(0, _clients - 1)
+
+
+def get_stream_client_count() -> int:
+    with _clients_lock:
+        return _clients
+
+
+def _sse_frame(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """编码一条 SSE 消息"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def _event_stream_response(events: Iterator[str], on_close=None) -> Response:
+    """推送流响应；连接关闭（含生成器尚未开始即断开）时释放连接名额"""
+    response = Response(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # 反向代理不缓冲
+    })
+    response.call_on_close(_release_client_slot)
+    if on_close is not None:
+        response.call_on_close(on_close)
+    return response
+
+
+def _bad_request(error: str):
+    error_response, status_code = create_response(
+        success=False,
+        error=error,
+        message="请求参数错误",
+        status_code=400
+    )
+    return jsonify(error_response), status_code
+
+
+def _too_many_clients():
+    error_response, status_code = create_response(
+        success=False,
+        error='too_many_streams',
+        message="推送连接数已达上限，请稍后重试或改用轮询",
+        status_code=503
+    )
+    return jsonify(error_response), status_code
+
+
+def _parse_since() -> Optional[int]:
+    """续传序号：优先取浏览器重连时携带的 Last-Event-ID，其次是 since 参数"""
+    raw = request.headers.get('Last-Event-ID') or request.args.get('since')
+    if raw in (None, ''):
+        return None
+    return int(raw)
+
+
+@bp.route('/api/stream/measurements', methods=['GET'])
+def stream_measurements():
+    """
+    实时测量值推送
+    参数：set=static|dynamic|all（默认 all）或 keys=k1,k2 指定订阅的键；
+    since 或 Last-Event-ID 为上次收到的序号，与当前快照一致时不重发全量
+    事件：measurements（data 含 seq、full、changed、removed），status（快照过期/恢复）
+    """
+    start_time = now_ms()
+
+    keys_param = request.args.get('keys', '')
+    key_set = request.args.get('set', 'all')
+    if keys_param:
+        keys = [k.strip() for k in keys_param.split(',') if k.strip()]
+    elif key_set in _KEY_SETS:
+        keys = list(_KEY_SETS[key_set])
+    else:
+        return _bad_request(f"set必须是 {', '.join(_KEY_SETS)} 之一")
+    try:
+        since = _parse_since()
+    except ValueError:
+        return _bad_request("since必须是整数")
+
+    if not _acquire_client_slot():
+        return _too_many_clients()
+
+    app = current_app._get_current_object()
+    log_api_call('/api/stream/measurements', 'GET', {'keys': keys, 'since': since}, None, now_ms() - start_time)
+    return _event_stream_response(_measurement_events(app, keys, since))
+
+
+def _next_snapshot(version: int, wait_s: float, poll_s: float):
+    """等待下一份快照：轮询线程运行时等待其发布通知，否则按采样间隔自行采集"""
+    poller = get_node_red_poller()
+    if poller is not None and poller.running:
+        poller.wait_for_change(version, wait_s)
+    else:
+        time.sleep(min(wait_s, poll_s))
+    return get_node_red_snapshot()
+
+
+def _measurement_events(app, keys: List[str], since: Optional[int]) -> Iterator[str]:
+    heartbeat_s = max(1.0, float(app.config.get('SSE_HEARTBEAT_S', 15)))
+    poll_s = max(0.05, app.config.get('NODE_RED_POLL_INTERVAL_MS', 1000) / 1000.0)
+    wanted = set(keys)
+    yield f"retry: {int(app.config.get('SSE_RETRY_MS', 3000))}\n\n"
+    with app.app_context():
+        sent: Optional[Dict[str, Any]] = None
+        version = -1
+        stale = None
+        first = True
+        last_write = time.monotonic()
+        while True:
+            snapshot = get_node_red_snapshot() if first else _next_snapshot(version, heartbeat_s, poll_s)
+            is_stale = not snapshot.values
+            if (first and is_stale) or (not first and is_stale != stale):
+                yield _sse_frame('status', {'stale': is_stale, **snapshot.meta()})
+                last_write = time.monotonic()
+            stale = is_stale
+
+            if not is_stale and (first or snapshot.version != version or not snapshot.polled):
+                values = {k: v for k, v in snapshot.values.items() if k in wanted}
+                if first and since is not None and snapshot.polled and snapshot.version == since:
+                    # 客户端已持有该版本，只推送此后的变化
+                    sent = values
+                else:
+                    previous = sent or {}
+                    changed = {k: v for k, v in values.items() if previous.get(k, _MISSING) != v}
+                    removed = [k for k in previous if k not in values]
+                    if changed or removed or sent is None:
+                        yield _sse_frame('measurements', {
+                            'seq': snapshot.version,
+                            'full': sent is None,
+                            'changed': changed,
+                            'removed': removed,
+                            'fetched_at': snapshot.fetched_at,
+                        }, snapshot.version if snapshot.polled else None)
+                        last_write = time.monotonic()
+                    sent = values
+                version = snapshot.version
+            first = False
+
+            if time.monotonic() - last_write >= heartbeat_s:
+                yield f": ping {now_ms()}\n\n"
+                last_write = time.monotonic()
+
+
+@bp.route('/api/stream/hysteresis', methods=['GET'])
+def stream_hysteresis():
+    """
+    实时滞回曲线推送（角位移/扭矩采样点）
+    参数：since 或 Last-Event-ID 为上次收到的最后序号（缺省时从当前最新点之后开始）；
+    batch_ms 为两帧之间的最小间隔，max_points 为单帧最多点数
+    事件：points（data 为列式增量帧：seq 首点序号、t0 首点时间戳、dt 相邻点时间差、angle、torque，
+    gap=true 表示请求的序号已不在缓冲区内、中间有点丢失）
+    """
+    start_time = now_ms()
+    try:
+        since = _parse_since()
+        batch_ms = request.args.get('batch_ms', current_app.config.get('LIVE_CURVE_BATCH_MS', 200), type=int)
+        max_points = request.args.get('max_points', 500, type=int)
+    except ValueError:
+        return _bad_request("since必须是整数")
+    batch_ms = max(0, min(batch_ms or 0, 5000))
+    max_points = max(1, min(max_points or 500, 5000))
+
+    if not _acquire_client_slot():
+        return _too_many_clients()
+
+    app = current_app._get_current_object()
+    sampler = get_live_curve_sampler(app)
+    sampler.subscribe()
+    log_api_call('/api/stream/hysteresis', 'GET', {'since': since, 'batch_ms': batch_ms}, None,
+                 now_ms() - start_time)
+    cursor = sampler.head if since is None else since
+    return _event_stream_response(
+        _hysteresis_events(app, sampler, cursor, batch_ms / 1000.0, max_points),
+        on_close=sampler.unsubscribe
+    )
+
+
+def _points_frame(points, gap: bool) -> Dict[str, Any]:
+    """列式增量帧：时间戳以首点为基准按差值编码"""
+    timestamps = [p[1] for p in points]
+    return {
+        'seq': points[0][0],
+        'n': len(points),
+        't0': timestamps[0],
+        'dt': [b - a for a, b in zip(timestamps, timestamps[1:])],
+        'angle': [p[2] for p in points],
+        'torque': [p[3] for p in points],
+        'gap': gap,
+    }
+
+
+def _hysteresis_events(app, sampler, cursor: int, batch_s: float, max_points: int) -> Iterator[str]:
+    heartbeat_s = max(1.0, float(app.config.get('SSE_HEARTBEAT_S', 15)))
+    yield f"retry: {int(app.config.get('SSE_RETRY_MS', 3000))}\n\n"
+    last_write = time.monotonic()
+    while True:
+        if not sampler.wait_for_points(cursor, heartbeat_s):
+            if time.monotonic() - last_write >= heartbeat_s:
+                yield f": ping {now_ms()}\n\n"
+                last_write = time.monotonic()
+            continue
+        # 攒批：同一帧内合并该间隔内到达的所有点
+        delay = last_write + batch_s - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        points, gap = sampler.read_since(cursor, max_points)
+        if not points:
+            continue
+        cursor = points[-1][0]
+        yield _sse_frame('points', _points_frame(points, gap), cursor)
+        last_write = time.monotonic()
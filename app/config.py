@@ -17,10 +17,95 @@ class Config:
     
     # 数据库配置
     DATABASE_PATH = os.environ.get('DATABASE_PATH') or str(BASE_DIR / 'data' / 'database' / 'data.db')
+
+    # 数据库连接池配置
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))  # 等待空闲连接的最长秒数
+    DB_CONN_MAX_LIFETIME = int(os.environ.get('DB_CONN_MAX_LIFETIME', '3600'))  # 连接最长存活秒数，0表示不回收
+    DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', '5000'))
+    DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', str(128 * 1024 * 1024)))
+    DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', '16384'))
+    
+    # SQL执行统计与慢查询日志
+    DB_QUERY_STATS_ENABLED = os.environ.get('DB_QUERY_STATS_ENABLED', 'True').lower() == 'true'
+    DB_SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', '200'))
+    DB_SLOW_QUERY_PLAN_INTERVAL_S = float(os.environ.get('DB_SLOW_QUERY_PLAN_INTERVAL_S', '60'))  # 同一语句两次采集执行计划的最小间隔
+    
+    # 入库写线程（组提交）配置
+    INGEST_WRITER_ENABLED = os.environ.get('INGEST_WRITER_ENABLED', 'True').lower() == 'true'
+    INGEST_QUEUE_SIZE = int(os.environ.get('INGEST_QUEUE_SIZE', '1000'))
+    INGEST_FLUSH_ROWS = int(os.environ.get('INGEST_FLUSH_ROWS', '500'))
+    INGEST_FLUSH_INTERVAL_MS = int(os.environ.get('INGEST_FLUSH_INTERVAL_MS', '200'))
+    
+    # 曲线打包存储的浮点类型：f8(float64) 或 f4(float32)
+    CURVE_STORAGE_DTYPE = os.environ.get('CURVE_STORAGE_DTYPE', 'f8')
     
+    # 数据保留与压缩配置（天数为0表示永久保留）
+    RETENTION_ENABLED = os.environ.get('RETENTION_ENABLED', 'True').lower() == 'true'
+    RETENTION_INTERVAL_S = int(os.environ.get('RETENTION_INTERVAL_S', '3600'))
+    RETENTION_BATCH_SIZE = int(os.environ.get('RETENTION_BATCH_SIZE', '2000'))
+    RETENTION_PAUSE_MS = int(os.environ.get('RETENTION_PAUSE_MS', '50'))  # 批次之间让出写锁的时间
+    RETENTION_VACUUM_PAGES = int(os.environ.get('RETENTION_VACUUM_PAGES', '1000'))
+    DATA_RETENTION_DAYS = int(os.environ.get('DATA_RETENTION_DAYS', '30'))
+    ROLLUP_1S_RETENTION_DAYS = int(os.environ.get('ROLLUP_1S_RETENTION_DAYS', '30'))
+    ROLLUP_1M_RETENTION_DAYS = int(os.environ.get('ROLLUP_1M_RETENTION_DAYS', '365'))
+    ROLLUP_1H_RETENTION_DAYS = int(os.environ.get('ROLLUP_1H_RETENTION_DAYS', '0'))
+    COMMAND_LOG_RETENTION_DAYS = int(os.environ.get('COMMAND_LOG_RETENTION_DAYS', '90'))
+    COMMAND_LOG_ID_BLOCK = int(os.environ.get('COMMAND_LOG_ID_BLOCK', '1000'))  # 每次预留的命令日志ID个数
+
     # Node-RED配置
     NODE_RED_BASE_URL = os.environ.get('NODE_RED_BASE_URL', 'http://127.0.0.1:1880')
     NODE_RED_TIMEOUT = int(os.environ.get('NODE_RED_TIMEOUT', '5'))
+    NODE_RED_CONNECT_TIMEOUT = float(os.environ.get('NODE_RED_CONNECT_TIMEOUT', '2'))  # 建立TCP连接的超时，读取超时沿用 NODE_RED_TIMEOUT
+    
+    # Node-RED 后台轮询（服务端统一采样，接口读取共享快照）
+    NODE_RED_POLLER_ENABLED = os.environ.get('NODE_RED_POLLER_ENABLED', 'True').lower() == 'true'
+    NODE_RED_POLL_INTERVAL_MS = int(os.environ.get('NODE_RED_POLL_INTERVAL_MS', '1000'))
+    NODE_RED_SNAPSHOT_MAX_AGE_MS = int(os.environ.get('NODE_RED_SNAPSHOT_MAX_AGE_MS', '5000'))  # 超过该时长的快照视为过期，回退数据库
+    NODE_RED_POLL_PERSIST = os.environ.get('NODE_RED_POLL_PERSIST', 'True').lower() == 'true'  # 每次采样入库一次
+    NODE_RED_FETCH_REUSE_MS = int(os.environ.get('NODE_RED_FETCH_REUSE_MS', '250'))  # 并发采集合并后，结果在该窗口内直接复用
+    
+    # Node-RED 熔断器：连续失败达到阈值后跳闸，按指数退避发送探测请求
+    NODE_RED_BREAKER_THRESHOLD = int(os.environ.get('NODE_RED_BREAKER_THRESHOLD', '3'))
+    NODE_RED_BREAKER_BACKOFF_S = float(os.environ.get('NODE_RED_BREAKER_BACKOFF_S', '1'))
+    NODE_RED_BREAKER_MAX_BACKOFF_S = float(os.environ.get('NODE_RED_BREAKER_MAX_BACKOFF_S', '30'))
+
+    # 批量命令执行：sequential / parallel / pipelined
+    COMMAND_BATCH_DEFAULT_MODE = os.environ.get('COMMAND_BATCH_DEFAULT_MODE', 'sequential')
+    COMMAND_BATCH_MAX_CONCURRENCY = int(os.environ.get('COMMAND_BATCH_MAX_CONCURRENCY', '8'))  # 请求中的 max_concurrency 不超过该值
+
+    # 异步命令：调度队列容量、已完成命令在跟踪器中的保留时长与设定值合并
+    COMMAND_QUEUE_SIZE = int(os.environ.get('COMMAND_QUEUE_SIZE', '256'))
+    COMMAND_TRACKER_RETENTION_S = int(os.environ.get('COMMAND_TRACKER_RETENTION_S', '300'))
+    COMMAND_COALESCE_COMMANDS = os.environ.get('COMMAND_COALESCE_COMMANDS', 'set_speed_rpm,set_load_level')  # 同一地址只发送最新值的设定值命令
+    COMMAND_COALESCE_WINDOW_MS = int(os.environ.get('COMMAND_COALESCE_WINDOW_MS', '100'))  # 0表示不合并
+
+    # 安全命令优先通道：不排队、不受熔断拦截，经独立预热连接发送
+    COMMAND_PRIORITY_COMMANDS = os.environ.get('COMMAND_PRIORITY_COMMANDS', 'emergency_stop,stop_test,reset')
+    COMMAND_PRIORITY_TIMEOUT_S = float(os.environ.get('COMMAND_PRIORITY_TIMEOUT_S', '2'))
+    COMMAND_PRIORITY_CONNECT_TIMEOUT_S = float(os.environ.get('COMMAND_PRIORITY_CONNECT_TIMEOUT_S', '1'))
+    COMMAND_PRIORITY_WARM_INTERVAL_S = float(os.environ.get('COMMAND_PRIORITY_WARM_INTERVAL_S', '4'))  # 需小于 Node-RED 的 keep-alive 空闲超时(5s)，0表示不预热
+    COMMAND_PRIORITY_BUDGET_MS = float(os.environ.get('COMMAND_PRIORITY_BUDGET_MS', '500'))  # 端到端延迟预算，超出时告警并计数
+
+    # 推送流（SSE）：同时连接数上限、心跳间隔与浏览器重连间隔
+    SSE_MAX_CLIENTS = int(os.environ.get('SSE_MAX_CLIENTS', '32'))
+    SSE_HEARTBEAT_S = float(os.environ.get('SSE_HEARTBEAT_S', '15'))
+    SSE_RETRY_MS = int(os.environ.get('SSE_RETRY_MS', '3000'))
+    
+    # 实时滞回曲线推送：采样周期、缓冲点数、推送帧最小间隔、无订阅者后采样线程的退出延时
+    LIVE_CURVE_SAMPLE_MS = int(os.environ.get('LIVE_CURVE_SAMPLE_MS', '100'))
+    LIVE_CURVE_BUFFER_SIZE = int(os.environ.get('LIVE_CURVE_BUFFER_SIZE', '20000'))
+    LIVE_CURVE_BATCH_MS = int(os.environ.get('LIVE_CURVE_BATCH_MS', '200'))
+    LIVE_CURVE_IDLE_TIMEOUT_S = float(os.environ.get('LIVE_CURVE_IDLE_TIMEOUT_S', '10'))
+    
+    # 共享HTTP会话连接池（Node-RED 客户端）
+    HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', '4'))  # 缓存的主机连接池数量
+    HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', '16'))  # 每个主机保留的长连接数
+    HTTP_POOL_BLOCK = os.environ.get('HTTP_POOL_BLOCK', 'False').lower() == 'true'
+    HTTP_TCP_KEEPALIVE = os.environ.get('HTTP_TCP_KEEPALIVE', 'True').lower() == 'true'
+    
+    # 配置缓存：监视 settings.json 与静态配置映射外部修改的检查间隔
+    CONFIG_WATCH_INTERVAL_S = float(os.environ.get('CONFIG_WATCH_INTERVAL_S', '2'))
     
     # 服务器配置
     HOST = os.environ.get('FLASK_HOST', '0.0.0.0')
@@ -56,6 +141,9 @@ class TestingConfig(Config):
     """测试环境配置"""
     TESTING = True
     DATABASE_PATH = ':memory:'  # 使用内存数据库
+    INGEST_WRITER_ENABLED = False  # 测试时同步写入，便于断言
+    RETENTION_ENABLED = False
+    NODE_RED_POLLER_ENABLED = False
 
 
 # 配置字典
@@ -3,9 +3,15 @@
 """
 import logging
 import math
-from typing import List, Dict, Any, Optional, Tuple
-from app.utils.database import execute_query, execute_many
-from app.utils.helpers import now_ms
+from functools import partial
+from typing import Callable, List, Dict, Any, Optional, Tuple, Iterator
+from flask import current_app, has_app_context
+from app.utils.database import execute_query
+from app.services.ingest_writer import submit_write
+from app.services.retention_service import delete_in_batches
+from app.utils import data_version
+from app.utils.helpers import now_ms, encode_cursor, decode_cursor
+from app.utils.curve_codec import DTYPE_FLOAT64, pack_floats, unpack_floats, bounds
 
 logger = logging.getLogger(__name__)
 
@@ -18,112 +24,245 @@ class HysteresisModel:
     CURVE_TYPE_REVERSE = 'reverse'      # 反向曲线
     CURVE_TYPE_HYSTERESIS = 'hysteresis'  # 滞回曲线
     
+    # 试验记录分批清理参数：仍被曲线引用的试验记录保留
+    TEST_RUN_RETENTION_TARGET = {
+        'table': 'test_runs',
+        'column': 'ts',
+        'extra_where': 'NOT EXISTS (SELECT 1 FROM curves WHERE curves.run_id = test_runs.id)'
+    }
+    
+    # 曲线行的元数据列（不含打包数组）
+    _CURVE_META_COLUMNS = '''id, run_id, ts, curve_type, dtype, point_count,
+                   angle_min, angle_max, torque_min, torque_max'''
+    
+    @staticmethod
+    def _storage_dtype() -> str:
+        """曲线打包存储的浮点类型"""
+        if has_app_context():
+            return current_app.config.get('CURVE_STORAGE_DTYPE', DTYPE_FLOAT64)
+        return DTYPE_FLOAT64
+    
+    @staticmethod
+    def _on_commit(curve_type: str) -> None:
+        data_version.bump_keys(data_version.DATASET_HYSTERESIS, [curve_type])
+    
     @staticmethod
     def save_hysteresis_points(points: List[Dict[str, float]], 
                              curve_type: str = 'hysteresis',
-                             timestamp: Optional[int] = None) -> int:
-        """保存滞回曲线数据点"""
+                             timestamp: Optional[int] = None,
+                             durable: bool = False,
+                             on_error: Optional[Callable[[Exception], None]] = None) -> int:
+        """
+        保存滞回曲线数据点
+        整条曲线打包为一行 curves 记录，并归属到同一时间戳的测试运行（test_runs）；
+        非 durable 写入异步提交失败时调用 on_error(异常)
+        """
         if not points:
             return 0
         
         ts = timestamp or now_ms()
         
-        # 准备批量插入数据
-        insert_data = []
+        angles = []
+        torques = []
         for point in points:
             if 'angle' in point and 'torque' in point:
-                insert_data.append((
-                    ts,
-                    float(point['angle']),
-                    float(point['torque']),
-                    curve_type
-                ))
+                angles.append(float(point['angle']))
+                torques.append(float(point['torque']))
         
-        if not insert_data:
+        if not angles:
             logger.warning("没有有效的滞回曲线数据点")
             return 0
         
-        query = '''
-            INSERT INTO hysteresis_points (ts, angle, torque, curve_type)
-            VALUES (?, ?, ?, ?)
+        dtype = HysteresisModel._storage_dtype()
+        angle_min, angle_max = bounds(angles)
+        torque_min, torque_max = bounds(torques)
+        
+        run_query = 'INSERT OR IGNORE INTO test_runs (ts) VALUES (?)'
+        curve_query = '''
+            INSERT INTO curves (run_id, ts, curve_type, dtype, point_count,
+                                angle_min, angle_max, torque_min, torque_max, angles, torques)
+            VALUES ((SELECT id FROM test_runs WHERE ts = ?), ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         '''
+        curve_row = (
+            ts, ts, curve_type, dtype, len(angles),
+            angle_min, angle_max, torque_min, torque_max,
+            pack_floats(angles, dtype), pack_floats(torques, dtype)
+        )
         
         try:
-            return execute_many(query, insert_data)
+            submit_write([(run_query, [(ts,)]), (curve_query, [curve_row])], durable=durable,
+                         on_commit=partial(HysteresisModel._on_commit, curve_type), on_error=on_error)
+            return len(angles)
         except Exception as e:
             logger.error(f"保存滞回曲线数据失败: {e}")
             raise
     
     @staticmethod
-    def get_latest_hysteresis_points(curve_type: Optional[str] = None) -> List[Dict[str, float]]:
-        """获取最新的滞回曲线数据"""
-        if curve_type:
-            query = '''
-                SELECT angle, torque, curve_type
-                FROM hysteresis_points
-                WHERE ts = (SELECT MAX(ts) FROM hysteresis_points WHERE curve_type = ?)
-                AND curve_type = ?
-                ORDER BY id
-            '''
-            params = [curve_type, curve_type]
+    def _curve_from_row(row, with_arrays: bool = True, raw: bool = False) -> Dict[str, Any]:
+        """将 curves 行转换为字典，angles/torques 解包为 array（raw=True 时保留小端二进制原样）"""
+        curve = {
+            'id': row['id'],
+            'run_id': row['run_id'],
+            'ts': row['ts'],
+            'curve_type': row['curve_type'],
+            'dtype': row['dtype'],
+            'point_count': row['point_count'],
+            'angle_range': {'min': row['angle_min'], 'max': row['angle_max']},
+            'torque_range': {'min': row['torque_min'], 'max': row['torque_max']}
+        }
+        if with_arrays and raw:
+            curve['angles'] = bytes(row['angles'] or b'')
+            curve['torques'] = bytes(row['torques'] or b'')
+        elif with_arrays:
+            curve['angles'] = unpack_floats(row['angles'], row['dtype'])
+            curve['torques'] = unpack_floats(row['torques'], row['dtype'])
+        return curve
+    
+    @staticmethod
+    def _curves_to_points(curves: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+        """将打包曲线展开为旧接口使用的点列表"""
+        points = []
+        for curve in curves:
+            curve_type = curve['curve_type']
+            points.extend(
+                {'angle': a, 'torque': t, 'curve_type': curve_type}
+                for a, t in zip(curve['angles'], curve['torques'])
+            )
+        return points
+    
+    @staticmethod
+    def get_curves(timestamp: Optional[int] = None, curve_type: Optional[str] = None,
+                   with_arrays: bool = True, raw: bool = False) -> List[Dict[str, Any]]:
+        """
+        获取打包曲线（每条曲线一行，不展开为逐点字典）
+        未指定时间戳时返回最新时间戳下的曲线；raw=True 时数组保持存储的二进制
+        """
+        columns = HysteresisModel._CURVE_META_COLUMNS
+        if with_arrays:
+            columns += ', angles, torques'
+        
+        if timestamp is None:
+            if curve_type:
+                ts_expr = '(SELECT MAX(ts) FROM curves WHERE curve_type = ?)'
+                params: List[Any] = [curve_type]
+            else:
+                ts_expr = '(SELECT MAX(ts) FROM curves)'
+                params = []
         else:
-            query = '''
-                SELECT angle, torque, curve_type
-                FROM hysteresis_points
-                WHERE ts = (SELECT MAX(ts) FROM hysteresis_points)
-                ORDER BY id
-            '''
-            params = []
+            ts_expr = '?'
+            params = [timestamp]
+        
+        query = f'SELECT {columns} FROM curves WHERE ts = {ts_expr}'
+        if curve_type:
+            query += ' AND curve_type = ?'
+            params.append(curve_type)
+        query += ' ORDER BY id'
         
         try:
             rows = execute_query(query, params, fetch_all=True)
-            return [{'angle': row['angle'], 'torque': row['torque'], 'curve_type': dict(row).get('curve_type', 'hysteresis')} for row in rows]
         except Exception as e:
-            logger.error(f"获取最新滞回曲线数据失败: {e}")
-            return []
+            logger.error(f"获取打包曲线失败: {e}")
+            raise
+        
+        return [HysteresisModel._curve_from_row(row, with_arrays, raw) for row in rows]
     
     @staticmethod
-    def get_hysteresis_by_timestamp(timestamp: int, curve_type: Optional[str] = None) -> List[Dict[str, float]]:
-        """根据时间戳获取滞回曲线数据"""
+    def get_curves_page(start_ts: int, end_ts: int, curve_type: Optional[str] = None,
+                        limit: int = 20, cursor: Optional[str] = None,
+                        with_arrays: bool = True) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        键集分页读取时间范围内的曲线，按 (ts, id) 升序，游标为 "ts:id"
+        返回 (curves, next_cursor)
+        """
+        after_ts, after_id = decode_cursor(cursor, 2) or (start_ts - 1, 0)
+        columns = HysteresisModel._CURVE_META_COLUMNS
+        if with_arrays:
+            columns += ', angles, torques'
+        query = f'''
+            SELECT {columns} FROM curves
+            WHERE ts BETWEEN ? AND ? AND (ts, id) > (?, ?)
+        '''
+        params: List[Any] = [start_ts, end_ts, after_ts, after_id]
         if curve_type:
-            query = '''
-                SELECT angle, torque, curve_type
-                FROM hysteresis_points
-                WHERE ts = ? AND curve_type = ?
-                ORDER BY id
-            '''
-            params = [timestamp, curve_type]
-        else:
-            query = '''
-                SELECT angle, torque, curve_type
-                FROM hysteresis_points
-                WHERE ts = ?
-                ORDER BY id
-            '''
-            params = [timestamp]
+            query += ' AND curve_type = ?'
+            params.append(curve_type)
+        query += ' ORDER BY ts, id LIMIT ?'
+        params.append(limit)
         
         try:
             rows = execute_query(query, params, fetch_all=True)
-            return [{'angle': row['angle'], 'torque': row['torque'], 'curve_type': dict(row).get('curve_type', 'hysteresis')} for row in rows]
         except Exception as e:
-            logger.error(f"根据时间戳获取滞回曲线数据失败: {e}")
-            return []
+            logger.error(f"分页获取曲线失败: {e}")
+            raise
+        
+        next_cursor = encode_cursor(rows[-1]['ts'], rows[-1]['id']) if len(rows) >= limit else None
+        return [HysteresisModel._curve_from_row(row, with_arrays) for row in rows], next_cursor
+    
+    @staticmethod
+    def iter_curves(start_ts: int, end_ts: int, curve_type: Optional[str] = None,
+                    chunk_size: int = 20, cursor: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """逐条产出时间范围内的曲线（含打包数组），每次只读取一页"""
+        while True:
+            curves, cursor = HysteresisModel.get_curves_page(start_ts, end_ts, curve_type, chunk_size, cursor)
+            yield from curves
+            if not cursor:
+                return
+    
+    @staticmethod
+    def iter_hysteresis_points(timestamp: int, curve_type: Optional[str] = None) -> Iterator[Dict[str, float]]:
+        """逐点产出指定时间戳的滞回曲线数据，同一时刻只在内存中保留一条曲线"""
+        for curve in HysteresisModel.iter_curves(timestamp, timestamp, curve_type, chunk_size=1):
+            yield from HysteresisModel._curves_to_points([curve])
+    
+    @staticmethod
+    def get_latest_hysteresis_points(curve_type: Optional[str] = None) -> List[Dict[str, float]]:
+        """获取最新的滞回曲线数据"""
+        curves = HysteresisModel.get_curves(curve_type=curve_type)
+        return HysteresisModel._curves_to_points(curves)
+    
+    @staticmethod
+    def get_hysteresis_by_timestamp(timestamp: int, curve_type: Optional[str] = None) -> List[Dict[str, float]]:
+        """根据时间戳获取滞回曲线数据"""
+        curves = HysteresisModel.get_curves(timestamp, curve_type)
+        return HysteresisModel._curves_to_points(curves)
     
     @staticmethod
     def get_hysteresis_timestamps(limit: int = 10) -> List[int]:
         """获取滞回曲线数据的时间戳列表"""
         query = '''
-            SELECT DISTINCT ts
-            FROM hysteresis_points
+            SELECT ts
+            FROM test_runs
             ORDER BY ts DESC
             LIMIT ?
         '''
         
         try:
             rows = execute_query(query, [limit], fetch_all=True)
-            return [row['ts'] for row in rows]
         except Exception as e:
             logger.error(f"获取滞回曲线时间戳失败: {e}")
+            raise
+        
+        return [row['ts'] for row in rows]
+    
+    @staticmethod
+    def get_test_runs(limit: int = 10) -> List[Dict[str, Any]]:
+        """获取最近的测试运行及其曲线概要（不读取打包数组）"""
+        query = '''
+            SELECT r.id, r.ts, r.name,
+                   COUNT(c.id) AS curve_count,
+                   COALESCE(SUM(c.point_count), 0) AS point_count
+            FROM test_runs r
+            LEFT JOIN curves c ON c.run_id = r.id
+            GROUP BY r.id
+            ORDER BY r.ts DESC
+            LIMIT ?
+        '''
+        
+        try:
+            rows = execute_query(query, [limit], fetch_all=True)
+            return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"获取测试运行列表失败: {e}")
             return []
     
     @staticmethod
@@ -197,12 +336,13 @@ class HysteresisModel:
     
     @staticmethod
     def delete_old_hysteresis_data(days: int = 30) -> int:
-        """删除旧的滞回曲线数据"""
+        """删除旧的滞回曲线数据（分批删除，避免长时间占用写锁）"""
         cutoff_ts = now_ms() - (days * 24 * 60 * 60 * 1000)
-        query = 'DELETE FROM hysteresis_points WHERE ts < ?'
         
         try:
-            return execute_query(query, [cutoff_ts])
+            deleted = delete_in_batches('curves', 'ts', cutoff_ts)['rows']
+            delete_in_batches(**HysteresisModel.TEST_RUN_RETENTION_TARGET, cutoff=cutoff_ts)
+            return deleted
         except Exception as e:
             logger.error(f"删除旧滞回曲线数据失败: {e}")
             return 0
@@ -2,9 +2,14 @@
 测量数据模型
 """
 import logging
-from typing import Dict, List, Optional, Any
-from app.utils.database import execute_query, execute_many
-from app.utils.helpers import now_ms, normalize_measurement_data
+import threading
+from functools import partial
+from typing import Callable, Dict, List, Optional, Any, Iterator, Tuple
+from app.utils.database import execute_query
+from app.services.ingest_writer import submit_write
+from app.services.retention_service import delete_in_batches
+from app.utils import data_version
+from app.utils.helpers import now_ms, normalize_measurement_data, encode_cursor, decode_cursor
 
 logger = logging.getLogger(__name__)
 
@@ -12,9 +17,63 @@ logger = logging.getLogger(__name__)
 class MeasurementModel:
     """测量数据模型"""
     
+    # 汇总时间桶分辨率（毫秒）：1分钟 / 1小时
+    # 默认每秒采样一次，1秒桶与原始样本几乎一一对应，不再生成（旧版本写入的1秒桶由保留策略清理）
+    ROLLUP_RESOLUTIONS_MS = (60 * 1000, 60 * 60 * 1000)
+    
+    # 样本表分批清理参数：按序列逐个在主键上范围扫描过期数据
+    SAMPLE_RETENTION_TARGET = {
+        'table': 'samples',
+        'column': 'p.ts',
+        'pk': 'series_id, ts',
+        'select_pk': 'p.series_id, p.ts',
+        'source': 'series s CROSS JOIN samples p ON p.series_id = s.id'
+    }
+    
+    # 汇总增量只计入新样本：同一 (序列, 毫秒) 已有样本时跳过，须在样本插入之前执行
+    _ROLLUP_UPSERT = '''
+        INSERT INTO measurement_rollups
+            (key, resolution_ms, bucket_ts, count, value_sum, value_min, value_max, value_last, last_ts)
+        SELECT ?, ?, ?, 1, ?, ?, ?, ?, ?
+        WHERE NOT EXISTS (
+            SELECT 1 FROM samples
+            WHERE series_id = (SELECT id FROM series WHERE key = ?) AND ts = ?
+        )
+        ON CONFLICT(key, resolution_ms, bucket_ts) DO UPDATE SET
+            count = count + 1,
+            value_sum = value_sum + excluded.value_sum,
+            value_min = MIN(value_min, excluded.value_min),
+            value_max = MAX(value_max, excluded.value_max),
+            value_last = CASE WHEN excluded.last_ts >= last_ts THEN excluded.value_last ELSE value_last END,
+            last_ts = MAX(last_ts, excluded.last_ts)
+    '''
+    
+    # 已提交的各键最新值 {key: (ts, value)}，用于判断哪些键的数值发生了变化
+    _committed: Dict[str, Tuple[int, float]] = {}
+    _committed_lock = threading.Lock()
+    
     @staticmethod
-    def save_measurements(data: Dict[str, Any], timestamp: Optional[int] = None) -> int:
-        """保存测量数据"""
+    def _on_commit(ts: int, values: Dict[str, float]) -> None:
+        """提交后回调（写线程中执行）：递增数据版本与写入各键的版本，数值有变化的键唤醒长轮询"""
+        changed = []
+        with MeasurementModel._committed_lock:
+            for key, value in values.items():
+                previous = MeasurementModel._committed.get(key)
+                if previous is not None and previous[0] > ts:
+                    continue  # 乱序到达的旧数据不影响最新值
+                if previous is None or previous[1] != value:
+                    changed.append(key)
+                MeasurementModel._committed[key] = (ts, value)
+        data_version.bump_keys(data_version.DATASET_MEASUREMENTS, changed, values.keys())
+    
+    @staticmethod
+    def save_measurements(data: Dict[str, Any], timestamp: Optional[int] = None,
+                          durable: bool = False,
+                          on_error: Optional[Callable[[Exception], None]] = None) -> int:
+        """
+        保存测量数据（经写线程组提交）
+        durable=True 时等待数据真正提交后再返回；否则异步提交失败时调用 on_error(异常)
+        """
         if not data:
             return 0
         
@@ -32,41 +91,69 @@ class MeasurementModel:
                 item.get('unit', '')
             ))
         
+        # 序列字典：新键插入，addr/unit 变化时更新，未变化时不产生写入
+        series_query = '''
+            INSERT INTO series (key, addr, unit)
+            VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET addr = excluded.addr, unit = excluded.unit
+            WHERE addr IS NOT excluded.addr OR unit IS NOT excluded.unit
+        '''
+        series_data = [(key, addr, unit) for _ts, key, addr, _value, unit in insert_data]
+        
+        # 样本只存 (series_id, ts, value)；同一毫秒重复写入时保留第一次，与汇总计数一致
         query = '''
-            INSERT INTO measurements (ts, key, addr, value, unit)
+            INSERT OR IGNORE INTO samples (series_id, ts, value)
+            VALUES ((SELECT id FROM series WHERE key = ?), ?, ?)
+        '''
+        sample_data = [(key, row_ts, value) for row_ts, key, _addr, value, _unit in insert_data]
+        
+        # 最新值表与历史数据在同一事务中更新；乱序到达的旧数据与同一毫秒的重复写入不覆盖已有值
+        latest_query = '''
+            INSERT INTO latest_measurements (ts, key, addr, value, unit)
             VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                ts = excluded.ts, value = excluded.value,
+                unit = excluded.unit, addr = excluded.addr
+            WHERE excluded.ts > latest_measurements.ts
         '''
         
+        # 各分辨率时间桶的增量汇总
+        rollup_data = []
+        for row_ts, key, _addr, value, _unit in insert_data:
+            for resolution in MeasurementModel.ROLLUP_RESOLUTIONS_MS:
+                bucket_ts = row_ts - row_ts % resolution
+                rollup_data.append((key, resolution, bucket_ts, value, value, value, value, row_ts, key, row_ts))
+        
         try:
-            return execute_many(query, insert_data)
+            submit_write([
+                (series_query, series_data),
+                (MeasurementModel._ROLLUP_UPSERT, rollup_data),
+                (query, sample_data),
+                (latest_query, insert_data)
+            ], durable=durable, on_commit=partial(
+                MeasurementModel._on_commit, ts, {key: value for _ts, key, _addr, value, _unit in insert_data}
+            ), on_error=on_error)
+            return len(insert_data)
         except Exception as e:
             logger.error(f"保存测量数据失败: {e}")
             raise
     
     @staticmethod
     def get_latest_measurements(keys: Optional[List[str]] = None) -> Dict[str, Any]:
-        """获取最新的测量数据"""
+        """获取最新的测量数据（读取最新值表，与历史数据量无关）"""
         if keys:
             placeholders = ','.join(['?' for _ in keys])
             query = f'''
                 SELECT key, value, unit, addr, ts
-                FROM measurements
+                FROM latest_measurements
                 WHERE key IN ({placeholders})
-                AND ts = (
-                    SELECT MAX(ts) FROM measurements m2 
-                    WHERE m2.key = measurements.key
-                )
                 ORDER BY key
             '''
             params = keys
         else:
             query = '''
                 SELECT key, value, unit, addr, ts
-                FROM measurements
-                WHERE ts = (
-                    SELECT MAX(ts) FROM measurements m2 
-                    WHERE m2.key = measurements.key
-                )
+                FROM latest_measurements
                 ORDER BY key
             '''
             params = []
@@ -91,20 +178,22 @@ class MeasurementModel:
     @staticmethod
     def get_measurements_by_timerange(start_ts: int, end_ts: int, 
                                     keys: Optional[List[str]] = None) -> List[Dict[str, Any]]:
-        """根据时间范围获取测量数据"""
+        """根据时间范围获取测量数据（created_at 由 ts 换算，UTC）"""
+        # 以序列表为外层循环，每个序列在样本主键上做范围扫描
         base_query = '''
-            SELECT key, value, unit, addr, ts, created_at
-            FROM measurements
-            WHERE ts BETWEEN ? AND ?
+            SELECT s.key, p.value, s.unit, s.addr, p.ts,
+                   datetime(p.ts / 1000, 'unixepoch') AS created_at
+            FROM series s CROSS JOIN samples p ON p.series_id = s.id
+            WHERE p.ts BETWEEN ? AND ?
         '''
         params = [start_ts, end_ts]
         
         if keys:
             placeholders = ','.join(['?' for _ in keys])
-            base_query += f' AND key IN ({placeholders})'
+            base_query += f' AND s.key IN ({placeholders})'
             params.extend(keys)
         
-        base_query += ' ORDER BY ts DESC, key'
+        base_query += ' ORDER BY p.ts DESC, s.key'
         
         try:
             rows = execute_query(base_query, params, fetch_all=True)
@@ -117,10 +206,11 @@ class MeasurementModel:
     def get_measurement_history(key: str, limit: int = 100) -> List[Dict[str, Any]]:
         """获取指定键的历史数据"""
         query = '''
-            SELECT value, unit, addr, ts, created_at
-            FROM measurements
-            WHERE key = ?
-            ORDER BY ts DESC
+            SELECT p.value, s.unit, s.addr, p.ts,
+                   datetime(p.ts / 1000, 'unixepoch') AS created_at
+            FROM series s CROSS JOIN samples p ON p.series_id = s.id
+            WHERE s.key = ?
+            ORDER BY p.ts DESC
             LIMIT ?
         '''
         
@@ -131,14 +221,196 @@ class MeasurementModel:
             logger.error(f"获取测量历史数据失败: {e}")
             return []
     
+    @staticmethod
+    def get_measurements_page(start_ts: int, end_ts: int, keys: Optional[List[str]] = None,
+                              limit: int = 1000, cursor: Optional[str] = None
+                              ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        键集分页读取时间范围内的测量数据
+        按样本主键 (series_id, ts) 升序返回，游标为 "series_id:ts"；
+        每页只扫描本页数据，返回 (rows, next_cursor)，无后续数据时 next_cursor 为 None
+        """
+        after_sid, after_ts = decode_cursor(cursor, 2) or (0, 0)
+        query = '''
+            SELECT s.id AS series_id, s.key, p.value, s.unit, s.addr, p.ts,
+                   datetime(p.ts / 1000, 'unixepoch') AS created_at
+            FROM series s CROSS JOIN samples p ON p.series_id = s.id
+            WHERE s.id >= ? AND (s.id > ? OR p.ts > ?)
+            AND p.ts BETWEEN ? AND ?
+        '''
+        params: List[Any] = [after_sid, after_sid, after_ts, start_ts, end_ts]
+        
+        if keys:
+            placeholders = ','.join(['?' for _ in keys])
+            query += f' AND s.key IN ({placeholders})'
+            params.extend(keys)
+        
+        query += ' ORDER BY s.id, p.ts LIMIT ?'
+        params.append(limit)
+        
+        try:
+            rows = execute_query(query, params, fetch_all=True)
+        except Exception as e:
+            logger.error(f"分页获取测量数据失败: {e}")
+            raise
+        
+        next_cursor = None
+        if len(rows) >= limit:
+            next_cursor = encode_cursor(rows[-1]['series_id'], rows[-1]['ts'])
+        result = []
+        for row in rows:
+            item = dict(row)
+            item.pop('series_id', None)
+            result.append(item)
+        return result, next_cursor
+    
+    @staticmethod
+    def iter_measurements_by_timerange(start_ts: int, end_ts: int, keys: Optional[List[str]] = None,
+                                       chunk_size: int = 1000,
+                                       cursor: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """逐行产出时间范围内的测量数据，内部按固定大小分页读取，内存占用与范围大小无关"""
+        while True:
+            rows, cursor = MeasurementModel.get_measurements_page(start_ts, end_ts, keys, chunk_size, cursor)
+            yield from rows
+            if not cursor:
+                return
+    
+    @staticmethod
+    def get_measurement_history_page(key: str, limit: int = 100,
+                                     cursor: Optional[str] = None
+                                     ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        键集分页获取指定键的历史数据（按 ts 倒序）
+        游标为上一页最后一条的 ts，返回 (rows, next_cursor)
+        """
+        before = decode_cursor(cursor, 1)
+        query = '''
+            SELECT p.value, s.unit, s.addr, p.ts,
+                   datetime(p.ts / 1000, 'unixepoch') AS created_at
+            FROM series s CROSS JOIN samples p ON p.series_id = s.id
+            WHERE s.key = ?
+        '''
+        params: List[Any] = [key]
+        if before is not None:
+            query += ' AND p.ts < ?'
+            params.append(before[0])
+        query += ' ORDER BY p.ts DESC LIMIT ?'
+        params.append(limit)
+        
+        try:
+            rows = execute_query(query, params, fetch_all=True)
+        except Exception as e:
+            logger.error(f"分页获取测量历史数据失败: {e}")
+            raise
+        
+        next_cursor = encode_cursor(rows[-1]['ts']) if len(rows) >= limit else None
+        return [dict(row) for row in rows], next_cursor
+    
+    @staticmethod
+    def _count_samples(key: str, start_ts: int, end_ts: int) -> int:
+        """
+        统计区间内的原始样本数，避免对原始表做大范围计数扫描：
+        完整落在区间内的时间桶由粗到细累加汇总计数，两端不足一个最细时间桶的部分在样本表主键上计数
+        """
+        total = 0
+        segments = [(start_ts, end_ts + 1)]  # 半开区间 [a, b)
+        for resolution in reversed(MeasurementModel.ROLLUP_RESOLUTIONS_MS):
+            remaining = []
+            for a, b in segments:
+                first = -(-a // resolution) * resolution
+                last = b - b % resolution
+                if first >= last:
+                    remaining.append((a, b))
+                    continue
+                row = execute_query(
+                    '''SELECT COALESCE(SUM(count), 0) AS cnt FROM measurement_rollups
+                       WHERE key = ? AND resolution_ms = ? AND bucket_ts >= ? AND bucket_ts < ?''',
+                    [key, resolution, first, last],
+                    fetch_one=True
+                )
+                total += row['cnt'] if row else 0
+                remaining.extend(seg for seg in ((a, first), (last, b)) if seg[0] < seg[1])
+            segments = remaining
+        for a, b in segments:
+            row = execute_query(
+                '''SELECT COUNT(*) AS cnt FROM samples
+                   WHERE series_id = (SELECT id FROM series WHERE key = ?) AND ts >= ? AND ts < ?''',
+                [key, a, b],
+                fetch_one=True
+            )
+            total += row['cnt'] if row else 0
+        return total
+    
+    @staticmethod
+    def get_measurement_series(key: str, start_ts: int, end_ts: int,
+                               max_points: int = 500) -> Dict[str, Any]:
+        """
+        按点数预算获取时间范围内的曲线数据
+        在不超过 max_points 的前提下选择最细的分辨率：原始数据能放下时返回原始数据，
+        否则依次尝试 1min/1h 汇总桶；都超出预算时使用最粗的 1h 桶
+        每个点包含 ts/min/max/avg/count/last，原始数据的 count 为 1
+        """
+        max_points = max(1, int(max_points))
+        result = {'key': key, 'start_ts': start_ts, 'end_ts': end_ts, 'max_points': max_points}
+        
+        try:
+            coarsest = MeasurementModel.ROLLUP_RESOLUTIONS_MS[-1]
+            raw_estimate = MeasurementModel._count_samples(key, start_ts, end_ts)
+            
+            if raw_estimate <= max_points:
+                rows = execute_query(
+                    '''SELECT ts, value FROM samples
+                       WHERE series_id = (SELECT id FROM series WHERE key = ?)
+                       AND ts BETWEEN ? AND ?
+                       ORDER BY ts''',
+                    [key, start_ts, end_ts],
+                    fetch_all=True
+                )
+                points = [{
+                    'ts': r['ts'], 'min': r['value'], 'max': r['value'],
+                    'avg': r['value'], 'count': 1, 'last': r['value']
+                } for r in rows]
+                result.update({'resolution_ms': 0, 'points': points, 'count': len(points)})
+                return result
+            
+            chosen = coarsest
+            for resolution in MeasurementModel.ROLLUP_RESOLUTIONS_MS:
+                row = execute_query(
+                    '''SELECT COUNT(*) AS cnt FROM measurement_rollups
+                       WHERE key = ? AND resolution_ms = ? AND bucket_ts BETWEEN ? AND ?''',
+                    [key, resolution, start_ts - start_ts % resolution, end_ts],
+                    fetch_one=True
+                )
+                if row and row['cnt'] <= max_points:
+                    chosen = resolution
+                    break
+            
+            rows = execute_query(
+                '''SELECT bucket_ts, count, value_sum, value_min, value_max, value_last
+                   FROM measurement_rollups
+                   WHERE key = ? AND resolution_ms = ? AND bucket_ts BETWEEN ? AND ?
+                   ORDER BY bucket_ts''',
+                [key, chosen, start_ts - start_ts % chosen, end_ts],
+                fetch_all=True
+            )
+            points = [{
+                'ts': r['bucket_ts'], 'min': r['value_min'], 'max': r['value_max'],
+                'avg': r['value_sum'] / r['count'] if r['count'] else None,
+                'count': r['count'], 'last': r['value_last']
+            } for r in rows]
+            result.update({'resolution_ms': chosen, 'points': points, 'count': len(points)})
+            return result
+        except Exception as e:
+            logger.error(f"获取测量曲线数据失败: {e}")
+            raise
+    
     @staticmethod
     def delete_old_measurements(days: int = 30) -> int:
-        """删除旧的测量数据"""
+        """删除旧的测量数据（分批删除，避免长时间占用写锁）"""
         cutoff_ts = now_ms() - (days * 24 * 60 * 60 * 1000)
-        query = 'DELETE FROM measurements WHERE ts < ?'
         
         try:
-            return execute_query(query, [cutoff_ts])
+            return delete_in_batches(**MeasurementModel.SAMPLE_RETENTION_TARGET, cutoff=cutoff_ts)['rows']
         except Exception as e:
             logger.error(f"删除旧测量数据失败: {e}")
             return 0
@@ -147,10 +419,12 @@ class MeasurementModel:
     def get_measurement_stats() -> Dict[str, Any]:
         """获取测量数据统计信息"""
         queries = {
-            'total_count': 'SELECT COUNT(*) as count FROM measurements',
-            'unique_keys': 'SELECT COUNT(DISTINCT key) as count FROM measurements',
-            'latest_timestamp': 'SELECT MAX(ts) as ts FROM measurements',
-            'oldest_timestamp': 'SELECT MIN(ts) as ts FROM measurements'
+            'total_count': 'SELECT COUNT(*) as count FROM samples',
+            'unique_keys': 'SELECT COUNT(*) as count FROM latest_measurements',
+            'latest_timestamp': 'SELECT MAX(ts) as ts FROM latest_measurements',
+            # 每个序列取主键上的最小ts，避免全表扫描
+            'oldest_timestamp': '''SELECT MIN((SELECT MIN(ts) FROM samples WHERE series_id = s.id)) as ts
+                                   FROM series s'''
         }
         
         stats = {}
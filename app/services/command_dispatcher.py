@@ -0,0 +1,727 @@
+"""
+命令调度服务
+异步命令：接口分配日志ID后立即返回，由调度线程按入队顺序发送并记录结果，
+客户端通过待处理命令跟踪器轮询或等待（长轮询）命令结果；
+设定值命令（如 set_speed_rpm）在队列中按目标地址合并：合并窗口内同一地址只发送最新的值，
+被取代的命令标记为 superseded；其他命令视为屏障，合并不会跨越屏障改变执行顺序；
+批量命令支持三种执行模式：
+- sequential：严格逐条发送（默认，与旧行为一致）
+- parallel：按并发上限并行发送；同一 group 内的命令按列表顺序串行，前一条失败则跳过后续
+- pipelined：按列表顺序依次发起、最多 max_concurrency 条同时在途；
+  同一 group 内等待前一条完成，任一命令失败后不再发起后续命令
+所有模式都受整体截止时间约束：截止前未发起的命令直接跳过，在途命令的读取超时不超过剩余时间；
+安全命令（见 priority_lane）在任何模式下都经优先通道发送
+"""
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app
+
+from app.services.priority_lane import get_priority_lane
+from app.utils.helpers import now_ms
+
+logger = logging.getLogger(__name__)
+
+MODE_SEQUENTIAL = 'sequential'
+MODE_PARALLEL = 'parallel'
+MODE_PIPELINED = 'pipelined'
+BATCH_MODES = (MODE_SEQUENTIAL, MODE_PARALLEL, MODE_PIPELINED)
+
+STATUS_QUEUED = 'queued'
+STATUS_SENDING = 'sending'
+STATUS_SUCCESS = 'success'
+STATUS_FAILED = 'failed'
+STATUS_SUPERSEDED = 'superseded'
+FINAL_STATUSES = (STATUS_SUCCESS, STATUS_FAILED, STATUS_SUPERSEDED)
+
+
+def _skipped(index: int, command: Optional[str], group: Any, error: str, message: str) -> Dict[str, Any]:
+    return {
+        'index': index,
+        'command': command,
+        'group': group,
+        'success': False,
+        'skipped': True,
+        'error': error,
+        'message': message,
+        'timestamp': now_ms(),
+    }
+
+
+class CommandBatch:
+    """一次批量命令执行"""
+
+    def __init__(self, commands: List[Any], mode: str = MODE_SEQUENTIAL, max_concurrency: int = 4,
+                 deadline_ms: Optional[int] = None):
+        self.commands = commands
+        self.mode = mode
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.started = time.monotonic()
+        self.deadline = self.started + deadline_ms / 1000.0 if deadline_ms else None
+        self.results: List[Optional[Dict[str, Any]]] = [None] * len(commands)
+        self.deadline_exceeded = False
+        self._app = current_app._get_current_object()
+
+    # ---------- 公共部分 ----------
+
+    def _remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def _parse(self, index: int):
+        cmd_data = self.commands[index]
+        if not isinstance(cmd_data, dict) or 'command' not in cmd_data:
+            return None
+        command = cmd_data['command']
+        group = self._group_of(index)
+        params = {k: v for k, v in cmd_data.items() if k not in ('command', 'group')}
+        return command, group, params
+
+    def _group_of(self, index: int) -> Any:
+        cmd_data = self.commands[index]
+        group = cmd_data.get('group') if isinstance(cmd_data, dict) else None
+        # 组标识用作字典键，非标量值按字符串处理
+        if group is None or isinstance(group, (str, int)):
+            return group
+        return str(group)
+
+    def _execute(self, index: int) -> Dict[str, Any]:
+        """发送单条命令并附带计时（在工作线程中调用）"""
+        from app.services.node_red_service import NodeRedService
+
+        parsed = self._parse(index)
+        if parsed is None:
+            return {
+                'index': index,
+                'success': False,
+                'error': 'invalid_command_format',
+                'message': '命令格式错误'
+            }
+        command, group, params = parsed
+        remaining = self._remaining()
+        if remaining is not None and remaining <= 0:
+            self.deadline_exceeded = True
+            return _skipped(index, command, group, 'deadline_exceeded', '超过批量截止时间，命令未发送')
+
+        started = time.monotonic()
+        with self._app.app_context():
+            lane = get_priority_lane()
+            if lane.is_priority(command):
+                result, _ = lane.send(command, params, started)
+            else:
+                result = NodeRedService.send_command_to_node_red(command, params, timeout_s=remaining)
+        finished = time.monotonic()
+        result = dict(result)
+        result['index'] = index
+        result['group'] = group
+        result['timing'] = {
+            'start_offset_ms': round((started - self.started) * 1000.0, 2),
+            'duration_ms': round((finished - started) * 1000.0, 2),
+        }
+        return result
+
+    def run(self) -> List[Dict[str, Any]]:
+        if not self.commands:
+            return []
+        if self.mode == MODE_PARALLEL:
+            self._run_parallel()
+        elif self.mode == MODE_PIPELINED:
+            self._run_pipelined()
+        else:
+            self._run_sequential()
+        return [r for r in self.results if r is not None]
+
+    # ---------- sequential ----------
+
+    def _run_sequential(self) -> None:
+        for index in range(len(self.commands)):
+            self.results[index] = self._execute(index)
+
+    # ---------- parallel ----------
+
+    def _chains(self) -> List[List[int]]:
+        """按 group 划分执行链：同组命令按列表顺序组成一条链，未分组命令各自成链"""
+        chains: List[List[int]] = []
+        by_group: Dict[Any, List[int]] = {}
+        for index in range(len(self.commands)):
+            group = self._group_of(index)
+            if group is None:
+                chains.append([index])
+            elif group in by_group:
+                by_group[group].append(index)
+            else:
+                by_group[group] = [index]
+                chains.append(by_group[group])
+        return chains
+
+    def _run_chain(self, chain: List[int]) -> None:
+        for pos, index in enumerate(chain):
+            result = self._execute(index)
+            self.results[index] = result
+            if not result.get('success'):
+                for later in chain[pos + 1:]:
+                    parsed = self._parse(later)
+                    self.results[later] = _skipped(
+                        later, parsed[0] if parsed else None, self._group_of(later),
+                        'dependency_failed', f"同组前序命令(#{index})失败，命令未发送"
+                    )
+                return
+
+    def _run_parallel(self) -> None:
+        chains = self._chains()
+        executor = ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(chains)),
+                                      thread_name_prefix='cmd-batch')
+        try:
+            futures = [executor.submit(self._run_chain, chain) for chain in chains]
+            wait(futures, timeout=self._remaining_for_wait())
+        finally:
+            executor.shutdown(wait=False)
+        self._fill_unfinished()
+
+    # ---------- pipelined ----------
+
+    def _run_pipelined(self) -> None:
+        executor = ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(self.commands)),
+                                      thread_name_prefix='cmd-batch')
+        in_flight: Dict[Future, int] = {}
+        last_in_group: Dict[Any, Future] = {}
+        aborted_by: Optional[int] = None
+        try:
+            for index in range(len(self.commands)):
+                group = self._group_of(index)
+                # 同组前序命令完成后才发起（保持组内顺序）
+                predecessor = last_in_group.get(group) if group is not None else None
+                if predecessor is not None and not predecessor.done():
+                    wait([predecessor], timeout=self._remaining_for_wait())
+                # 在途窗口已满时等待任一命令完成
+                while len([f for f in in_flight if not f.done()]) >= self.max_concurrency:
+                    done, _ = wait([f for f in in_flight if not f.done()],
+                                   timeout=self._remaining_for_wait(), return_when=FIRST_COMPLETED)
+                    if not done:
+                        break
+                aborted_by = self._first_failure(in_flight)
+                if aborted_by is not None:
+                    break
+                remaining = self._remaining()
+                if remaining is not None and remaining <= 0:
+                    self.deadline_exceeded = True
+                    break
+                future = executor.submit(self._execute, index)
+                in_flight[future] = index
+                if group is not None:
+                    last_in_group[group] = future
+            wait(list(in_flight), timeout=self._remaining_for_wait())
+            for future, index in in_flight.items():
+                if future.done() and future.exception() is None:
+                    self.results[index] = future.result()
+        finally:
+            executor.shutdown(wait=False)
+        if aborted_by is None:
+            aborted_by = self._first_failure(in_flight)
+        self._fill_unfinished(aborted_by)
+
+    def _first_failure(self, in_flight: Dict[Future, int]) -> Optional[int]:
+        failed = [index for future, index in in_flight.items()
+                  if future.done() and (future.exception() is not None or not future.result().get('success'))]
+        return min(failed) if failed else None
+
+    # ---------- 收尾 ----------
+
+    def _remaining_for_wait(self) -> Optional[float]:
+        remaining = self._remaining()
+        return None if remaining is None else max(0.0, remaining)
+
+    def _fill_unfinished(self, aborted_by: Optional[int] = None) -> None:
+        """为未完成或未发起的命令补充结果"""
+        for index, result in enumerate(self.results):
+            if result is not None:
+                continue
+            parsed = self._parse(index)
+            command = parsed[0] if parsed else None
+            group = self._group_of(index)
+            remaining = self._remaining()
+            if remaining is not None and remaining <= 0:
+                self.deadline_exceeded = True
+                self.results[index] = _skipped(index, command, group, 'deadline_exceeded',
+                                               '超过批量截止时间，命令未发送或未收到响应')
+            elif aborted_by is not None:
+                self.results[index] = _skipped(index, command, group, 'aborted',
+                                               f"前序命令(#{aborted_by})失败，后续命令未发送")
+            else:
+                self.results[index] = _skipped(index, command, group, 'not_executed', '命令未执行')
+
+    def summary(self) -> Dict[str, Any]:
+        results = [r for r in self.results if r is not None]
+        return {
+            'mode': self.mode,
+            'max_concurrency': self.max_concurrency if self.mode != MODE_SEQUENTIAL else 1,
+            'duration_ms': round((time.monotonic() - self.started) * 1000.0, 2),
+            'deadline_exceeded': self.deadline_exceeded,
+            'skipped_count': sum(1 for r in results if r.get('skipped')),
+        }
+
+
+def run_command_batch(commands: List[Any], mode: str = MODE_SEQUENTIAL, max_concurrency: int = 4,
+                      deadline_ms: Optional[int] = None) -> Dict[str, Any]:
+    """执行批量命令，返回按输入顺序排列的结果与执行摘要（需在应用上下文中调用）"""
+    if mode not in BATCH_MODES:
+        raise ValueError(f"不支持的批量执行模式: {mode}")
+    batch = CommandBatch(commands, mode, max_concurrency, deadline_ms)
+    results = batch.run()
+    return {'results': results, **batch.summary()}
+
+
+# ---------- 异步命令 ----------
+
+class PendingCommand:
+    """一条异步命令的状态"""
+
+    __slots__ = ('log_id', 'command', 'params', 'status', 'result', 'enqueued_at', 'sent_at', 'completed_at',
+                 'address', 'barrier', 'hold_until', 'superseded_by')
+
+    def __init__(self, log_id: int, command: str, params: Dict[str, Any]):
+        self.log_id = log_id
+        self.command = command
+        self.params = params
+        self.status = STATUS_QUEUED
+        self.result: Optional[Dict[str, Any]] = None
+        self.enqueued_at = now_ms()
+        self.sent_at: Optional[int] = None
+        self.completed_at: Optional[int] = None
+        # 合并相关：目标地址（仅可合并的设定值命令）、入队时的屏障序号、最早发送时刻(monotonic)
+        self.address: Optional[str] = None
+        self.barrier = 0
+        self.hold_until = 0.0
+        self.superseded_by: Optional[int] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINAL_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.log_id,
+            'command': self.command,
+            'params': self.params,
+            'status': self.status,
+            'result': self.result,
+            'enqueued_at': self.enqueued_at,
+            'sent_at': self.sent_at,
+            'completed_at': self.completed_at,
+            'superseded_by': self.superseded_by,
+            'queue_ms': None if self.sent_at is None else self.sent_at - self.enqueued_at,
+            'total_ms': None if self.completed_at is None else self.completed_at - self.enqueued_at,
+        }
+
+
+class CommandTracker:
+    """待处理命令跟踪（线程安全）；已完成的命令保留 retention_s 秒供客户端查询"""
+
+    def __init__(self, retention_s: float = 300.0, max_entries: int = 1000):
+        self.retention_s = max(1.0, float(retention_s))
+        self.max_entries = max(10, int(max_entries))
+        self._cond = threading.Condition()
+        self._entries: Dict[int, PendingCommand] = {}
+
+    def add(self, entry: PendingCommand) -> None:
+        with self._cond:
+            self._prune_locked()
+            self._entries[entry.log_id] = entry
+
+    def get(self, log_id: int) -> Optional[PendingCommand]:
+        with self._cond:
+            return self._entries.get(log_id)
+
+    def mark_sending(self, log_id: int) -> None:
+        with self._cond:
+            entry = self._entries.get(log_id)
+            if entry is not None:
+                entry.status = STATUS_SENDING
+                entry.sent_at = now_ms()
+                self._cond.notify_all()
+
+    def complete(self, log_id: int, result: Dict[str, Any]) -> None:
+        with self._cond:
+            entry = self._entries.get(log_id)
+            if entry is not None:
+                entry.result = result
+                entry.status = STATUS_SUCCESS if result.get('success') else STATUS_FAILED
+                entry.completed_at = now_ms()
+                self._cond.notify_all()
+
+    def supersede(self, log_id: int, by_log_id: int) -> Optional[Dict[str, Any]]:
+        """标记命令已被同一地址更新的设定值取代，返回记录的结果"""
+        with self._cond:
+            entry = self._entries.get(log_id)
+            if entry is None:
+                return None
+            entry.result = {
+                'success': True,
+                'command': entry.command,
+                'superseded_by': by_log_id,
+                'message': f"已被更新的设定值(#{by_log_id})取代，未单独发送",
+                'timestamp': now_ms()
+            }
+            entry.status = STATUS_SUPERSEDED
+            entry.superseded_by = by_log_id
+            entry.completed_at = now_ms()
+            self._cond.notify_all()
+            return entry.result
+
+    def wait(self, log_id: int, timeout: float) -> Optional[PendingCommand]:
+        """等待命令完成（最多 timeout 秒），返回命令状态；未跟踪的ID返回 None"""
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            while True:
+                entry = self._entries.get(log_id)
+                if entry is None or entry.done:
+                    return entry
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return entry
+                self._cond.wait(remaining)
+
+    def _prune_locked(self) -> None:
+        cutoff = now_ms() - int(self.retention_s * 1000)
+        expired = [log_id for log_id, entry in self._entries.items()
+                   if entry.done and entry.completed_at < cutoff]
+        for log_id in expired:
+            del self._entries[log_id]
+        # 超出容量时优先丢弃最早完成的命令
+        overflow = len(self._entries) - self.max_entries + 1
+        if overflow > 0:
+            finished = sorted((e for e in self._entries.values() if e.done), key=lambda e: e.completed_at)
+            for entry in finished[:overflow]:
+                del self._entries[entry.log_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            counts = {STATUS_QUEUED: 0, STATUS_SENDING: 0, STATUS_SUCCESS: 0, STATUS_FAILED: 0,
+                      STATUS_SUPERSEDED: 0}
+            for entry in self._entries.values():
+                counts[entry.status] += 1
+            return {'tracked': len(self._entries), 'by_status': counts, 'retention_s': self.retention_s}
+
+
+def _stopped_result(entry: PendingCommand) -> Dict[str, Any]:
+    return {
+        'success': False,
+        'command': entry.command,
+        'error': 'dispatcher_stopped',
+        'message': '服务停止，命令未发送',
+        'timestamp': now_ms()
+    }
+
+
+class CommandDispatcher:
+    """异步命令调度线程：按入队顺序逐条发送到 Node-RED"""
+
+    def __init__(self, app, tracker: CommandTracker, max_queue: int = 256,
+                 coalesce_commands: Iterable[str] = (), coalesce_window_ms: int = 100):
+        self.app = app
+        self.tracker = tracker
+        self.coalesce_commands = frozenset(c.strip() for c in coalesce_commands if c and c.strip())
+        self.coalesce_window = max(0, int(coalesce_window_ms)) / 1000.0
+        self._queue: 'queue.Queue[Optional[PendingCommand]]' = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # 合并状态：每个地址仍在排队的最新设定值、屏障序号（每个不可合并命令入队时加一）
+        self._coalesce_lock = threading.Lock()
+        self._queued_setpoints: Dict[str, PendingCommand] = {}
+        self._barrier = 0
+        # 仅调度线程访问：合并窗口内的设定值按发送时刻排成小顶堆，已可发送的命令按顺序排队
+        self._held: List[Tuple[float, int, PendingCommand]] = []
+        self._held_seq = itertools.count()
+        self._ready: Deque[PendingCommand] = deque()
+        self._stats_lock = threading.Lock()
+        self._stats = {'submitted': 0, 'delivered': 0, 'failed': 0, 'rejected': 0, 'max_queue_depth': 0,
+                       'last_send_ms': 0.0, 'suppressed': 0, 'suppressed_by_address': {}}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='command-dispatcher', daemon=True)
+        self._thread.start()
+        logger.info("命令调度线程已启动")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """停止调度线程，队列中尚未发送的命令标记为失败"""
+        if not self.running:
+            return
+        self._stop.set()
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+        with self.app.app_context():
+            while True:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is not None and not entry.done:
+                    self._finish(entry, _stopped_result(entry))
+        logger.info("命令调度线程已停止")
+
+    def _coalesce_address(self, command: str) -> Optional[str]:
+        """可合并命令的目标地址（按 commands-mapping 映射，未映射时以命令名作为地址）"""
+        if not self.coalesce_window or command not in self.coalesce_commands:
+            return None
+        from app.services.config_store import get_config_store
+        mapping = get_config_store().get_static_config('commands-mapping', {})
+        address = mapping.get(command) if isinstance(mapping, dict) else None
+        return address or command
+
+    def enqueue(self, entry: PendingCommand) -> bool:
+        """入队（可合并的设定值会取代同一地址仍在排队的旧值），队列已满时返回 False"""
+        address = self._coalesce_address(entry.command)
+        superseded = None
+        with self._coalesce_lock:
+            if address is None:
+                self._barrier += 1
+                entry.barrier = self._barrier
+            else:
+                entry.address = address
+                entry.barrier = self._barrier
+                entry.hold_until = time.monotonic() + self.coalesce_window
+                previous = self._queued_setpoints.get(address)
+                if previous is not None and previous.status == STATUS_QUEUED and previous.barrier == self._barrier:
+                    # 沿用旧值的发送时刻：持续拖动时每个窗口最多发送一次
+                    entry.hold_until = previous.hold_until
+                    superseded = previous
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                with self._stats_lock:
+                    self._stats['rejected'] += 1
+                return False
+            if address is not None:
+                self._queued_setpoints[address] = entry
+            if superseded is not None:
+                result = self._mark_superseded(superseded, entry)
+        if superseded is not None:
+            self._record_superseded(superseded, result)
+        with self._stats_lock:
+            self._stats['submitted'] += 1
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], self._queue.qsize())
+        return True
+
+    def _mark_superseded(self, entry: PendingCommand, by: PendingCommand) -> Dict[str, Any]:
+        result = self.tracker.supersede(entry.log_id, by.log_id)
+        if result is None:
+            # 已移出跟踪器：仅更新本地状态，出队时跳过
+            entry.status = STATUS_SUPERSEDED
+            entry.superseded_by = by.log_id
+            result = {'success': True, 'command': entry.command, 'superseded_by': by.log_id}
+        return result
+
+    def _record_superseded(self, entry: PendingCommand, result: Dict[str, Any]) -> None:
+        from app.services.node_red_service import NodeRedService
+
+        NodeRedService.complete_command_log(entry.log_id, result, True, status=STATUS_SUPERSEDED,
+                                            command=entry.command, params=entry.params)
+        with self._stats_lock:
+            self._stats['suppressed'] += 1
+            by_address = self._stats['suppressed_by_address']
+            by_address[entry.address] = by_address.get(entry.address, 0) + 1
+
+    def _next_entry(self) -> Optional[PendingCommand]:
+        """
+        取下一条待发送的命令，收到停止标记时返回 None
+        设定值留在堆中直到合并窗口结束，期间继续接收后续命令；
+        屏障命令到达时，之前的设定值已不会再被合并，先按发送时刻依次放出，再放出屏障命令
+        """
+        while True:
+            if self._ready:
+                return self._ready.popleft()
+            now = time.monotonic()
+            if self._held and self._held[0][0] <= now:
+                return heapq.heappop(self._held)[2]
+            timeout = self._held[0][0] - now if self._held else None
+            try:
+                entry = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if entry is None:
+                return None
+            if entry.done:
+                continue
+            if entry.address is not None and not self._stop.is_set():
+                heapq.heappush(self._held, (entry.hold_until, next(self._held_seq), entry))
+                continue
+            while self._held:
+                self._ready.append(heapq.heappop(self._held)[2])
+            self._ready.append(entry)
+
+    def _drain_local(self) -> List[PendingCommand]:
+        """取出调度线程本地暂存的全部命令（停止时调用）"""
+        entries = list(self._ready)
+        self._ready.clear()
+        while self._held:
+            entries.append(heapq.heappop(self._held)[2])
+        return entries
+
+    def _claim(self, entry: PendingCommand) -> bool:
+        """认领待发送的命令；已被取代时返回 False"""
+        with self._coalesce_lock:
+            if entry.status != STATUS_QUEUED:
+                return False
+            if entry.address is not None and self._queued_setpoints.get(entry.address) is entry:
+                del self._queued_setpoints[entry.address]
+            self.tracker.mark_sending(entry.log_id)
+            entry.status = STATUS_SENDING
+        return True
+
+    def _run(self) -> None:
+        with self.app.app_context():
+            while True:
+                entry = self._next_entry()
+                if entry is None:
+                    for entry in self._drain_local():
+                        if not entry.done:
+                            self._finish(entry, _stopped_result(entry))
+                    return
+                if entry.done:
+                    continue
+                if self._stop.is_set():
+                    self._finish(entry, _stopped_result(entry))
+                    continue
+                if not self._claim(entry):
+                    continue
+                try:
+                    self.deliver(entry)
+                except Exception as e:
+                    logger.error(f"异步命令发送失败(id={entry.log_id}): {e}")
+
+    def deliver(self, entry: PendingCommand) -> Dict[str, Any]:
+        """发送一条命令并记录结果（需在应用上下文中调用）"""
+        from app.services.node_red_service import NodeRedService
+
+        if entry.status != STATUS_SENDING:
+            self.tracker.mark_sending(entry.log_id)
+        started = time.monotonic()
+        result = NodeRedService.send_command_to_node_red(entry.command, entry.params)
+        with self._stats_lock:
+            self._stats['last_send_ms'] = round((time.monotonic() - started) * 1000.0, 2)
+        self._finish(entry, result)
+        return result
+
+    def _finish(self, entry: PendingCommand, result: Dict[str, Any]) -> None:
+        from app.services.node_red_service import NodeRedService
+
+        success = bool(result.get('success'))
+        NodeRedService.complete_command_log(entry.log_id, result, success, command=entry.command, params=entry.params)
+        self.tracker.complete(entry.log_id, result)
+        with self._stats_lock:
+            self._stats['delivered' if success else 'failed'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats['suppressed_by_address'] = dict(self._stats['suppressed_by_address'])
+        stats['running'] = self.running
+        stats['queue_depth'] = self._queue.qsize()
+        stats['held'] = len(self._held)
+        stats['coalesce_commands'] = sorted(self.coalesce_commands)
+        stats['coalesce_window_ms'] = int(self.coalesce_window * 1000)
+        return stats
+
+
+_tracker = CommandTracker()
+_dispatcher: Optional[CommandDispatcher] = None
+
+
+def start_command_dispatcher(app) -> CommandDispatcher:
+    """按应用配置启动全局异步命令调度线程"""
+    global _dispatcher, _tracker
+    if _dispatcher is None or not _dispatcher.running:
+        _tracker = CommandTracker(retention_s=app.config.get('COMMAND_TRACKER_RETENTION_S', 300))
+        coalesce = app.config.get('COMMAND_COALESCE_COMMANDS', 'set_speed_rpm,set_load_level')
+        _dispatcher = CommandDispatcher(
+            app,
+            _tracker,
+            max_queue=app.config.get('COMMAND_QUEUE_SIZE', 256),
+            coalesce_commands=coalesce.split(',') if isinstance(coalesce, str) else coalesce,
+            coalesce_window_ms=app.config.get('COMMAND_COALESCE_WINDOW_MS', 100)
+        )
+        _dispatcher.start()
+    return _dispatcher
+
+
+def stop_command_dispatcher() -> None:
+    global _dispatcher
+    if _dispatcher is not None:
+        _dispatcher.stop()
+        _dispatcher = None
+
+
+def get_command_dispatcher() -> Optional[CommandDispatcher]:
+    return _dispatcher
+
+
+def get_command_tracker() -> CommandTracker:
+    return _tracker
+
+
+def submit_command(command: str, params: Optional[Dict[str, Any]] = None) -> Optional[PendingCommand]:
+    """
+    异步提交命令：分配日志ID并入队，立即返回命令状态；
+    调度线程未运行时在当前线程同步发送；队列已满时命令直接以 queue_full 失败；
+    日志ID分配失败时返回 None
+    """
+    from app.services.node_red_service import NodeRedService
+
+    params = params or {}
+    tracker = _tracker
+    lane = get_priority_lane()
+    if lane.is_priority(command):
+        # 安全命令不排队：立即经优先通道发送，发送后再记录
+        result, log_id = lane.send(command, params)
+        if not log_id:
+            return None
+        entry = PendingCommand(log_id, command, params)
+        tracker.add(entry)
+        tracker.mark_sending(log_id)
+        tracker.complete(log_id, result)
+        return entry
+
+    log_id = NodeRedService.create_command_log(command, params)
+    if not log_id:
+        return None
+    entry = PendingCommand(log_id, command, params)
+    tracker.add(entry)
+
+    dispatcher = _dispatcher
+    if dispatcher is not None and dispatcher.running:
+        if dispatcher.enqueue(entry):
+            return entry
+        result = {
+            'success': False,
+            'command': command,
+            'error': 'queue_full',
+            'message': '命令队列已满，请稍后重试',
+            'timestamp': now_ms()
+        }
+        NodeRedService.complete_command_log(log_id, result, False, command=command, params=params)
+        tracker.complete(log_id, result)
+        return entry
+
+    result = NodeRedService.send_command_to_node_red(command, params)
+    NodeRedService.complete_command_log(log_id, result, bool(result.get('success')), command=command, params=params)
+    tracker.complete(log_id, result)
+    return entry
@@ -0,0 +1,315 @@
+"""
+进程内配置存储
+一次性加载 system_config 表、data/settings.json 与 app/static/config/*.json 映射并常驻内存；
+通过接口写入时立即更新缓存，文件被外部修改时由监视线程（或读取时的节流检查）重新加载，
+配置变化通过订阅回调通知（如采集地址变化时清除 Node-RED 客户端的学习记录）
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.utils.helpers import now_ms
+
+logger = logging.getLogger(__name__)
+
+SECTION_SYSTEM = 'system_config'
+SECTION_SETTINGS = 'settings'
+SECTION_STATIC = 'static'
+
+# 未启动监视线程时，读取路径上两次检查文件变化的最小间隔
+_LAZY_CHECK_INTERVAL_S = 1.0
+
+Listener = Callable[[str, List[str]], None]
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """文件签名 (mtime_ns, size)，文件不存在时为 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class ConfigStore:
+    """配置缓存（线程安全）"""
+
+    def __init__(self, settings_path: str, static_config_dir: str, watch_interval_s: float = 2.0):
+        self.settings_path = settings_path
+        self.static_config_dir = static_config_dir
+        self.watch_interval_s = max(0.1, float(watch_interval_s))
+        self._lock = threading.RLock()
+        self._system: Optional[Dict[str, Dict[str, Any]]] = None
+        self._settings: Optional[Dict[str, Any]] = None
+        self._settings_sig: Optional[Tuple[int, int]] = None
+        self._static: Dict[str, Any] = {}
+        self._static_sigs: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._versions = {SECTION_SYSTEM: 0, SECTION_SETTINGS: 0, SECTION_STATIC: 0}
+        self._listeners: List[Listener] = []
+        self._last_check = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {'system_loads': 0, 'settings_loads': 0, 'static_loads': 0, 'external_reloads': 0}
+
+    # ---------- 订阅与版本 ----------
+
+    def subscribe(self, listener: Listener) -> None:
+        """订阅配置变化：listener(section, changed_keys)"""
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def version(self, section: str) -> int:
+        with self._lock:
+            return self._versions.get(section, 0)
+
+    def _notify(self, section: str, keys: List[str]) -> None:
+        with self._lock:
+            self._versions[section] += 1
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(section, keys)
+            except Exception as e:
+                logger.warning(f"配置变化回调执行失败: {e}")
+
+    # ---------- system_config ----------
+
+    def _load_system(self) -> Dict[str, Dict[str, Any]]:
+        from app.utils.database import execute_query
+        rows = execute_query(
+            'SELECT config_key, config_value, updated_at FROM system_config',
+            fetch_all=True
+        )
+        self._stats['system_loads'] += 1
+        return {row['config_key']: {'value': row['config_value'], 'updated_at': row['updated_at']}
+                for row in rows}
+
+    def _system_entries(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            if self._system is None:
+                self._system = self._load_system()
+            return self._system
+
+    def get_system_config(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        entry = self._system_entries().get(key)
+        if entry is None or entry['value'] is None:
+            return default
+        return entry['value']
+
+    def get_system_config_entries(self, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """返回 {key: {'value', 'updated_at'}}，仅包含已存在的键"""
+        entries = self._system_entries()
+        return {key: dict(entries[key]) for key in sorted(keys) if key in entries}
+
+    def set_system_config(self, values: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        """写入配置（UPSERT）并刷新缓存，返回写入后的条目"""
+        from app.utils.database import execute_transaction
+        execute_transaction([(
+            '''INSERT INTO system_config (config_key, config_value) VALUES (?, ?)
+               ON CONFLICT(config_key) DO UPDATE SET
+                   config_value = excluded.config_value, updated_at = CURRENT_TIMESTAMP''',
+            [(key, value) for key, value in values.items()]
+        )])
+        with self._lock:
+            old = self._system or {}
+            self._system = self._load_system()
+            changed = [key for key in values if (old.get(key) or {}).get('value') != values[key]]
+        if changed:
+            self._notify(SECTION_SYSTEM, changed)
+        return self.get_system_config_entries(values.keys())
+
+    def invalidate_system_config(self) -> None:
+        """丢弃 system_config 缓存（外部直接修改数据库后调用）"""
+        with self._lock:
+            self._system = None
+        self._notify(SECTION_SYSTEM, [])
+
+    # ---------- settings.json ----------
+
+    def _read_json(self, path: str) -> Any:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _load_settings_locked(self) -> None:
+        sig = _file_signature(self.settings_path)
+        data: Dict[str, Any] = {}
+        if sig is not None:
+            try:
+                loaded = self._read_json(self.settings_path)
+                if isinstance(loaded, dict):
+                    data = loaded
+            except Exception as e:
+                logger.warning(f"读取设置失败: {e}")
+        self._settings = data
+        self._settings_sig = sig
+        self._stats['settings_loads'] += 1
+
+    def get_settings(self) -> Dict[str, Any]:
+        """settings.json 内容（副本，文件不存在时为空字典）"""
+        self._maybe_check_files()
+        with self._lock:
+            if self._settings is None:
+                self._load_settings_locked()
+            return dict(self._settings)
+
+    def save_settings(self, data: Dict[str, Any]) -> None:
+        """原子写入 settings.json 并更新缓存，失败时抛出异常"""
+        directory = os.path.dirname(self.settings_path)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.settings_path}.tmp"
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.settings_path)
+            self._settings = dict(data)
+            self._settings_sig = _file_signature(self.settings_path)
+        self._notify(SECTION_SETTINGS, list(data.keys()))
+
+    # ---------- app/static/config/*.json ----------
+
+    def _static_path(self, name: str) -> str:
+        filename = name if name.endswith('.json') else f"{name}.json"
+        return os.path.join(self.static_config_dir, os.path.basename(filename))
+
+    def _load_static_locked(self, name: str) -> None:
+        path = self._static_path(name)
+        sig = _file_signature(path)
+        data = None
+        if sig is not None:
+            try:
+                data = self._read_json(path)
+            except Exception as e:
+                logger.warning(f"读取配置映射失败 {path}: {e}")
+        self._static[name] = data
+        self._static_sigs[name] = sig
+        self._stats['static_loads'] += 1
+
+    def get_static_config(self, name: str, default: Any = None) -> Any:
+        """读取静态配置映射（如 commands-mapping、points-mapping），文件缺失或无效时返回 default"""
+        self._maybe_check_files()
+        with self._lock:
+            if name not in self._static:
+                self._load_static_locked(name)
+            data = self._static[name]
+        return default if data is None else data
+
+    # ---------- 文件监视 ----------
+
+    def check_files(self) -> List[str]:
+        """检查文件签名，外部修改过的文件重新加载，返回变化的节"""
+        changed_sections = []
+        changed_static = []
+        with self._lock:
+            self._last_check = time.monotonic()
+            if self._settings is not None and _file_signature(self.settings_path) != self._settings_sig:
+                self._load_settings_locked()
+                changed_sections.append(SECTION_SETTINGS)
+            for name, sig in list(self._static_sigs.items()):
+                if _file_signature(self._static_path(name)) != sig:
+                    self._load_static_locked(name)
+                    changed_static.append(name)
+            if changed_static:
+                changed_sections.append(SECTION_STATIC)
+            if changed_sections:
+                self._stats['external_reloads'] += 1
+        for section in changed_sections:
+            keys = changed_static if section == SECTION_STATIC else []
+            logger.info(f"检测到配置文件变化，已重新加载: {section} {keys or ''}")
+            self._notify(section, keys)
+        return changed_sections
+
+    def _maybe_check_files(self) -> None:
+        # 监视线程未运行时在读取路径上节流检查
+        if self.running:
+            return
+        if time.monotonic() - self._last_check >= _LAZY_CHECK_INTERVAL_S:
+            self.check_files()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name='config-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.watch_interval_s):
+            try:
+                self.check_files()
+            except Exception as e:
+                logger.warning(f"检查配置文件变化失败: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                'versions': dict(self._versions),
+                'watching': self.running,
+                'settings_path': self.settings_path,
+                'static_loaded': sorted(self._static.keys()),
+                'system_keys': sorted(self._system.keys()) if self._system is not None else None,
+                'timestamp': now_ms(),
+            }
+
+
+_store: Optional[ConfigStore] = None
+_store_lock = threading.Lock()
+
+
+def _default_paths(app) -> Tuple[str, str]:
+    data_dir = os.path.abspath(os.path.join(app.root_path, '..', 'data'))
+    static_dir = os.path.join(app.static_folder or os.path.join(app.root_path, 'static'), 'config')
+    return os.path.join(data_dir, 'settings.json'), static_dir
+
+
+def init_config_store(app) -> ConfigStore:
+    """按应用创建全局配置存储（不启动监视线程），替换已有实例"""
+    global _store
+    settings_path, static_dir = _default_paths(app)
+    store = ConfigStore(
+        settings_path,
+        static_dir,
+        watch_interval_s=app.config.get('CONFIG_WATCH_INTERVAL_S', 2.0)
+    )
+    with _store_lock:
+        old, _store = _store, store
+    if old is not None:
+        old.stop()
+    return store
+
+
+def get_config_store() -> ConfigStore:
+    """获取全局配置存储，未初始化时按当前应用创建"""
+    store = _store
+    if store is None:
+        from flask import current_app
+        with _store_lock:
+            store = _store
+        if store is None:
+            store = init_config_store(current_app)
+    return store
+
+
+def start_config_watcher(app) -> ConfigStore:
+    store = _store or init_config_store(app)
+    store.start()
+    return store
+
+
+def stop_config_watcher() -> None:
+    if _store is not None:
+        _store.stop()
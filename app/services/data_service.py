@@ -2,14 +2,87 @@
 数据处理服务
 """
 import logging
-from typing import Dict, List, Any, Optional
+import re
+import time
+from typing import Callable, Dict, List, Any, Optional, Tuple
 from app.models.measurement import MeasurementModel
 from app.models.hysteresis import HysteresisModel
-from app.utils.helpers import now_ms, normalize_measurement_data
+from app.services.node_red_poller import get_node_red_poller
+from app.utils import data_version
+from app.utils.curve_codec import pack_curve_frame
+from app.utils.helpers import now_ms, normalize_measurement_data, normalize_hysteresis_points
 from flask import current_app
 
 logger = logging.getLogger(__name__)
 
+# 实时角位移/扭矩在 Node-RED 数据中的候选键（精确别名 + 子串匹配）
+_ANGLE_ALIASES = {
+    'angle', 'position_deg', 'position', 'theta', 'angle_deg', 'angular_position', 'pos', 'deg',
+    'mechanical_angle', 'electrical_angle', 'encoder_position', 'encoder_deg', 'theta_deg', 'position_degree',
+    'angle_degree', '角度', '角位移', '位置', '机械角度', '电角度', '编码器位置', '编码器角度'
+}
+_ANGLE_SUBSTRINGS = ['angle', 'position', 'theta', 'pos', 'deg', 'encoder', '角', '位移', '位置']
+_TORQUE_ALIASES = {
+    'torque', 'torque_nm', 'load_torque', 'current_torque', 'torque_Nm', 'tq', 'load_torque_nm',
+    'motor_torque', 'output_torque', 'torque_value', '扭矩', '负载扭矩', '输出扭矩', '电机扭矩', '当前扭矩'
+}
+_TORQUE_SUBSTRINGS = ['torque', 'load', 'nm', 'tq', '扭矩', '负载']
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def _extract_numeric(val: Any) -> Optional[float]:
+    if isinstance(val, dict):
+        for key in ('value', 'val', 'data', 'v', 'current'):
+            if key in val:
+                try:
+                    return float(val[key])
+                except (TypeError, ValueError):
+                    continue
+        for _, v in val.items():
+            try:
+                return float(v)
+            except (TypeError, ValueError):
+                continue
+        return None
+    # 字符串中提取第一个数字（兼容如 "12.34 deg"）
+    if isinstance(val, str):
+        m = _NUMBER_RE.search(val)
+        return float(m.group(0)) if m else None
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return None
+
+
+def _find_numeric_deep(obj: Any, alias_keys, substrings) -> Optional[float]:
+    try:
+        if obj is None:
+            return None
+        # 字典：先匹配当前层键，再递归子结构
+        if isinstance(obj, dict):
+            for k, v in obj.items():
+                k_lower = str(k).lower()
+                if k_lower in alias_keys or any(sub in k_lower for sub in substrings):
+                    num = _extract_numeric(v)
+                    if num is not None:
+                        return num
+            for _, v in obj.items():
+                num = _find_numeric_deep(v, alias_keys, substrings)
+                if num is not None:
+                    return num
+            return None
+        # 列表：逐项递归
+        if isinstance(obj, list):
+            for item in obj:
+                num = _find_numeric_deep(item, alias_keys, substrings)
+                if num is not None:
+                    return num
+            return None
+        # 基本类型直接尝试转换（仅当无键匹配情况下，不作角/扭矩猜测）
+        return None
+    except Exception:
+        return None
+
 
 class DataService:
     """数据处理服务"""
@@ -29,6 +102,13 @@ class DataService:
     
     ALL_KEYS = STATIC_KEYS + DYNAMIC_KEYS
     
+    @staticmethod
+    def extract_angle_torque(values: Any) -> Tuple[Optional[float], Optional[float]]:
+        """从 Node-RED 实时数据中提取 (角位移, 扭矩)，缺失时为 None"""
+        angle = _find_numeric_deep(values, _ANGLE_ALIASES, _ANGLE_SUBSTRINGS)
+        torque = _find_numeric_deep(values, _TORQUE_ALIASES, _TORQUE_SUBSTRINGS)
+        return angle, torque
+    
     @staticmethod
     def get_current_measurements(keys: Optional[List[str]] = None) -> Dict[str, Any]:
         """获取当前测量数据"""
@@ -60,8 +140,10 @@ class DataService:
             return DataService._get_default_measurements(keys or DataService.ALL_KEYS)
     
     @staticmethod
-    def save_measurement_data(data: Dict[str, Any], timestamp: Optional[int] = None) -> bool:
-        """保存测量数据"""
+    def save_measurement_data(data: Dict[str, Any], timestamp: Optional[int] = None,
+                              durable: bool = False,
+                              on_error: Optional[Callable[[Exception], None]] = None) -> bool:
+        """保存测量数据（durable=False 时返回 True 只表示已进入写队列，提交失败时调用 on_error）"""
         try:
             if not data:
                 logger.warning("没有数据需要保存")
@@ -71,7 +153,8 @@ class DataService:
             normalized_data = normalize_measurement_data(data)
             
             # 保存到数据库
-            saved_count = MeasurementModel.save_measurements(normalized_data, timestamp)
+            saved_count = MeasurementModel.save_measurements(normalized_data, timestamp, durable=durable,
+                                                             on_error=on_error)
             
             if saved_count > 0:
                 logger.info(f"成功保存 {saved_count} 条测量数据")
@@ -93,6 +176,18 @@ class DataService:
             logger.error(f"获取测量历史数据失败: {e}")
             return []
     
+    @staticmethod
+    def get_measurement_history_page(key: str, limit: int = 100,
+                                     cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """键集分页获取测量历史数据，返回 (rows, next_cursor)"""
+        return MeasurementModel.get_measurement_history_page(key, limit, cursor)
+    
+    @staticmethod
+    def get_measurement_series(key: str, start_ts: int, end_ts: int,
+                               max_points: int = 500) -> Dict[str, Any]:
+        """按点数预算获取测量曲线（自动选择原始数据或汇总分辨率）"""
+        return MeasurementModel.get_measurement_series(key, start_ts, end_ts, max_points)
+    
     @staticmethod
     def get_hysteresis_curve_data(curve_type: Optional[str] = None) -> List[Dict[str, float]]:
         """获取滞回曲线数据"""
@@ -118,21 +213,39 @@ class DataService:
 
             return points
         except Exception as e:
+            # 读取失败向上抛出，不当作空曲线返回（否则会被带上 ETag 缓存）
             logger.error(f"获取滞回曲线数据失败: {e}")
-            # 异常时：直接返回空集，不生成模拟数据
-            return []
+            raise
+    
+    @staticmethod
+    def get_hysteresis_curve_frame(dtype: Optional[str] = None,
+                                   curve_type: Optional[str] = None) -> Tuple[bytes, str, int]:
+        """
+        获取最新滞回曲线的二进制帧（直接拼接存储的打包数组，不展开为逐点字典）
+        dtype 为 f4/f8，缺省沿用存储类型；返回 (帧字节, 输出类型, 点数)
+        """
+        curves = HysteresisModel.get_curves(curve_type=curve_type, raw=True)
+        frame, out_dtype = pack_curve_frame(
+            ((c['curve_type'], c['point_count'], c['angles'], c['torques'], c['dtype']) for c in curves),
+            dtype,
+            curves[0]['ts'] if curves else 0
+        )
+        return frame, out_dtype, sum(c['point_count'] for c in curves)
     
     @staticmethod
     def save_hysteresis_data(points: List[Dict[str, float]], 
                            curve_type: str = 'hysteresis',
-                           timestamp: Optional[int] = None) -> bool:
-        """保存滞回曲线数据"""
+                           timestamp: Optional[int] = None,
+                           durable: bool = False,
+                           on_error: Optional[Callable[[Exception], None]] = None) -> bool:
+        """保存滞回曲线数据（durable=False 时返回 True 只表示已进入写队列，提交失败时调用 on_error）"""
         try:
             if not points:
                 logger.warning("没有滞回曲线数据需要保存")
                 return False
             
-            saved_count = HysteresisModel.save_hysteresis_points(points, curve_type, timestamp)
+            saved_count = HysteresisModel.save_hysteresis_points(points, curve_type, timestamp, durable=durable,
+                                                                 on_error=on_error)
             
             if saved_count > 0:
                 logger.info(f"成功保存 {saved_count} 个滞回曲线数据点 (类型: {curve_type})")
@@ -145,6 +258,32 @@ class DataService:
             logger.error(f"保存滞回曲线数据失败: {e}")
             return False
     
+    @staticmethod
+    def save_node_red_hysteresis(node_red_data: Dict[str, Any], durable: bool = False,
+                                 on_error: Optional[Callable[[Exception], None]] = None) -> Dict[str, Any]:
+        """
+        保存 Node-RED 数据中附带的滞回曲线（hysteresis_curve 字段），返回保存结果元数据
+        durable=False 时 saved 只表示已进入写队列，提交失败时调用 on_error
+        """
+        hysteresis_meta = {'saved': False, 'point_count': 0, 'timestamp': None}
+        try:
+            hyst = node_red_data.get('hysteresis_curve')
+            if not isinstance(hyst, dict):
+                return hysteresis_meta
+            raw_points = hyst.get('points')
+            ts = hyst.get('timestamp')
+            hysteresis_meta['timestamp'] = ts
+            normalized_points = normalize_hysteresis_points(raw_points)
+            
+            if normalized_points:
+                saved = DataService.save_hysteresis_data(normalized_points, curve_type='hysteresis', timestamp=ts,
+                                                         durable=durable, on_error=on_error)
+                hysteresis_meta['saved'] = saved
+                hysteresis_meta['point_count'] = len(normalized_points) if saved else 0
+        except Exception as e:
+            logger.warning(f"保存Node-RED滞回曲线失败: {e}")
+        return hysteresis_meta
+    
     @staticmethod
     def save_separated_hysteresis_data(raw_data: List[Dict[str, float]], 
                                      timestamp: Optional[int] = None) -> Dict[str, int]:
@@ -175,6 +314,51 @@ class DataService:
             logger.error(f"分析滞回曲线失败: {e}")
             return {}
     
+    @staticmethod
+    def wait_for_changes(since: Optional[int], keys: Optional[List[str]] = None,
+                         timeout: float = 25.0) -> Dict[str, Any]:
+        """
+        长轮询：等待序号 since 之后测量值或滞回曲线发生变化，只返回变化的部分
+        since 为空或无法给出增量（服务重启、客户端落后过多）时立即返回全量（reset=True）
+        """
+        datasets = (data_version.DATASET_MEASUREMENTS, data_version.DATASET_HYSTERESIS)
+        wanted = list(keys) if keys else list(DataService.ALL_KEYS)
+        deadline = time.monotonic() + max(0.0, timeout)
+        version, changes = data_version.change_seq(), None
+        changed_keys, curve_types = wanted, None
+        while since is not None:
+            version, changes = data_version.wait_for_changes(since, datasets, deadline - time.monotonic())
+            if changes is None:
+                changed_keys, curve_types = wanted, None
+                break
+            # None 表示整个数据集变化（如数据清理）
+            measured = changes.get(data_version.DATASET_MEASUREMENTS, frozenset())
+            changed_keys = wanted if measured is None else [k for k in wanted if k in measured]
+            curve_types = changes.get(data_version.DATASET_HYSTERESIS, frozenset())
+            # 只有未关注的测量项变化时继续等待
+            if changed_keys or curve_types is None or curve_types or time.monotonic() >= deadline:
+                break
+            since = version
+        reset = changes is None
+        hysteresis_changed = curve_types is None or bool(curve_types)
+        
+        # 后台采样线程是否持续入库：否则测量值不会产生变化通知，客户端应改为按周期主动刷新
+        poller = get_node_red_poller()
+        writer_active = poller is not None and poller.running and poller.persist
+        
+        return {
+            'version': version,
+            'reset': reset,
+            'writer_active': writer_active,
+            'changed': bool(changed_keys) or hysteresis_changed,
+            'measurements': DataService.get_current_measurements(changed_keys) if changed_keys else {},
+            'hysteresis': {
+                'changed': hysteresis_changed,
+                'curve_types': sorted(curve_types) if curve_types else []
+            },
+            'timestamp': now_ms()
+        }
+    
     @staticmethod
     def get_data_statistics() -> Dict[str, Any]:
         """获取数据统计信息"""
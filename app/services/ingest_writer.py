@@ -0,0 +1,342 @@
+"""
+入库写线程（组提交）
+单个后台线程从有界队列中取出写请求，按行数/时间合并为一个事务提交，
+减少SQLite频繁小事务带来的fsync开销
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.utils.database import execute_transaction
+
+logger = logging.getLogger(__name__)
+
+# 单条语句：(SQL, 参数列表)
+Statement = Tuple[str, Sequence[Sequence[Any]]]
+
+
+class _WriteRequest:
+    """一次写请求（可包含多条语句，保证在同一事务中提交）"""
+
+    __slots__ = ('statements', 'rows', 'on_commit', 'on_error', 'done', 'error', 'enqueued_at',
+                 'claimed', 'cancelled')
+
+    def __init__(self, statements: List[Statement], on_commit: Optional[Callable[[], None]] = None,
+                 durable: bool = False, on_error: Optional[Callable[[Exception], None]] = None):
+        self.statements = statements
+        self.rows = sum(len(params) for _, params in statements)
+        self.on_commit = on_commit
+        self.on_error = on_error
+        self.done = threading.Event() if durable else None
+        self.error: Optional[Exception] = None
+        self.enqueued_at = time.monotonic()
+        # claimed：已进入提交中的批次；cancelled：等待超时后撤销，写线程跳过（由 IngestWriter._claim_lock 保护）
+        self.claimed = False
+        self.cancelled = False
+
+
+class IngestWriter:
+    """组提交写线程"""
+
+    def __init__(self, db_path: str, max_queue: int = 1000, flush_rows: int = 500,
+                 flush_interval_ms: int = 200, put_timeout: float = 5.0):
+        self.db_path = db_path
+        self.flush_rows = max(1, int(flush_rows))
+        self.flush_interval = max(1, int(flush_interval_ms)) / 1000.0
+        self.put_timeout = put_timeout
+        self._queue: 'queue.Queue[Optional[_WriteRequest]]' = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._claim_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'rows': 0,
+            'commits': 0,
+            'failed_requests': 0,
+            'abandoned_requests': 0,
+            'cancelled_requests': 0,
+            'last_error': None,
+            'direct_writes': 0,
+            'max_batch_rows': 0,
+            'max_queue_depth': 0,
+            'last_commit_ms': 0.0,
+            'flush_reasons': {'size': 0, 'age': 0, 'durable': 0, 'shutdown': 0},
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='ingest-writer', daemon=True)
+        self._thread.start()
+        logger.info(f"入库写线程已启动 (flush_rows={self.flush_rows}, "
+                    f"flush_interval={int(self.flush_interval * 1000)}ms)")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        停止写线程，退出前提交队列中剩余的数据
+        超时仍未提交的请求按失败处理（调用 on_error，同步等待者收到异常），不会被当作已保存
+        """
+        if not self.running:
+            return
+        self._stop.set()
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("入库队列已满，等待写线程提交剩余数据")
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            error = RuntimeError("入库写线程停止超时，数据未提交")
+            abandoned = self._take_pending()
+            for req in abandoned:
+                self._fail(req, error)
+            with self._stats_lock:
+                self._stats['abandoned_requests'] += len(abandoned)
+            logger.error(f"入库写线程停止超时，{len(abandoned)} 个写请求未提交")
+            return
+        self._thread = None
+        # 停止期间并发提交、未被写线程取走的请求在当前线程补交
+        leftovers = self._take_pending()
+        if leftovers:
+            self._flush(leftovers, 'shutdown')
+        logger.info("入库写线程已停止")
+
+    def _take_pending(self) -> List[_WriteRequest]:
+        pending = []
+        while True:
+            try:
+                req = self._queue.get_nowait()
+            except queue.Empty:
+                return pending
+            if req is not None:
+                pending.append(req)
+
+    def _fail(self, req: _WriteRequest, error: Exception) -> None:
+        req.error = error
+        with self._stats_lock:
+            self._stats['last_error'] = str(error)
+        _run_callback(req.on_error, error)
+        if req.done is not None:
+            req.done.set()
+
+    def submit(self, statements: List[Statement], wait: bool = False,
+               timeout: Optional[float] = None, on_commit: Optional[Callable[[], None]] = None,
+               on_error: Optional[Callable[[Exception], None]] = None) -> int:
+        """
+        提交写请求，返回请求包含的行数
+        wait=True 时阻塞直到该请求所在批次提交完成（失败时抛出异常）；
+        等待超时且尚未开始提交的请求被撤销、不会再写入，随后抛出 TimeoutError，调用方可安全重试；
+        超时时已在提交中的请求继续等待本批提交结果；
+        不等待的请求提交失败时调用 on_error(异常)，on_commit 只在提交成功后调用
+        """
+        req = _WriteRequest(statements, on_commit, durable=wait, on_error=on_error)
+        if req.rows == 0:
+            return 0
+        if self._stop.is_set():
+            # 写线程正在停止：不再入队，在调用方线程直接写入（失败时抛出异常）
+            return self._write_direct(req)
+        try:
+            self._queue.put(req, timeout=self.put_timeout)
+        except queue.Full:
+            # 队列长时间满载：退化为调用方线程直接写入，避免丢数据
+            logger.warning("入库队列已满，改为同步直接写入")
+            return self._write_direct(req)
+
+        with self._stats_lock:
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], self._queue.qsize())
+
+        if wait:
+            if not req.done.wait(timeout):
+                with self._claim_lock:
+                    req.cancelled = not req.claimed
+                if req.cancelled:
+                    with self._stats_lock:
+                        self._stats['cancelled_requests'] += 1
+                    raise TimeoutError(f"等待数据提交超时 (> {timeout}s)，写请求已撤销")
+                req.done.wait()
+            if req.error is not None:
+                raise req.error
+        return req.rows
+
+    def _write_direct(self, req: _WriteRequest) -> int:
+        with self._stats_lock:
+            self._stats['direct_writes'] += 1
+        execute_transaction(req.statements, self.db_path)
+        _run_callback(req.on_commit)
+        return req.rows
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+            if first is None:
+                self._drain_and_flush([])
+                return
+
+            batch = [first]
+            rows = first.rows
+            reason = 'durable' if first.done is not None else None
+            deadline = first.enqueued_at + self.flush_interval
+            while reason is None:
+                if rows >= self.flush_rows:
+                    reason = 'size'
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    reason = 'age'
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    reason = 'age'
+                    break
+                if item is None:
+                    self._drain_and_flush(batch)
+                    return
+                batch.append(item)
+                rows += item.rows
+                if item.done is not None:
+                    reason = 'durable'
+
+            # 有同步等待者时，顺带带走队列中已积压的请求
+            if reason == 'durable':
+                while rows < self.flush_rows:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        self._drain_and_flush(batch)
+                        return
+                    batch.append(item)
+                    rows += item.rows
+            self._flush(batch, reason)
+
+    def _drain_and_flush(self, batch: List[_WriteRequest]) -> None:
+        batch.extend(self._take_pending())
+        if batch:
+            self._flush(batch, 'shutdown')
+
+    def _flush(self, batch: List[_WriteRequest], reason: str) -> None:
+        with self._claim_lock:
+            batch = [req for req in batch if not req.cancelled]
+            for req in batch:
+                req.claimed = True
+        if not batch:
+            return
+        started = time.monotonic()
+        statements: List[Statement] = []
+        for req in batch:
+            statements.extend(req.statements)
+        rows = sum(req.rows for req in batch)
+        failed = []
+        try:
+            execute_transaction(statements, self.db_path)
+        except Exception as e:
+            # 整批失败时逐个请求重试，避免单个坏请求拖垮整批数据
+            logger.warning(f"组提交失败，逐条重试: {e}")
+            for req in batch:
+                try:
+                    execute_transaction(req.statements, self.db_path)
+                except Exception as req_err:
+                    req.error = req_err
+                    failed.append(req)
+                    logger.error(f"写请求提交失败: {req_err}")
+
+        elapsed_ms = (time.monotonic() - started) * 1000.0
+        with self._stats_lock:
+            self._stats['requests'] += len(batch)
+            self._stats['rows'] += rows
+            self._stats['commits'] += 1
+            self._stats['failed_requests'] += len(failed)
+            if failed:
+                self._stats['last_error'] = str(failed[-1].error)
+            self._stats['max_batch_rows'] = max(self._stats['max_batch_rows'], rows)
+            self._stats['last_commit_ms'] = round(elapsed_ms, 2)
+            self._stats['flush_reasons'][reason] += 1
+
+        for req in batch:
+            if req.error is None:
+                _run_callback(req.on_commit)
+            else:
+                _run_callback(req.on_error, req.error)
+            if req.done is not None:
+                req.done.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats['flush_reasons'] = dict(self._stats['flush_reasons'])
+        stats['running'] = self.running
+        stats['queue_depth'] = self._queue.qsize()
+        stats['avg_batch_requests'] = round(stats['requests'] / stats['commits'], 2) if stats['commits'] else 0.0
+        return stats
+
+
+def _run_callback(callback: Optional[Callable[..., None]], *args: Any) -> None:
+    if callback is None:
+        return
+    try:
+        callback(*args)
+    except Exception as e:
+        logger.warning(f"提交回调执行失败: {e}")
+
+
+_writer: Optional[IngestWriter] = None
+
+
+def start_ingest_writer(app) -> Optional[IngestWriter]:
+    """按应用配置启动全局写线程"""
+    global _writer
+    if not app.config.get('INGEST_WRITER_ENABLED', True):
+        return None
+    if _writer is None or not _writer.running:
+        _writer = IngestWriter(
+            app.config['DATABASE_PATH'],
+            max_queue=app.config.get('INGEST_QUEUE_SIZE', 1000),
+            flush_rows=app.config.get('INGEST_FLUSH_ROWS', 500),
+            flush_interval_ms=app.config.get('INGEST_FLUSH_INTERVAL_MS', 200)
+        )
+        _writer.start()
+    return _writer
+
+
+def stop_ingest_writer() -> None:
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+
+def get_ingest_writer() -> Optional[IngestWriter]:
+    return _writer
+
+
+def submit_write(statements: List[Statement], durable: bool = False,
+                 on_commit: Optional[Callable[[], None]] = None, timeout: Optional[float] = 10.0,
+                 on_error: Optional[Callable[[Exception], None]] = None) -> int:
+    """
+    提交写入：写线程运行时走组提交队列，否则在当前线程同步写入
+    durable=True 时保证返回前数据已提交；同步写入与 durable 写入失败时直接抛出异常，
+    经队列异步提交的写入失败时调用 on_error(异常)
+    """
+    statements = [(q, p) for q, p in statements if p]
+    if not statements:
+        return 0
+    writer = _writer
+    if writer is not None and writer.running:
+        return writer.submit(statements, wait=durable, timeout=timeout, on_commit=on_commit, on_error=on_error)
+    rows = execute_transaction(statements)
+    _run_callback(on_commit)
+    return rows
@@ -0,0 +1,174 @@
+"""
+实时滞回曲线采样
+有订阅者时，单个后台线程按采样周期从 Node-RED 读取角位移/扭矩，写入带序号的环形缓冲区；
+推送流按序号增量读取并批量下发，订阅者全部断开一段时间后线程自动退出
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.helpers import now_ms
+
+logger = logging.getLogger(__name__)
+
+# 环形缓冲区中的一个采样点：(序号, 时间戳ms, 角位移, 扭矩)
+Point = Tuple[int, int, float, float]
+
+
+class LiveCurveSampler:
+    """实时角位移/扭矩采样线程"""
+
+    def __init__(self, app, sample_ms: int = 100, buffer_size: int = 20000, idle_timeout_s: float = 10.0):
+        self.app = app
+        self.interval = max(10, int(sample_ms)) / 1000.0
+        self.idle_timeout_s = max(0.0, float(idle_timeout_s))
+        self._points: deque = deque(maxlen=max(100, int(buffer_size)))
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._subscribers = 0
+        self._idle_since: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {'samples': 0, 'misses': 0, 'last_sample_ms': 0.0}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def head(self) -> int:
+        """最新采样点的序号（尚无采样时为 0）"""
+        with self._cond:
+            return self._seq
+
+    def subscribe(self) -> None:
+        """登记订阅者，采样线程未运行时启动"""
+        with self._cond:
+            self._subscribers += 1
+            self._idle_since = None
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='live-curve-sampler', daemon=True)
+            self._thread.start()
+        logger.info(f"实时曲线采样线程已启动 (周期 {int(self.interval * 1000)}ms)")
+
+    def unsubscribe(self) -> None:
+        with self._cond:
+            self._subscribers = max(0, self._subscribers - 1)
+            if self._subscribers == 0:
+                self._idle_since = time.monotonic()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self) -> None:
+        with self.app.app_context():
+            while not self._stop.is_set():
+                started = time.monotonic()
+                try:
+                    self.sample_once()
+                except Exception as e:
+                    logger.warning(f"实时曲线采样失败: {e}")
+                with self._cond:
+                    if self._subscribers == 0 and self._idle_since is not None \
+                            and time.monotonic() - self._idle_since >= self.idle_timeout_s:
+                        self._thread = None
+                        logger.info("实时曲线无订阅者，采样线程退出")
+                        return
+                elapsed = time.monotonic() - started
+                if self._stop.wait(max(0.0, self.interval - elapsed)):
+                    return
+
+    def sample_once(self) -> Optional[Point]:
+        """采样一次，角位移与扭矩都有效时追加到缓冲区（需在应用上下文中调用）"""
+        from app.services.data_service import DataService
+        from app.services.node_red_service import NodeRedService
+
+        started = time.monotonic()
+        values = NodeRedService.fetch_data_from_node_red(allow_reuse=False)
+        angle, torque = DataService.extract_angle_torque(values) if values else (None, None)
+        self._stats['last_sample_ms'] = round((time.monotonic() - started) * 1000.0, 2)
+        if angle is None or torque is None:
+            self._stats['misses'] += 1
+            return None
+        with self._cond:
+            self._seq += 1
+            point = (self._seq, now_ms(), angle, torque)
+            self._points.append(point)
+            self._stats['samples'] += 1
+            self._cond.notify_all()
+        return point
+
+    def read_since(self, seq: int, limit: int) -> Tuple[List[Point], bool]:
+        """
+        返回序号大于 seq 的采样点（最多 limit 个）与是否存在缺口
+        （请求的序号早于缓冲区起点时，缺口为 True，从缓冲区起点开始返回）
+        """
+        with self._cond:
+            if not self._points or seq >= self._seq:
+                return [], False
+            first = self._points[0][0]
+            gap = seq + 1 < first
+            start = max(seq + 1, first) - first
+            end = min(len(self._points), start + max(1, int(limit)))
+            return [self._points[i] for i in range(start, end)], gap
+
+    def wait_for_points(self, seq: int, timeout: float) -> bool:
+        """等待序号超过 seq 的新采样点，返回是否有新点"""
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            while self._seq <= seq and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._seq > seq
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                **self._stats,
+                'running': self.running,
+                'subscribers': self._subscribers,
+                'head': self._seq,
+                'buffered': len(self._points),
+                'sample_ms': int(self.interval * 1000),
+            }
+
+
+_sampler: Optional[LiveCurveSampler] = None
+_sampler_lock = threading.Lock()
+
+
+def get_live_curve_sampler(app=None) -> LiveCurveSampler:
+    """获取全局采样器（首次调用时按应用配置创建，不立即启动线程）"""
+    global _sampler
+    if _sampler is None:
+        if app is None:
+            from flask import current_app
+            app = current_app._get_current_object()
+        with _sampler_lock:
+            if _sampler is None:
+                _sampler = LiveCurveSampler(
+                    app,
+                    sample_ms=app.config.get('LIVE_CURVE_SAMPLE_MS', 100),
+                    buffer_size=app.config.get('LIVE_CURVE_BUFFER_SIZE', 20000),
+                    idle_timeout_s=app.config.get('LIVE_CURVE_IDLE_TIMEOUT_S', 10)
+                )
+    return _sampler
+
+
+def stop_live_curve_sampler() -> None:
+    global _sampler
+    with _sampler_lock:
+        sampler, _sampler = _sampler, None
+    if sampler is not None:
+        sampler.stop()
@@ -0,0 +1,240 @@
+"""
+Node-RED 后台轮询与实时数据快照
+单个后台线程按固定频率从 Node-RED 采样，发布带版本号的内存快照并入库一次；
+/api/data/measurements、/api/data/collect、/api/data/current 直接读取快照，
+浏览器标签页数量不再放大上游请求与重复写入
+"""
+import logging
+import threading
+import time
+from functools import partial
+from typing import Any, Dict, Optional
+
+from app.utils.helpers import now_ms
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot:
+    """一次采样结果（发布后只读，读者无需加锁）"""
+
+    __slots__ = ('version', 'values', 'fetched_at', 'polled')
+
+    def __init__(self, version: int, values: Dict[str, Any], fetched_at: Optional[int], polled: bool = True):
+        self.version = version
+        self.values = values
+        self.fetched_at = fetched_at
+        self.polled = polled
+
+    def age_ms(self) -> Optional[int]:
+        return None if self.fetched_at is None else max(0, now_ms() - self.fetched_at)
+
+    def meta(self) -> Dict[str, Any]:
+        """快照元数据（合并到接口的 _meta 中）"""
+        return {
+            'version': self.version,
+            'fetched_at': self.fetched_at,
+            'age_ms': self.age_ms(),
+            'polled': self.polled,
+        }
+
+
+_EMPTY_SNAPSHOT = Snapshot(0, {}, None)
+
+
+class NodeRedPoller:
+    """Node-RED 采样线程"""
+
+    def __init__(self, app, interval_ms: int = 1000, max_age_ms: int = 5000, persist: bool = True):
+        self.app = app
+        self.interval = max(50, int(interval_ms)) / 1000.0
+        self.max_age_ms = max(int(max_age_ms), int(self.interval * 1000))
+        self.persist = persist
+        self._snapshot = _EMPTY_SNAPSHOT
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_hysteresis = None
+        # 快照发布通知（推送流等待新版本）
+        self._published = threading.Condition()
+        self._stats = {
+            'polls': 0,
+            'successes': 0,
+            'failures': 0,
+            'consecutive_failures': 0,
+            'changes': 0,
+            'persisted': 0,
+            'persist_failures': 0,
+            'last_error_at': None,
+            'last_poll_ms': 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def snapshot(self) -> Snapshot:
+        return self._snapshot
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='node-red-poller', daemon=True)
+        self._thread.start()
+        logger.info(f"Node-RED 轮询线程已启动 (间隔 {int(self.interval * 1000)}ms)")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        with self._published:
+            self._published.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+            logger.info("Node-RED 轮询线程已停止")
+
+    def _loop(self) -> None:
+        with self.app.app_context():
+            while not self._stop.is_set():
+                started = time.monotonic()
+                try:
+                    self.poll_once()
+                except Exception as e:
+                    logger.error(f"Node-RED 轮询失败: {e}")
+                # 固定节拍：扣除本次采样耗时
+                elapsed = time.monotonic() - started
+                if self._stop.wait(max(0.0, self.interval - elapsed)):
+                    return
+
+    def poll_once(self) -> Snapshot:
+        """采样一次并发布快照（需在应用上下文中调用）"""
+        from app.services.node_red_service import NodeRedService
+
+        started = time.monotonic()
+        values = NodeRedService.fetch_data_from_node_red(allow_reuse=False)
+        self._stats['polls'] += 1
+        self._stats['last_poll_ms'] = round((time.monotonic() - started) * 1000.0, 2)
+
+        if not values:
+            # 采样失败时保留上一份快照，由读者按 max_age_ms 判断是否过期
+            self._stats['failures'] += 1
+            self._stats['consecutive_failures'] += 1
+            self._stats['last_error_at'] = now_ms()
+            return self._snapshot
+
+        self._stats['successes'] += 1
+        self._stats['consecutive_failures'] = 0
+        current = self._snapshot
+        version = current.version
+        if values != current.values:
+            version += 1
+            self._stats['changes'] += 1
+        snapshot = Snapshot(version, values, now_ms())
+        with self._published:
+            self._snapshot = snapshot
+            self._published.notify_all()
+
+        if self.persist:
+            self._persist(values)
+        return snapshot
+
+    def _persist(self, values: Dict[str, Any]) -> None:
+        from app.services.data_service import DataService
+
+        try:
+            if DataService.save_measurement_data(values, on_error=self._on_persist_error):
+                self._stats['persisted'] += 1
+        except Exception as e:
+            logger.warning(f"轮询数据入库失败: {e}")
+
+        # 同一条滞回曲线在多次采样中重复出现时只保存一次；提交失败时清除记录，下次采样重新保存
+        hyst = values.get('hysteresis_curve')
+        if isinstance(hyst, dict):
+            points = hyst.get('points')
+            key = (hyst.get('timestamp'), len(points) if isinstance(points, list) else 0)
+            if key != self._last_hysteresis:
+                meta = DataService.save_node_red_hysteresis(values, on_error=partial(self._on_hysteresis_error, key))
+                if meta['saved']:
+                    self._last_hysteresis = key
+
+    def _on_persist_error(self, error: Exception) -> None:
+        # 写线程回调：persisted 统计的是已进入写队列的采样，提交失败另行计数
+        self._stats['persist_failures'] += 1
+        logger.warning(f"轮询数据提交失败: {error}")
+
+    def _on_hysteresis_error(self, key, error: Exception) -> None:
+        self._stats['persist_failures'] += 1
+        if self._last_hysteresis == key:
+            self._last_hysteresis = None
+        logger.warning(f"轮询滞回曲线提交失败，下次采样重试: {error}")
+
+    def wait_for_change(self, version: int, timeout: float) -> Snapshot:
+        """等待版本号超过 version 的快照（最多 timeout 秒），超时返回当前快照"""
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._published:
+            while self._snapshot.version <= version and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._published.wait(remaining)
+            return self._snapshot
+
+    def get_stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            **self._stats,
+            'running': self.running,
+            'interval_ms': int(self.interval * 1000),
+            'max_age_ms': self.max_age_ms,
+            'persist': self.persist,
+            'snapshot': {**snapshot.meta(), 'keys': len(snapshot.values)},
+        }
+
+
+_poller: Optional[NodeRedPoller] = None
+
+
+def start_node_red_poller(app) -> Optional[NodeRedPoller]:
+    """按应用配置启动全局轮询线程"""
+    global _poller
+    if not app.config.get('NODE_RED_POLLER_ENABLED', True):
+        return None
+    if _poller is None or not _poller.running:
+        _poller = NodeRedPoller(
+            app,
+            interval_ms=app.config.get('NODE_RED_POLL_INTERVAL_MS', 1000),
+            max_age_ms=app.config.get('NODE_RED_SNAPSHOT_MAX_AGE_MS', 5000),
+            persist=app.config.get('NODE_RED_POLL_PERSIST', True)
+        )
+        _poller.start()
+    return _poller
+
+
+def stop_node_red_poller() -> None:
+    global _poller
+    if _poller is not None:
+        _poller.stop()
+        _poller = None
+
+
+def get_node_red_poller() -> Optional[NodeRedPoller]:
+    return _poller
+
+
+def get_node_red_snapshot() -> Snapshot:
+    """
+    获取 Node-RED 实时数据
+    轮询线程运行时返回共享快照（超过 max_age_ms 视为无数据）；
+    未启用轮询时在当前请求中同步采样一次（polled=False，由调用方负责入库）
+    """
+    poller = _poller
+    if poller is not None and poller.running:
+        snapshot = poller.snapshot
+        age = snapshot.age_ms()
+        if snapshot.values and age is not None and age <= poller.max_age_ms:
+            return snapshot
+        return Snapshot(snapshot.version, {}, snapshot.fetched_at)
+
+    from app.services.node_red_service import NodeRedService
+    values = NodeRedService.fetch_data_from_node_red() or {}
+    return Snapshot(0, values, now_ms() if values else None, polled=False)
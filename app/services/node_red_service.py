@@ -2,46 +2,281 @@
 Node-RED代理服务
 """
 import logging
+import re
+import threading
+import time
 import requests
-from typing import Dict, Any, Optional
+from functools import partial
+from typing import Dict, Any, List, Optional, Tuple
 from flask import current_app
 from app.utils.helpers import now_ms, safe_json_loads, safe_json_dumps
+from app.utils.http_session import get_http_client
+from app.utils.single_flight import SingleFlight
+from app.utils.circuit_breaker import CircuitBreaker
 
 logger = logging.getLogger(__name__)
 
+# 采集请求单飞合并（按采集地址）与熔断器，首次使用时按应用配置创建
+_fetch_flight: Optional[SingleFlight] = None
+_breaker: Optional[CircuitBreaker] = None
+_fetch_flight_lock = threading.Lock()
+
+
+# 每个采集地址学习到的 (请求方式, 提取路径)，路径由列表下标与字典键组成
+_collection_profiles: Dict[str, Dict[str, Any]] = {}
+_collection_profiles_lock = threading.Lock()
+
+# 提取路径终点为顶层映射时，出现这些包装结构说明返回格式已变化
+_WRAPPER_KEYS = ('payload', 'values')
+
+# command_logs 主键按段预留（见 reserve_ids）后在进程内分配，多进程之间不冲突；
+# 调用方无需等待插入返回ID，插入与状态更新都经写队列提交。{数据库路径: [下一个ID, 段内最后一个ID]}
+_command_log_ids: Dict[str, List[int]] = {}
+_command_log_ids_lock = threading.Lock()
+
+# 插入与状态更新都可能先于对方提交（如写队列满时直接写入），两条语句都按主键 UPSERT，任意顺序结果一致
+_COMMAND_LOG_INSERT = '''
+    INSERT INTO command_logs (id, command, params, response, status)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO NOTHING
+'''
+_COMMAND_LOG_COMPLETE = '''
+    INSERT INTO command_logs (id, command, params, response, status)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET response = excluded.response, status = excluded.status
+'''
+
+
+def _extract_values(payload: Any, path: Tuple = ()) -> Tuple[Optional[Dict[str, Any]], Optional[Tuple]]:
+    """兼容多种Node-RED返回结构，提取测量值映射，返回 (values, 提取路径)"""
+    try:
+        # 情况1：列表（多条消息）
+        if isinstance(payload, list):
+            for index, item in enumerate(payload):
+                res, res_path = _extract_values(item, path + (index,))
+                if isinstance(res, dict) and res:
+                    return res, res_path
+            return None, None
+        # 情况2：非字典直接返回空
+        if not isinstance(payload, dict):
+            return None, None
+        # 情况3：msg.payload 包装
+        if 'payload' in payload and isinstance(payload['payload'], (dict, list)):
+            res, res_path = _extract_values(payload['payload'], path + ('payload',))
+            if isinstance(res, dict) and res:
+                return res, res_path
+        # 情况4：直接包含 values
+        if 'values' in payload and isinstance(payload['values'], dict):
+            return payload['values'], path + ('values',)
+        # 情况5：data.values 包装
+        data_obj = payload.get('data')
+        if isinstance(data_obj, dict):
+            vals = data_obj.get('values')
+            if isinstance(vals, dict):
+                return vals, path + ('data', 'values')
+        # 情况6：顶层就是测量键映射（接受数字、字典或字符串）
+        if all(isinstance(v, (dict, int, float, str)) for v in payload.values()):
+            return payload, path
+        return None, None
+    except Exception:
+        return None, None
+
+
+def _follow_values_path(payload: Any, path: Tuple) -> Optional[Dict[str, Any]]:
+    """按已学习的路径直接取值，结构不符时返回 None（不做逐层启发式判断）"""
+    node = payload
+    for step in path:
+        if isinstance(step, int):
+            if not isinstance(node, list) or step >= len(node):
+                return None
+        elif not isinstance(node, dict) or step not in node:
+            return None
+        node = node[step]
+    if not isinstance(node, dict) or not node:
+        return None
+    if not path or path[-1] != 'values':
+        # 终点为测量键映射：若出现了更高优先级的包装结构，视为格式变化
+        if any(isinstance(node.get(k), (dict, list)) for k in _WRAPPER_KEYS):
+            return None
+        data_obj = node.get('data')
+        if isinstance(data_obj, dict) and isinstance(data_obj.get('values'), dict):
+            return None
+    return node
+
+
+def _get_collection_profile(url: str) -> Optional[Tuple[str, Tuple]]:
+    with _collection_profiles_lock:
+        profile = _collection_profiles.get(url)
+        if profile is None or profile['method'] is None:
+            return None
+        return profile['method'], profile['path']
+
+
+def _learn_collection_profile(url: str, method: str, path: Tuple) -> None:
+    with _collection_profiles_lock:
+        previous = _collection_profiles.get(url)
+        _collection_profiles[url] = {
+            'method': method,
+            'path': path,
+            'learned_at': now_ms(),
+            'hits': 0,
+            'relearns': (previous or {}).get('relearns', 0) + (1 if previous is not None else 0),
+            'invalidations': (previous or {}).get('invalidations', 0),
+        }
+
+
+def _record_profile_hit(url: str) -> None:
+    with _collection_profiles_lock:
+        profile = _collection_profiles.get(url)
+        if profile is not None:
+            profile['hits'] += 1
+
+
+def _forget_collection_profile(url: str) -> None:
+    """快速路径失败：保留统计，清除方式与路径，下次重新探测"""
+    with _collection_profiles_lock:
+        profile = _collection_profiles.get(url)
+        if profile is not None:
+            profile['method'] = None
+            profile['path'] = None
+            profile['invalidations'] += 1
+
+
+# PLC 寄存器地址：区域字母 + 编号（如 D3001）
+_REGISTER_ADDR_RE = re.compile(r'^([A-Za-z]+)(\d+)$')
+
+
+def _register_blocks(items: List[Tuple[str, str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """
+    将 (参数名, 地址, 值) 按地址排序并合并为连续寄存器块，返回 (块列表, 被覆盖的参数 {参数名: 地址})
+    块结构：{'addr', 'area', 'start', 'count', 'values', 'names'}；无法解析的地址单独成块（start 为 None）
+    同一地址出现多次时后出现的参数生效，先出现的参数不写入并计入被覆盖的参数
+    """
+    by_register: Dict[Tuple[str, int], Tuple[str, Any]] = {}
+    by_addr: Dict[str, Tuple[str, Any]] = {}
+    shadowed: Dict[str, str] = {}
+    for name, addr, value in items:
+        addr = str(addr).strip()
+        m = _REGISTER_ADDR_RE.match(addr)
+        if m:
+            target, key = by_register, (m.group(1).upper(), int(m.group(2)))
+            addr = f"{key[0]}{key[1]}"
+        else:
+            target, key = by_addr, addr
+        previous = target.get(key)
+        if previous is not None:
+            shadowed[previous[0]] = addr
+        target[key] = (name, value)
+
+    blocks: List[Dict[str, Any]] = []
+    for (area, index), (name, value) in sorted(by_register.items()):
+        last = blocks[-1] if blocks else None
+        if last is not None and last['area'] == area and last['start'] + last['count'] == index:
+            last['count'] += 1
+            last['values'].append(value)
+            last['names'].append(name)
+        else:
+            blocks.append({'addr': f"{area}{index}", 'area': area, 'start': index, 'count': 1,
+                           'values': [value], 'names': [name]})
+    for addr, (name, value) in by_addr.items():
+        blocks.append({'addr': addr, 'area': None, 'start': None, 'count': 1, 'values': [value], 'names': [name]})
+    return blocks, shadowed
+
+
+def _address_failures(response: Any) -> Dict[str, str]:
+    """
+    从 Node-RED 响应中提取逐地址的失败信息（地址 -> 错误）
+    支持 {'results': {addr: true/false/{'status','error'}}} 与 {'failed': [addr, ...]} 两种格式
+    """
+    failures: Dict[str, str] = {}
+    if not isinstance(response, dict):
+        return failures
+    results = response.get('results')
+    if isinstance(results, dict):
+        for addr, item in results.items():
+            if item is False:
+                failures[str(addr)] = '写入失败'
+            elif isinstance(item, dict) and (item.get('status') in ('failed', 'error') or item.get('success') is False):
+                failures[str(addr)] = str(item.get('error') or item.get('message') or '写入失败')
+    failed = response.get('failed')
+    if isinstance(failed, list):
+        for addr in failed:
+            failures.setdefault(str(addr), '写入失败')
+    return failures
+
+
+def _command_log_block_locked() -> List[int]:
+    """当前数据库的命令日志ID段，用完或尚未预留时预留新的一段（持有 _command_log_ids_lock 时调用）"""
+    from app.utils.database import reserve_ids
+    cfg = current_app.config
+    db_path = cfg.get('DATABASE_PATH', '')
+    block = _command_log_ids.get(db_path)
+    if block is None or block[0] > block[1]:
+        size = max(1, int(cfg.get('COMMAND_LOG_ID_BLOCK', 1000)))
+        first = reserve_ids('command_logs', size, db_path)
+        block = _command_log_ids[db_path] = [first, first + size - 1]
+    return block
+
+
+def _next_command_log_id() -> int:
+    with _command_log_ids_lock:
+        block = _command_log_block_locked()
+        log_id = block[0]
+        block[0] += 1
+        return log_id
+
+
+def reserve_command_log_ids() -> None:
+    """启动时预留首段命令日志ID，第一条命令不必等待预留提交（需在应用上下文中调用）"""
+    try:
+        with _command_log_ids_lock:
+            _command_log_block_locked()
+    except Exception as e:
+        logger.warning(f"预留命令日志ID失败: {e}")
+
+
+def _command_log_failed(message: str, error: Exception) -> None:
+    # 写线程回调：命令日志异步提交失败
+    logger.error(f"{message}: {error}")
+
 
 class NodeRedService:
     """Node-RED代理服务"""
     
     @staticmethod
-    def create_command_log(command: str, params: Optional[Dict[str, Any]] = None) -> int:
-        """创建命令日志（pending），返回日志ID"""
+    def create_command_log(command: str, params: Optional[Dict[str, Any]] = None,
+                           response: Optional[Dict[str, Any]] = None, status: str = 'pending') -> int:
+        """
+        创建命令日志，返回预先分配的日志ID（失败时返回0）
+        插入经写队列批量提交，不在调用方线程等待提交
+        """
         try:
-            from app.utils.database import execute_insert_return_id
-            query = '''
-                INSERT INTO command_logs (command, params, response, status)
-                VALUES (?, ?, ?, ?)
-            '''
+            from app.services.ingest_writer import submit_write
+            log_id = _next_command_log_id()
             params_json = safe_json_dumps(params) if params else None
-            log_id = execute_insert_return_id(query, [command, params_json, None, 'pending'])
-            return int(log_id or 0)
+            response_json = safe_json_dumps(response) if response else None
+            submit_write([(_COMMAND_LOG_INSERT, [(log_id, command, params_json, response_json, status)])],
+                         on_error=partial(_command_log_failed, f"创建命令日志失败(id={log_id})"))
+            return log_id
         except Exception as e:
             logger.error(f"创建命令日志失败: {e}")
             return 0
     
     @staticmethod
-    def complete_command_log(log_id: int, response: Optional[Dict[str, Any]] = None, success: bool = True) -> None:
-        """完成命令日志：更新响应与状态"""
+    def complete_command_log(log_id: int, response: Optional[Dict[str, Any]] = None, success: bool = True,
+                             status: Optional[str] = None, command: str = '',
+                             params: Optional[Dict[str, Any]] = None) -> None:
+        """
+        完成命令日志：写入响应与状态（经写队列批量提交），status 可覆盖按 success 推导的状态
+        command/params 用于插入尚未提交的日志行（状态更新先于插入提交时）
+        """
         try:
-            from app.utils.database import execute_query
-            status = 'success' if success else 'failed'
-            query = '''
-                UPDATE command_logs
-                SET response = ?, status = ?
-                WHERE id = ?
-            '''
+            from app.services.ingest_writer import submit_write
+            status = status or ('success' if success else 'failed')
+            params_json = safe_json_dumps(params) if params else None
             response_json = safe_json_dumps(response) if response else None
-            execute_query(query, [response_json, status, log_id])
+            submit_write([(_COMMAND_LOG_COMPLETE, [(log_id, command, params_json, response_json, status)])],
+                         on_error=partial(_command_log_failed, f"更新命令日志失败(id={log_id})"))
         except Exception as e:
             logger.error(f"更新命令日志失败(id={log_id}): {e}")
     
@@ -50,163 +285,250 @@ class NodeRedService:
         """获取请求超时时间"""
         return current_app.config.get('NODE_RED_TIMEOUT', 5)
     
+    @staticmethod
+    def get_timeouts() -> Tuple[float, float]:
+        """获取 (连接超时, 读取超时)，连接阶段单独限时，Node-RED 不可达时尽快失败"""
+        read_timeout = float(NodeRedService.get_timeout())
+        connect_timeout = float(current_app.config.get('NODE_RED_CONNECT_TIMEOUT', 2.0))
+        return min(connect_timeout, read_timeout), read_timeout
+    
     @staticmethod
     def get_base_url() -> str:
         """获取Node-RED基础URL"""
         return current_app.config.get('NODE_RED_BASE_URL', 'http://127.0.0.1:1880')
 
-    # 新增：优先从数据库读取采集/写入完整地址
+    # 采集/写入完整地址优先取系统配置（进程内缓存，经设置接口修改时自动刷新）
     @staticmethod
-    def get_collection_url() -> str:
-        """获取数据采集完整URL（优先系统配置）"""
+    def _get_configured_url(config_key: str) -> str:
         try:
-            from app.utils.database import execute_query
-            row = execute_query(
-                'SELECT config_value FROM system_config WHERE config_key = ?',
-                ['data_collection_url'],
-                fetch_one=True
-            )
-            url = ''
-            if row:
-                try:
-                    # sqlite3.Row 支持按列名索引
-                    url = row['config_value']
-                except Exception:
-                    # 兜底：将 Row 转为 dict 或按位置索引
-                    try:
-                        url = dict(row).get('config_value', '')
-                    except Exception:
-                        url = row[0] if len(row) > 0 else ''
+            from app.services.config_store import get_config_store
+            url = get_config_store().get_system_config(config_key, '')
             if url:
                 return url.strip()
         except Exception as e:
-            logger.warning(f"读取采集URL失败: {e}")
+            logger.warning(f"读取{config_key}失败: {e}")
+        return ''
+    
+    @staticmethod
+    def get_collection_url() -> str:
+        """获取数据采集完整URL（优先系统配置）"""
+        url = NodeRedService._get_configured_url('data_collection_url')
+        if url:
+            return url
         base_url = NodeRedService.get_base_url()
         return f"{base_url}/get/datas"
 
     @staticmethod
     def get_write_url() -> str:
         """获取数据写入完整URL（优先系统配置）"""
-        try:
-            from app.utils.database import execute_query
-            row = execute_query(
-                'SELECT config_value FROM system_config WHERE config_key = ?',
-                ['data_write_url'],
-                fetch_one=True
-            )
-            url = ''
-            if row:
-                try:
-                    url = row['config_value']
-                except Exception:
-                    try:
-                        url = dict(row).get('config_value', '')
-                    except Exception:
-                        url = row[0] if len(row) > 0 else ''
-            if url:
-                return url.strip()
-        except Exception as e:
-            logger.warning(f"读取写入URL失败: {e}")
+        url = NodeRedService._get_configured_url('data_write_url')
+        if url:
+            return url
         base_url = NodeRedService.get_base_url()
         return f"{base_url}/set/data"
+    
+    @staticmethod
+    def on_config_changed(section: str, keys: List[str]) -> None:
+        """连接地址变化时清除已学习的采集方式与复用窗口内的旧结果"""
+        if section != 'system_config' or (keys and 'data_collection_url' not in keys):
+            return
+        with _collection_profiles_lock:
+            _collection_profiles.clear()
+        if _fetch_flight is not None:
+            _fetch_flight.forget()
+        logger.info("Node-RED 连接地址已变化，已清除采集缓存")
 
     @staticmethod
-    def fetch_data_from_node_red() -> Optional[Dict[str, Any]]:
-        """从Node-RED获取数据"""
+    def _get_fetch_flight() -> SingleFlight:
+        global _fetch_flight
+        if _fetch_flight is None:
+            with _fetch_flight_lock:
+                if _fetch_flight is None:
+                    _fetch_flight = SingleFlight(current_app.config.get('NODE_RED_FETCH_REUSE_MS', 0))
+        return _fetch_flight
+    
+    @staticmethod
+    def get_circuit_breaker() -> CircuitBreaker:
+        """Node-RED 客户端熔断器（采集与命令共用），首次使用时按应用配置创建"""
+        global _breaker
+        if _breaker is None:
+            with _fetch_flight_lock:
+                if _breaker is None:
+                    cfg = current_app.config
+                    _breaker = CircuitBreaker(
+                        'Node-RED',
+                        failure_threshold=cfg.get('NODE_RED_BREAKER_THRESHOLD', 3),
+                        base_backoff_s=cfg.get('NODE_RED_BREAKER_BACKOFF_S', 1.0),
+                        max_backoff_s=cfg.get('NODE_RED_BREAKER_MAX_BACKOFF_S', 30.0)
+                    )
+        return _breaker
+    
+    @staticmethod
+    def get_circuit_state() -> Optional[Dict[str, Any]]:
+        breaker = _breaker
+        return breaker.get_state() if breaker is not None else None
+    
+    @staticmethod
+    def get_fetch_stats() -> Dict[str, Any]:
+        """采集请求合并统计（节省的上游请求数等）与各地址学习到的请求方式/提取路径"""
+        flight = _fetch_flight
+        stats = flight.get_stats() if flight is not None else {}
+        with _collection_profiles_lock:
+            stats['profiles'] = {
+                url: {**profile, 'path': list(profile['path']) if profile['path'] is not None else None}
+                for url, profile in _collection_profiles.items()
+            }
+        return stats
+    
+    @staticmethod
+    def fetch_data_from_node_red(allow_reuse: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        从Node-RED获取数据
+        同一采集地址的并发调用合并为一次上游请求并共享结果（只读）；
+        allow_reuse=False 时不复用窗口内的上次结果（后台轮询使用）
+        """
+        url = NodeRedService.get_collection_url()
+        return NodeRedService._get_fetch_flight().do(
+            url, lambda: NodeRedService._fetch_data(url), allow_reuse=allow_reuse
+        )
+    
+    @staticmethod
+    def _fetch_data(url: str) -> Optional[Dict[str, Any]]:
+        """
+        实际执行一次采集请求，熔断打开时直接返回 None
+        已学习到该地址的请求方式与提取路径时直接按其请求和取值；
+        快速路径失败（状态码或结构变化）时清除记录，按 GET优先、POST回退 重新探测
+        """
+        breaker = NodeRedService.get_circuit_breaker()
+        if not breaker.allow():
+            logger.debug(f"Node-RED熔断中，跳过采集（{breaker.retry_in_ms()}ms 后探测）")
+            return None
         try:
-            timeout = NodeRedService.get_timeout()
-            url = NodeRedService.get_collection_url()
+            timeout = NodeRedService.get_timeouts()
+            client = get_http_client()
             
-            logger.info(f"正在从Node-RED获取数据(GET优先): {url}")
+            profile = _get_collection_profile(url)
+            if profile is not None:
+                method, path = profile
+                payload = NodeRedService._request_payload(client, method, url, timeout)
+                values = _follow_values_path(payload, path) if payload is not None else None
+                if values:
+                    _record_profile_hit(url)
+                    breaker.record_success()
+                    logger.debug(f"Node-RED({method})快速路径获取数据，键数量: {len(values)}")
+                    return values
+                _forget_collection_profile(url)
+                logger.info(f"Node-RED({method})返回方式或结构已变化，重新探测: {url}")
             
-            def _extract_values(payload: Any) -> Optional[Dict[str, Any]]:
-                """兼容多种Node-RED返回结构，提取测量值映射"""
-                try:
-                    # 情况1：列表（多条消息）
-                    if isinstance(payload, list):
-                        for item in payload:
-                            res = _extract_values(item)
-                            if isinstance(res, dict) and res:
-                                return res
-                        return None
-                    # 情况2：非字典直接返回空
-                    if not isinstance(payload, dict):
-                        return None
-                    # 情况3：msg.payload 包装
-                    if 'payload' in payload and isinstance(payload['payload'], (dict, list)):
-                        res = _extract_values(payload['payload'])
-                        if isinstance(res, dict) and res:
-                            return res
-                    # 情况4：直接包含 values
-                    if 'values' in payload and isinstance(payload['values'], dict):
-                        return payload['values']
-                    # 情况5：data.values 包装
-                    data_obj = payload.get('data')
-                    if isinstance(data_obj, dict):
-                        vals = data_obj.get('values')
-                        if isinstance(vals, dict):
-                            return vals
-                    # 情况6：顶层就是测量键映射（接受数字、字典或字符串）
-                    if all(isinstance(v, (dict, int, float, str)) for v in payload.values()):
-                        return payload
-                    return None
-                except Exception:
-                    return None
+            logger.info(f"正在从Node-RED获取数据(GET优先): {url}")
             
             # 尝试 GET 请求
-            response = requests.get(
-                url,
-                timeout=timeout,
-                headers={'Accept': 'application/json'}
-            )
-            
-            if response.status_code == 200:
-                payload = response.json()
-                values = _extract_values(payload)
+            payload = NodeRedService._request_payload(client, 'GET', url, timeout)
+            if payload is not None:
+                values, path = _extract_values(payload)
                 if isinstance(values, dict) and values:
+                    _learn_collection_profile(url, 'GET', path)
+                    breaker.record_success()
                     logger.info(f"成功从Node-RED(GET)获取数据，键数量: {len(values)}")
                     return values
                 else:
                     logger.warning("Node-RED返回格式不含values，尝试POST方式")
-            else:
-                logger.info(f"GET方式未成功(status={response.status_code})，尝试POST")
             
             # 回退：POST 空JSON体
             logger.info(f"正在从Node-RED获取数据(POST回退): {url}")
-            response = requests.post(
+            response = client.post(
                 url,
                 json={},
                 timeout=timeout,
                 headers={'Content-Type': 'application/json'}
             )
             response.raise_for_status()
-            payload = response.json()
-            values = _extract_values(payload)
+            try:
+                payload = response.json()
+            except ValueError:
+                # 200 但响应不是JSON：服务可达，按数据格式不符处理
+                payload = None
+            values, path = _extract_values(payload)
             if isinstance(values, dict) and values:
+                _learn_collection_profile(url, 'POST', path)
+                breaker.record_success()
                 logger.info(f"成功从Node-RED(POST)获取数据，键数量: {len(values)}")
                 return values
             else:
+                # 服务可达但数据格式不符，不计入熔断失败
+                breaker.record_success()
                 logger.error("Node-RED返回数据不含测量值映射(values)，放弃")
                 return None
             
         except requests.exceptions.Timeout:
+            breaker.record_failure('timeout')
             logger.warning(f"Node-RED请求超时 (> {NodeRedService.get_timeout()}s)")
             return None
         except requests.exceptions.ConnectionError:
+            breaker.record_failure('connection_error')
             logger.warning("无法连接到Node-RED服务")
             return None
         except requests.exceptions.HTTPError as e:
+            NodeRedService._record_http_error(breaker, e)
             logger.error(f"Node-RED HTTP错误: {e}")
             return None
         except Exception as e:
+            breaker.record_failure(type(e).__name__)
             logger.error(f"从Node-RED获取数据失败: {e}")
             return None
+    
+    @staticmethod
+    def _request_payload(client, method: str, url: str, timeout) -> Any:
+        """按指定方式请求采集地址，非200或响应不是JSON时返回 None（网络异常向上抛出）"""
+        if method == 'GET':
+            response = client.get(url, timeout=timeout, headers={'Accept': 'application/json'})
+        else:
+            response = client.post(url, json={}, timeout=timeout, headers={'Content-Type': 'application/json'})
+        if response.status_code != 200:
+            logger.info(f"{method}方式未成功(status={response.status_code})")
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            return None
+    
+    @staticmethod
+    def _record_http_error(breaker: CircuitBreaker, error: requests.exceptions.HTTPError) -> None:
+        """5xx 视为服务故障计入熔断；4xx 说明服务可达（地址或参数问题）"""
+        status = getattr(error.response, 'status_code', None)
+        if status is not None and status >= 500:
+            breaker.record_failure(f'http_{status}')
+        else:
+            breaker.record_success()
 
     @staticmethod
-    def send_command_to_node_red(command: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """向Node-RED发送命令"""
+    def send_command_to_node_red(command: str, params: Optional[Dict[str, Any]] = None,
+                                 timeout_s: Optional[float] = None, client=None,
+                                 use_breaker: bool = True) -> Dict[str, Any]:
+        """
+        向Node-RED发送命令（熔断打开时立即返回 circuit_open 错误）
+        timeout_s: 读取超时上限（如批量命令的剩余截止时间），不超过 NODE_RED_TIMEOUT
+        client: 指定HTTP客户端（默认共享会话）；use_breaker=False 时不受熔断拦截，但仍记录结果
+        """
+        breaker = NodeRedService.get_circuit_breaker()
+        if use_breaker and not breaker.allow():
+            retry_in = breaker.retry_in_ms()
+            error_msg = f"Node-RED熔断中，命令未发送: {command}（{retry_in}ms 后探测）"
+            logger.warning(error_msg)
+            return {
+                'success': False,
+                'command': command,
+                'error': 'circuit_open',
+                'message': error_msg,
+                'retry_in_ms': retry_in,
+                'timestamp': now_ms()
+            }
+        response = None
         try:
-            timeout = NodeRedService.get_timeout()
+            connect_timeout, timeout = NodeRedService.get_timeouts()
+            if timeout_s is not None:
+                timeout = max(0.05, min(timeout, timeout_s))
+                connect_timeout = min(connect_timeout, timeout)
             
             # 优先使用配置中的完整写入地址
             url = NodeRedService.get_write_url()
@@ -222,11 +544,11 @@ class NodeRedService:
             
             logger.info(f"正在向Node-RED发送命令: {command} -> {url}")
             
-            # 发送POST请求
-            response = requests.post(
+            # 发送POST请求（复用共享会话中的长连接）
+            response = (client or get_http_client()).post(
                 url,
                 json=request_data,
-                timeout=timeout,
+                timeout=(connect_timeout, timeout),
                 headers={'Content-Type': 'application/json'}
             )
             
@@ -234,6 +556,7 @@ class NodeRedService:
             
             # 解析响应
             result = response.json()
+            breaker.record_success()
             
             logger.info(f"命令发送成功: {command}")
             
@@ -245,6 +568,7 @@ class NodeRedService:
             }
             
         except requests.exceptions.Timeout:
+            breaker.record_failure('timeout')
             error_msg = f"Node-RED命令请求超时 (> {timeout}s): {command}"
             logger.warning(error_msg)
             return {
@@ -255,6 +579,7 @@ class NodeRedService:
                 'timestamp': now_ms()
             }
         except requests.exceptions.ConnectionError:
+            breaker.record_failure('connection_error')
             error_msg = f"无法连接到Node-RED服务: {command}"
             logger.warning(error_msg)
             return {
@@ -265,6 +590,7 @@ class NodeRedService:
                 'timestamp': now_ms()
             }
         except requests.exceptions.HTTPError as e:
+            NodeRedService._record_http_error(breaker, e)
             error_msg = f"Node-RED HTTP错误: {e}"
             logger.error(error_msg)
             return {
@@ -275,6 +601,11 @@ class NodeRedService:
                 'timestamp': now_ms()
             }
         except Exception as e:
+            # 已收到响应（如响应体不是JSON）说明服务可达
+            if response is not None:
+                breaker.record_success()
+            else:
+                breaker.record_failure(type(e).__name__)
             error_msg = f"向Node-RED发送命令失败: {e}"
             logger.error(error_msg)
             return {
@@ -285,11 +616,57 @@ class NodeRedService:
                 'timestamp': now_ms()
             }
     
+    @staticmethod
+    def write_registers(params: Dict[str, Tuple[str, Any]]) -> Dict[str, Any]:
+        """
+        一次请求写入一组PLC寄存器（经写入地址发送 write_registers 命令）
+        params: {参数名: (地址, 值)}，连续地址合并为寄存器块
+        返回 {'success', 'results': {参数名: {'addr', 'status', 'error'?}}, 'blocks', 'node_red_ms', 'error'?}
+        """
+        items = [(name, addr, value) for name, (addr, value) in params.items()]
+        if not items:
+            return {'success': True, 'results': {}, 'blocks': [], 'node_red_ms': 0.0}
+        blocks, shadowed = _register_blocks(items)
+        payload_blocks = [{k: block[k] for k in ('addr', 'area', 'start', 'count', 'values')} for block in blocks]
+
+        started = time.monotonic()
+        result = NodeRedService.send_command_to_node_red('write_registers', {'blocks': payload_blocks})
+        node_red_ms = round((time.monotonic() - started) * 1000.0, 2)
+        sent = bool(result.get('success'))
+        failures = _address_failures(result.get('response')) if sent else {}
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for block in blocks:
+            for offset, name in enumerate(block['names']):
+                addr = block['addr'] if block['start'] is None else f"{block['area']}{block['start'] + offset}"
+                if not sent:
+                    results[name] = {'addr': addr, 'status': 'failed',
+                                     'error': result.get('message') or result.get('error', 'unknown_error')}
+                elif addr in failures:
+                    results[name] = {'addr': addr, 'status': 'failed', 'error': failures[addr]}
+                else:
+                    results[name] = {'addr': addr, 'status': 'success'}
+        for name, addr in shadowed.items():
+            results[name] = {'addr': addr, 'status': 'failed', 'error': 'duplicate_address'}
+
+        NodeRedService.log_command('write_registers', {'blocks': payload_blocks}, result,
+                                   'success' if sent and not failures else 'failed')
+        summary = {
+            'success': sent and not failures and not shadowed,
+            'results': results,
+            'blocks': [{'addr': block['addr'], 'count': block['count']} for block in blocks],
+            'node_red_ms': node_red_ms,
+        }
+        if not sent:
+            summary['error'] = result.get('error', 'unknown_error')
+            summary['message'] = result.get('message')
+        return summary
+
     @staticmethod
     def test_node_red_connection() -> Dict[str, Any]:
         """测试Node-RED连接"""
         try:
-            timeout = NodeRedService.get_timeout()
+            timeout = NodeRedService.get_timeouts()
             base_url = NodeRedService.get_base_url()
             collection_url = NodeRedService.get_collection_url()
             write_url = NodeRedService.get_write_url()
@@ -305,7 +682,7 @@ class NodeRedService:
             
             for url in test_urls:
                 try:
-                    response = requests.get(url, timeout=timeout)
+                    response = get_http_client().get(url, timeout=timeout)
                     if response.status_code < 500:  # 任何非服务器错误都算连接成功
                         return {
                             'success': True,
@@ -338,17 +715,41 @@ class NodeRedService:
                    response: Optional[Dict[str, Any]] = None, status: str = 'pending'):
         """记录命令日志（兼容旧接口，不返回ID）"""
         try:
-            from app.utils.database import execute_query
+            from app.services.ingest_writer import submit_write
             query = '''
                 INSERT INTO command_logs (command, params, response, status)
                 VALUES (?, ?, ?, ?)
             '''
             params_json = safe_json_dumps(params) if params else None
             response_json = safe_json_dumps(response) if response else None
-            execute_query(query, [command, params_json, response_json, status])
+            submit_write([(query, [(command, params_json, response_json, status)])],
+                         on_error=partial(_command_log_failed, f"记录命令日志失败({command})"))
         except Exception as e:
             logger.error(f"记录命令日志失败: {e}")
 
+    @staticmethod
+    def get_command_log(log_id: int) -> Optional[Dict[str, Any]]:
+        """按ID查询命令日志，不存在时返回 None"""
+        try:
+            from app.utils.database import execute_query
+            row = execute_query(
+                'SELECT id, command, params, response, status, created_at FROM command_logs WHERE id = ?',
+                [log_id], fetch_one=True
+            )
+            if not row:
+                return None
+            return {
+                'id': row['id'],
+                'command': row['command'],
+                'params': safe_json_loads(row['params']),
+                'response': safe_json_loads(row['response']),
+                'status': row['status'],
+                'created_at': row['created_at']
+            }
+        except Exception as e:
+            logger.error(f"查询命令日志失败(id={log_id}): {e}")
+            return None
+
     @staticmethod
     def get_command_history(limit: int = 50) -> list:
         """获取命令历史"""
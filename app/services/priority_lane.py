@@ -0,0 +1,199 @@
+"""
+安全命令优先通道
+emergency_stop、stop_test、reset 等命令不进入异步队列、不受熔断拦截，
+经独立的预热连接池立即发送（不与批量命令争用连接），发送后再记录日志，
+并统计端到端延迟，用于验证停机命令在限定时间内到达 Node-RED
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.utils.helpers import now_ms
+from app.utils.http_session import HttpClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRIORITY_COMMANDS = ('emergency_stop', 'stop_test', 'reset')
+
+
+class PriorityLane:
+    """优先通道：独立连接池 + 预热线程 + 延迟统计"""
+
+    def __init__(self, app, commands: Iterable[str] = DEFAULT_PRIORITY_COMMANDS, timeout_s: float = 2.0,
+                 connect_timeout_s: float = 1.0, warm_interval_s: float = 4.0, budget_ms: float = 500.0,
+                 window: int = 200):
+        self.app = app
+        self.commands = frozenset(c.strip() for c in commands if c and c.strip())
+        self.timeout_s = max(0.1, float(timeout_s))
+        self.connect_timeout_s = min(max(0.05, float(connect_timeout_s)), self.timeout_s)
+        self.warm_interval_s = max(0.0, float(warm_interval_s))
+        self.budget_ms = float(budget_ms)
+        # 停机命令串行发送即可，保留两条连接以便预热请求与命令互不等待
+        self.client = HttpClient(pool_connections=1, pool_maxsize=2,
+                                 connect_timeout=self.connect_timeout_s, read_timeout=self.timeout_s)
+        self._latencies: deque = deque(maxlen=max(10, int(window)))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {'sent': 0, 'succeeded': 0, 'failed': 0, 'over_budget': 0, 'last_ms': None,
+                       'max_ms': 0.0, 'warmups': 0, 'warmup_failures': 0, 'last_warm_at': None}
+
+    def is_priority(self, command: Optional[str]) -> bool:
+        return command in self.commands
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running or not self.warm_interval_s:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._warm_loop, name='command-priority-warmer', daemon=True)
+        self._thread.start()
+        logger.info(f"优先命令通道已启动 (预热间隔 {self.warm_interval_s}s)")
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.client.close()
+
+    def _warm_loop(self) -> None:
+        with self.app.app_context():
+            while True:
+                self.warm()
+                # 间隔应小于 Node-RED（Node.js）的 keep-alive 空闲超时，连接才不会被对端关闭
+                if self._stop.wait(self.warm_interval_s):
+                    return
+
+    def warm(self) -> bool:
+        """对写入地址所在主机发送轻量请求，保持池中连接已建立（需在应用上下文中调用）"""
+        from app.services.node_red_service import NodeRedService
+
+        try:
+            response = self.client.request('HEAD', NodeRedService.get_base_url(),
+                                           timeout=(self.connect_timeout_s, self.timeout_s))
+            response.close()
+            ok = True
+        except Exception as e:
+            logger.debug(f"优先通道预热失败: {e}")
+            ok = False
+        with self._lock:
+            self._stats['warmups'] += 1
+            if ok:
+                self._stats['last_warm_at'] = now_ms()
+            else:
+                self._stats['warmup_failures'] += 1
+        return ok
+
+    def send(self, command: str, params: Optional[Dict[str, Any]] = None,
+             started: Optional[float] = None) -> Tuple[Dict[str, Any], int]:
+        """
+        立即发送优先命令，成功与否都在发送之后记录命令日志
+        started: 端到端计时起点（time.monotonic()，默认为调用时刻）
+        返回 (结果, 日志ID)
+        """
+        from app.services.node_red_service import NodeRedService
+
+        started = time.monotonic() if started is None else started
+        result = NodeRedService.send_command_to_node_red(
+            command, params, timeout_s=self.timeout_s, client=self.client, use_breaker=False
+        )
+        latency_ms = round((time.monotonic() - started) * 1000.0, 2)
+        result = dict(result)
+        result['priority'] = True
+        result['latency_ms'] = latency_ms
+        self._record(latency_ms, bool(result.get('success')))
+
+        success = bool(result.get('success'))
+        log_id = NodeRedService.create_command_log(
+            command, params, result, 'success' if success else 'failed'
+        )
+        if latency_ms > self.budget_ms:
+            logger.warning(f"优先命令 {command} 端到端耗时 {latency_ms}ms，超过预算 {self.budget_ms}ms")
+        return result, log_id
+
+    def _record(self, latency_ms: float, success: bool) -> None:
+        with self._lock:
+            self._latencies.append(latency_ms)
+            self._stats['sent'] += 1
+            self._stats['succeeded' if success else 'failed'] += 1
+            self._stats['last_ms'] = latency_ms
+            self._stats['max_ms'] = max(self._stats['max_ms'], latency_ms)
+            if latency_ms > self.budget_ms:
+                self._stats['over_budget'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            samples = sorted(self._latencies)
+
+        def _pct(q: float) -> Optional[float]:
+            if not samples:
+                return None
+            return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+        stats.update({
+            'commands': sorted(self.commands),
+            'running': self.running,
+            'timeout_s': self.timeout_s,
+            'budget_ms': self.budget_ms,
+            'p50_ms': _pct(0.50),
+            'p99_ms': _pct(0.99),
+            'connection': self.client.get_stats()['hosts'],
+        })
+        return stats
+
+
+_lane: Optional[PriorityLane] = None
+_lane_lock = threading.Lock()
+
+
+def _create_lane(app) -> PriorityLane:
+    commands = app.config.get('COMMAND_PRIORITY_COMMANDS', ','.join(DEFAULT_PRIORITY_COMMANDS))
+    if isinstance(commands, str):
+        commands = commands.split(',')
+    return PriorityLane(
+        app,
+        commands=commands,
+        timeout_s=app.config.get('COMMAND_PRIORITY_TIMEOUT_S', 2.0),
+        connect_timeout_s=app.config.get('COMMAND_PRIORITY_CONNECT_TIMEOUT_S', 1.0),
+        warm_interval_s=app.config.get('COMMAND_PRIORITY_WARM_INTERVAL_S', 4.0),
+        budget_ms=app.config.get('COMMAND_PRIORITY_BUDGET_MS', 500)
+    )
+
+
+def start_priority_lane(app) -> PriorityLane:
+    """创建全局优先通道并启动预热线程"""
+    global _lane
+    with _lane_lock:
+        if _lane is None:
+            _lane = _create_lane(app)
+        lane = _lane
+    lane.start()
+    return lane
+
+
+def stop_priority_lane() -> None:
+    global _lane
+    with _lane_lock:
+        lane, _lane = _lane, None
+    if lane is not None:
+        lane.stop()
+
+
+def get_priority_lane() -> PriorityLane:
+    """获取优先通道，未启动时按当前应用创建（不预热）"""
+    global _lane
+    lane = _lane
+    if lane is None:
+        from flask import current_app
+        with _lane_lock:
+            if _lane is None:
+                _lane = _create_lane(current_app._get_current_object())
+            lane = _lane
+    return lane
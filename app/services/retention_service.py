@@ -0,0 +1,329 @@
+"""
+数据保留与压缩服务
+按表配置保留策略，分批删除过期数据（批次之间让出写锁），
+随后执行增量 VACUUM 与 WAL 检查点，并记录回收的行数/空间与持锁时间
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from app.utils import data_version
+from app.utils.database import get_db_connection
+from app.utils.helpers import now_ms
+
+logger = logging.getLogger(__name__)
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+class RetentionPolicy:
+    """
+    单个保留策略
+    cutoff_kind: 'ms' 表示毫秒时间戳列，'datetime' 表示 CURRENT_TIMESTAMP 文本列
+    pk: 用于分批删除的行标识（WITHOUT ROWID 表使用主键列）
+    """
+
+    def __init__(self, name: str, table: str, column: str, days: int,
+                 cutoff_kind: str = 'ms', pk: str = 'rowid', extra_where: str = '',
+                 select_pk: str = '', source: str = ''):
+        self.name = name
+        self.table = table
+        self.column = column
+        self.days = int(days)
+        self.cutoff_kind = cutoff_kind
+        self.pk = pk
+        self.extra_where = extra_where
+        self.select_pk = select_pk
+        self.source = source
+
+    def cutoff(self, days: Optional[int] = None) -> Any:
+        days = self.days if days is None else int(days)
+        if self.cutoff_kind == 'datetime':
+            return (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+        return now_ms() - days * DAY_MS
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'table': self.table, 'column': self.column, 'days': self.days}
+
+
+def delete_in_batches(table: str, column: str, cutoff: Any, batch_size: int = 2000,
+                      pause_s: float = 0.05, pk: str = 'rowid', extra_where: str = '',
+                      select_pk: str = '', source: str = '',
+                      db_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    分批删除 column < cutoff 的行，每批一个短事务，批次之间暂停以便其他写入获得锁
+    source/select_pk 可指定挑选待删行的子查询来源（如按序列连接以利用主键范围扫描）
+    返回删除行数、批次数与持锁耗时
+    """
+    condition = f'{column} < ?'
+    if extra_where:
+        condition += f' AND ({extra_where})'
+    query = f'''
+        DELETE FROM {table}
+        WHERE ({pk}) IN (SELECT {select_pk or pk} FROM {source or table} WHERE {condition} LIMIT ?)
+    '''
+    result = {'rows': 0, 'batches': 0, 'lock_time_ms': 0.0, 'max_lock_ms': 0.0}
+    while True:
+        started = time.monotonic()
+        with get_db_connection(db_path) as conn:
+            deleted = conn.execute(query, [cutoff, batch_size]).rowcount
+        lock_ms = (time.monotonic() - started) * 1000.0
+        if deleted > 0:
+            data_version.bump_table(table)
+        result['batches'] += 1
+        result['rows'] += max(deleted, 0)
+        result['lock_time_ms'] += lock_ms
+        result['max_lock_ms'] = max(result['max_lock_ms'], lock_ms)
+        if deleted < batch_size:
+            break
+        if pause_s > 0:
+            time.sleep(pause_s)
+    result['lock_time_ms'] = round(result['lock_time_ms'], 2)
+    result['max_lock_ms'] = round(result['max_lock_ms'], 2)
+    return result
+
+
+def build_default_policies(config) -> List[RetentionPolicy]:
+    """根据应用配置生成默认保留策略"""
+    from app.models.hysteresis import HysteresisModel
+    from app.models.measurement import MeasurementModel
+
+    data_days = config.get('DATA_RETENTION_DAYS', 30)
+    samples = MeasurementModel.SAMPLE_RETENTION_TARGET
+    test_runs = HysteresisModel.TEST_RUN_RETENTION_TARGET
+    return [
+        RetentionPolicy('measurements', samples['table'], samples['column'], data_days,
+                        pk=samples['pk'], select_pk=samples['select_pk'], source=samples['source']),
+        # 不再生成1秒桶：保留该策略，清理旧版本写入的1秒桶
+        RetentionPolicy('rollups_1s', 'measurement_rollups', 'bucket_ts',
+                        config.get('ROLLUP_1S_RETENTION_DAYS', 30),
+                        pk='key, resolution_ms, bucket_ts', extra_where='resolution_ms = 1000'),
+        RetentionPolicy('rollups_1m', 'measurement_rollups', 'bucket_ts',
+                        config.get('ROLLUP_1M_RETENTION_DAYS', 365),
+                        pk='key, resolution_ms, bucket_ts', extra_where='resolution_ms = 60000'),
+        RetentionPolicy('rollups_1h', 'measurement_rollups', 'bucket_ts',
+                        config.get('ROLLUP_1H_RETENTION_DAYS', 0),
+                        pk='key, resolution_ms, bucket_ts', extra_where='resolution_ms = 3600000'),
+        RetentionPolicy('curves', 'curves', 'ts', data_days),
+        RetentionPolicy('test_runs', test_runs['table'], test_runs['column'], data_days,
+                        extra_where=test_runs['extra_where']),
+        RetentionPolicy('command_logs', 'command_logs', 'created_at',
+                        config.get('COMMAND_LOG_RETENTION_DAYS', 90), cutoff_kind='datetime'),
+    ]
+
+
+class RetentionEngine:
+    """数据保留引擎（可后台定时运行）"""
+
+    def __init__(self, db_path: str, policies: List[RetentionPolicy], interval_s: int = 3600,
+                 batch_size: int = 2000, pause_ms: int = 50, vacuum_pages: int = 1000):
+        self.db_path = db_path
+        self.policies = {p.name: p for p in policies}
+        self.interval_s = max(1, int(interval_s))
+        self.batch_size = max(1, int(batch_size))
+        self.pause_s = max(0, int(pause_ms)) / 1000.0
+        self.vacuum_pages = max(1, int(vacuum_pages))
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_report: Optional[Dict[str, Any]] = None
+        self._next_run_at: Optional[int] = None
+        self._runs = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='retention', daemon=True)
+        self._thread.start()
+        logger.info(f"数据保留引擎已启动 (间隔 {self.interval_s}s)")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self._next_run_at = now_ms() + self.interval_s * 1000
+            if self._stop.wait(self.interval_s):
+                return
+            try:
+                self.run()
+            except Exception as e:
+                logger.error(f"定时数据清理失败: {e}")
+
+    def _db_size(self) -> Dict[str, int]:
+        with get_db_connection(self.db_path) as conn:
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+            freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            auto_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+        return {'page_size': page_size, 'page_count': page_count,
+                'freelist_count': freelist, 'auto_vacuum': auto_vacuum}
+
+    def _incremental_vacuum(self) -> Dict[str, Any]:
+        """分步释放空闲页（仅 auto_vacuum=INCREMENTAL 的库有效）"""
+        result = {'steps': 0, 'lock_time_ms': 0.0}
+        while not self._stop.is_set():
+            started = time.monotonic()
+            with get_db_connection(self.db_path) as conn:
+                before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                if before == 0:
+                    break
+                # executescript 会把语句执行到底；execute 只单步执行，每次仅释放一页
+                conn.executescript(f'PRAGMA incremental_vacuum({self.vacuum_pages});')
+                after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            result['steps'] += 1
+            result['lock_time_ms'] += (time.monotonic() - started) * 1000.0
+            if after == 0 or after >= before:
+                break
+            if self.pause_s > 0:
+                time.sleep(self.pause_s)
+        result['lock_time_ms'] = round(result['lock_time_ms'], 2)
+        return result
+
+    def _checkpoint(self) -> Optional[Dict[str, int]]:
+        with get_db_connection(self.db_path) as conn:
+            row = conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+        if row is None:
+            return None
+        return {'busy': row[0], 'log_frames': row[1], 'checkpointed_frames': row[2]}
+
+    def run(self, only: Optional[List[str]] = None, days_override: Optional[int] = None) -> Dict[str, Any]:
+        """
+        执行一次清理；only 指定只运行部分策略，days_override 覆盖保留天数
+        （不适用于保留天数为0即永久保留的策略，如1小时汇总）
+        返回回收的行数、空间和持锁时间报告
+        """
+        if not self._run_lock.acquire(blocking=False):
+            return {'skipped': True, 'reason': 'already_running'}
+        try:
+            started = time.monotonic()
+            size_before = self._db_size()
+            report: Dict[str, Any] = {'started_at': now_ms(), 'policies': {}}
+            total_rows = 0
+            total_lock = 0.0
+            max_lock = 0.0
+
+            for name, policy in self.policies.items():
+                if only and name not in only:
+                    continue
+                days = policy.days if days_override is None or policy.days <= 0 else days_override
+                if days <= 0:
+                    report['policies'][name] = {'skipped': True, 'days': days}
+                    continue
+                try:
+                    res = delete_in_batches(
+                        policy.table, policy.column, policy.cutoff(days),
+                        batch_size=self.batch_size, pause_s=self.pause_s,
+                        pk=policy.pk, extra_where=policy.extra_where,
+                        select_pk=policy.select_pk, source=policy.source, db_path=self.db_path
+                    )
+                except Exception as e:
+                    logger.error(f"数据清理失败 ({name}): {e}")
+                    report['policies'][name] = {'error': str(e), 'days': days}
+                    continue
+                res['days'] = days
+                report['policies'][name] = res
+                total_rows += res['rows']
+                total_lock += res['lock_time_ms']
+                max_lock = max(max_lock, res['max_lock_ms'])
+
+            vacuum = None
+            if size_before['auto_vacuum'] == 2:
+                vacuum = self._incremental_vacuum()
+                total_lock += vacuum['lock_time_ms']
+            try:
+                checkpoint = self._checkpoint()
+            except Exception as e:
+                logger.warning(f"WAL检查点失败: {e}")
+                checkpoint = None
+
+            size_after = self._db_size()
+            page_size = size_after['page_size']
+            report.update({
+                'rows_deleted': total_rows,
+                'bytes_reclaimed': (size_before['page_count'] - size_after['page_count']) * page_size,
+                'free_bytes': size_after['freelist_count'] * page_size,
+                'file_bytes': size_after['page_count'] * page_size,
+                'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}.get(size_after['auto_vacuum']),
+                'incremental_vacuum': vacuum,
+                'wal_checkpoint': checkpoint,
+                'lock_time_ms': round(total_lock, 2),
+                'max_lock_ms': round(max_lock, 2),
+                'duration_ms': round((time.monotonic() - started) * 1000.0, 2)
+            })
+            self._last_report = report
+            self._runs += 1
+            if total_rows:
+                logger.info(f"数据清理完成: 删除 {total_rows} 行, 回收 {report['bytes_reclaimed']} 字节")
+            return report
+        finally:
+            self._run_lock.release()
+
+    def enable_incremental_vacuum(self) -> Dict[str, Any]:
+        """
+        将已有数据库切换为 auto_vacuum=INCREMENTAL
+        需要执行一次完整 VACUUM（会长时间持锁），仅在维护窗口手动调用
+        """
+        with self._run_lock:
+            started = time.monotonic()
+            with get_db_connection(self.db_path) as conn:
+                conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                conn.commit()
+                conn.execute('VACUUM')
+            return {'auto_vacuum': 'incremental',
+                    'duration_ms': round((time.monotonic() - started) * 1000.0, 2)}
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'running': self.running,
+            'interval_s': self.interval_s,
+            'next_run_at': self._next_run_at if self.running else None,
+            'runs': self._runs,
+            'policies': [p.to_dict() for p in self.policies.values()],
+            'last_report': self._last_report
+        }
+
+
+_engine: Optional[RetentionEngine] = None
+
+
+def create_retention_engine(app) -> RetentionEngine:
+    """按应用配置创建全局保留引擎（不启动后台线程）"""
+    global _engine
+    if _engine is None:
+        cfg = app.config
+        _engine = RetentionEngine(
+            cfg['DATABASE_PATH'],
+            build_default_policies(cfg),
+            interval_s=cfg.get('RETENTION_INTERVAL_S', 3600),
+            batch_size=cfg.get('RETENTION_BATCH_SIZE', 2000),
+            pause_ms=cfg.get('RETENTION_PAUSE_MS', 50),
+            vacuum_pages=cfg.get('RETENTION_VACUUM_PAGES', 1000)
+        )
+    return _engine
+
+
+def start_retention_engine(app) -> Optional[RetentionEngine]:
+    engine = create_retention_engine(app)
+    if app.config.get('RETENTION_ENABLED', True):
+        engine.start()
+    return engine
+
+
+def stop_retention_engine() -> None:
+    if _engine is not None:
+        _engine.stop()
+
+
+def get_retention_engine() -> Optional[RetentionEngine]:
+    return _engine
@@ -1,12 +1,14 @@
 (function(){
   const ENDPOINT = '/api/data/measurements';
    const CMD_ENDPOINT = '/api/command/set/data';
+  // 设定值命令异步提交：后端调度线程按地址合并，连续调整时只发送最新值（与 COMMAND_COALESCE_COMMANDS 一致）
+  const SETPOINT_COMMANDS = new Set(['set_speed_rpm','set_load_level']);
   const KEYS_STATIC = ['unidirectional_error','lost_motion','backlash','torsional_stiffness'];
   const KEYS_DYNAMIC = ['start_torque','no_load_accuracy','variable_load_accuracy','peak_load_accuracy','transmission_efficiency','noise_level'];
   const ALL_KEYS = [...KEYS_STATIC, ...KEYS_DYNAMIC];
 
   let autoStaticTimer = null;
-  let autoDynamicTimer = null;
+  let autoDynamicTimer = null; // 动态页自动刷新（长轮询监视器）
   let pointsMap = null; // 从 config 加载
   let commandsMap = null; // 命令映射
 
@@ -155,8 +157,10 @@
       const meta = commandsMap?.[cmd] || {};
       // 后端要求字段名为 `command`
       const payload = { command: cmd, ...(params || {}), addr: meta.address || meta.addr };
+      const queued = SETPOINT_COMMANDS.has(cmd);
+      if(queued) payload.async = true;
       const raw = await fetchPostJson(CMD_ENDPOINT, payload);
-      showToast(`命令已下发：${cmd}`, 'success');
+      showToast(queued ? `命令已受理：${cmd}` : `命令已下发：${cmd}`, 'success');
       return raw;
     }catch(e){
       console.error('命令下发失败', e);
@@ -496,6 +500,71 @@
     }
   }
 
+  // 长轮询 /api/data/wait：服务端有新的测量值写入且数值变化时才返回，只携带变化的测量项
+  // 两次更新之间至少间隔 intervalMs()（采样频率选择）；服务端报告没有后台入库时退回按该周期轮询
+  const WRITER_RECHECK_MS = 10000;
+  function watchMeasurements(keys, intervalMs){
+    const watcher = { stopped: false, controller: null, version: null, values: {}, polling: false, recheckAt: 0 };
+    const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+    watcher.stop = () => {
+      watcher.stopped = true;
+      watcher.controller?.abort();
+    };
+    (async () => {
+      while (!watcher.stopped) {
+        const started = Date.now();
+        try {
+          if (watcher.polling && started < watcher.recheckAt) {
+            await refresh(keys);
+          } else {
+            watcher.controller = typeof AbortController !== 'undefined' ? new AbortController() : null;
+            // 轮询模式下只确认后台入库状态，不挂起等待
+            const qs = new URLSearchParams({ keys: keys.join(','), timeout: watcher.polling ? '0' : '25' });
+            if (watcher.version != null) qs.set('since', String(watcher.version));
+            const r = await fetch('/api/data/wait?' + qs.toString(), { cache: 'no-store', signal: watcher.controller?.signal });
+            if (!r.ok) throw new Error('HTTP ' + r.status);
+            const res = await r.json();
+            if (watcher.stopped) break;
+            watcher.version = res.version;
+            watcher.polling = res.writer_active === false;
+            watcher.recheckAt = Date.now() + WRITER_RECHECK_MS;
+            if (res.reset) watcher.values = {};
+            Object.assign(watcher.values, res.measurements || {});
+            if (watcher.polling) {
+              // 没有后台入库，长轮询不会收到测量值变化：按采样周期主动刷新
+              await refresh(keys);
+            } else if (res.reset || Object.keys(res.measurements || {}).length) {
+              updateCards({ timestamp: res.timestamp, values: watcher.values });
+            }
+          }
+        } catch (e) {
+          if (watcher.stopped) break;
+          console.warn('等待数据变化失败，稍后重试', e);
+          setConnStatus(false, Date.now());
+          await sleep(3000);
+          continue;
+        }
+        const remaining = intervalMs() - (Date.now() - started);
+        if (remaining > 0 && !watcher.stopped) await sleep(remaining);
+      }
+    })();
+    return watcher;
+  }
+
+  function dynamicRefreshMs(){
+    return parseInt(document.getElementById('dynamic-sample-rate')?.value, 10) || 1500;
+  }
+
+  function startAutoDynamic(){
+    stopAutoDynamic();
+    autoDynamicTimer = watchMeasurements(KEYS_DYNAMIC, dynamicRefreshMs);
+  }
+
+  function stopAutoDynamic(){
+    autoDynamicTimer?.stop();
+    autoDynamicTimer = null;
+  }
+
   let toolbarBound = false;
   let controlsBound = false;
   function bindToolbar(){
@@ -525,11 +594,9 @@
     if (dAuto) {
       dAuto.addEventListener('change', (ev) => {
       if(ev.target.checked){
-        autoDynamicTimer && clearInterval(autoDynamicTimer);
-        autoDynamicTimer = setInterval(() => refresh(KEYS_DYNAMIC), 1500);
+        startAutoDynamic();
       } else {
-        autoDynamicTimer && clearInterval(autoDynamicTimer);
-        autoDynamicTimer = null;
+        stopAutoDynamic();
       }
       // 同时清除静态页自动刷新，避免跨页持续刷新
       autoStaticTimer && clearInterval(autoStaticTimer);
@@ -599,8 +666,7 @@
       // 清除所有自动刷新定时器，避免跨页刷新继续运行
       autoStaticTimer && clearInterval(autoStaticTimer);
       autoStaticTimer = null;
-      autoDynamicTimer && clearInterval(autoDynamicTimer);
-      autoDynamicTimer = null;
+      stopAutoDynamic();
       
       const ms = parseInt(rateSelect?.value, 10) || realTimeUpdateMs || 500;
       hysteresisRecorder.setSampleInterval(ms);
@@ -636,8 +702,7 @@
         autoStaticTimer = null;
       }
       // 同时清除动态页自动刷新，避免跨页持续刷新
-      autoDynamicTimer && clearInterval(autoDynamicTimer);
-      autoDynamicTimer = null;
+      stopAutoDynamic();
       const dAutoChk2 = document.getElementById('dynamic-auto');
       if (dAutoChk2){
         dAutoChk2.checked = false;
@@ -754,10 +819,8 @@
         stopRealTimeUpdate();
         startRealTimeUpdate();
       }
-      if (autoDynamicTimer){
-        clearInterval(autoDynamicTimer);
-        autoDynamicTimer = setInterval(() => refresh(KEYS_DYNAMIC), ms);
-      }
+      // 自动刷新按新周期重启
+      if (autoDynamicTimer) startAutoDynamic();
       // 更新 Hz 单位预览（动态）
       try {
         const _hzElD = document.getElementById('dynamic-sample-rate-hz');
@@ -773,8 +836,7 @@
       // 清除所有自动刷新定时器，避免跨页刷新继续运行
       autoStaticTimer && clearInterval(autoStaticTimer);
       autoStaticTimer = null;
-      autoDynamicTimer && clearInterval(autoDynamicTimer);
-      autoDynamicTimer = null;
+      stopAutoDynamic();
       
       const ms = parseInt(dRateSelect?.value, 10) || realTimeUpdateMs || 500;
       hysteresisRecorder.setSampleInterval(ms);
@@ -789,8 +851,7 @@
         dAutoChk.checked = true;
         dAutoChk.dispatchEvent(new Event('change'));
       } else {
-        autoDynamicTimer && clearInterval(autoDynamicTimer);
-        autoDynamicTimer = setInterval(() => refresh(KEYS_DYNAMIC), ms);
+        startAutoDynamic();
       }
       showToast('开始采集实时数据', 'info');
     });
@@ -807,8 +868,7 @@
         dAutoChk.checked = false;
         dAutoChk.dispatchEvent(new Event('change'));
       } else {
-        autoDynamicTimer && clearInterval(autoDynamicTimer);
-        autoDynamicTimer = null;
+        stopAutoDynamic();
       }
       (async () => {
         try {
@@ -892,6 +952,7 @@ class HysteresisRecorder {
     this.isRecording = false;
     this.startTime = null;
     this.recordInterval = null;
+    this.eventSource = null;
     this.sampleIntervalMs = 100;
     this.storageKey = 'hysteresis_realtime_data';
     
@@ -915,10 +976,8 @@ class HysteresisRecorder {
     // 清除旧的缓存数据
     this.clearCache();
     
-    // 按配置的采样周期记录数据点
-    this.recordInterval = setInterval(() => {
-      this.recordDataPoint();
-    }, this.sampleIntervalMs);
+    // 优先订阅服务端推送的采样点；浏览器不支持或推送不可用时按采样周期轮询
+    if (!this.startStream()) this.startPolling();
     
     console.log('开始记录滞回曲线数据');
   }
@@ -929,6 +988,7 @@ class HysteresisRecorder {
     
     this.isRecording = false;
     
+    this.stopStream();
     if (this.recordInterval) {
       clearInterval(this.recordInterval);
       this.recordInterval = null;
@@ -947,12 +1007,63 @@ class HysteresisRecorder {
   setSampleInterval(ms){
     const v = Math.max(50, Number(ms) || 100);
     this.sampleIntervalMs = v;
-    if (this.isRecording){
-      if (this.recordInterval) clearInterval(this.recordInterval);
+    if (this.isRecording && this.recordInterval){
+      clearInterval(this.recordInterval);
       this.recordInterval = setInterval(() => this.recordDataPoint(), this.sampleIntervalMs);
     }
   }
 
+  startPolling() {
+    if (this.recordInterval) clearInterval(this.recordInterval);
+    this.recordInterval = setInterval(() => this.recordDataPoint(), this.sampleIntervalMs);
+  }
+
+  // 订阅 /api/stream/hysteresis：每帧包含多个采样点（列式，时间戳按差值编码）
+  startStream() {
+    if (typeof EventSource === 'undefined') return false;
+    try {
+      const es = new EventSource('/api/stream/hysteresis?batch_ms=' + Math.max(50, this.sampleIntervalMs));
+      es.addEventListener('points', (ev) => {
+        if (!this.isRecording) return;
+        let frame;
+        try { frame = JSON.parse(ev.data); } catch (_) { return; }
+        let ts = frame.t0;
+        for (let i = 0; i < frame.n; i++) {
+          if (i > 0) ts += frame.dt[i - 1];
+          this.data.push({
+            angle: frame.angle[i],
+            torque: frame.torque[i],
+            timestamp: ts,
+            relativeTime: ts - this.startTime
+          });
+        }
+        this.lastAngle = frame.angle[frame.n - 1];
+        this.lastTorque = frame.torque[frame.n - 1];
+        this.saveToCache();
+      });
+      es.onerror = () => {
+        // 连接建立前即失败（如推送连接数已满）时改为轮询；已建立的连接由浏览器自动重连续传
+        if (es.readyState === EventSource.CLOSED && this.isRecording && this.eventSource === es) {
+          this.eventSource = null;
+          console.warn('实时曲线推送不可用，改为轮询');
+          this.startPolling();
+        }
+      };
+      this.eventSource = es;
+      return true;
+    } catch (error) {
+      console.warn('订阅实时曲线推送失败:', error);
+      return false;
+    }
+  }
+
+  stopStream() {
+    if (this.eventSource) {
+      this.eventSource.close();
+      this.eventSource = null;
+    }
+  }
+
   // 记录单个数据点
   async recordDataPoint() {
     try {
@@ -1256,7 +1367,12 @@ async function fetchHysteresisPoints() {
     }
   }
   
-  // 尝试从后端API获取数据
+  // 尝试从后端API获取数据（二进制帧，体积与解析开销远小于 JSON 点列表）
+  try {
+    return await fetchHysteresisFrame();
+  } catch (e) {
+    console.log('二进制曲线获取失败，改用JSON', e);
+  }
   try {
     const resp = await fetchGetJson('/api/data/hysteresis');
     if (resp && Array.isArray(resp.points)) {
@@ -1270,6 +1386,40 @@ async function fetchHysteresisPoints() {
   return [];
 }
 
+// 曲线帧分段类型码（与服务端 curve_codec.FRAME_CURVE_TYPES 一致）
+const CURVE_FRAME_TYPES = { 0: 'hysteresis', 1: 'forward', 2: 'reverse' };
+
+// 不指定 format：按存储精度返回（默认 f64），不在传输时丢失精度
+async function fetchHysteresisFrame() {
+  const r = await fetch('/api/data/hysteresis', { headers: { 'Accept': 'application/octet-stream' } });
+  if (!r.ok) throw new Error('HTTP ' + r.status);
+  return decodeCurveFrame(await r.arrayBuffer());
+}
+
+// 解析曲线帧：24字节头部 + 每段8字节分段表 + 全部角度 + 全部扭矩（小端）
+function decodeCurveFrame(buffer) {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(view.getUint8(0), view.getUint8(1), view.getUint8(2), view.getUint8(3));
+  if (magic !== 'HCRV') throw new Error('无效的曲线帧');
+  const itemSize = view.getUint8(5);
+  const segmentCount = view.getUint16(6, true);
+  const total = view.getUint32(8, true);
+  const offset = 24 + segmentCount * 8;
+  const ArrayType = itemSize === 4 ? Float32Array : Float64Array;
+  const angles = new ArrayType(buffer, offset, total);
+  const torques = new ArrayType(buffer, offset + total * itemSize, total);
+  const points = new Array(total);
+  let i = 0;
+  for (let s = 0; s < segmentCount; s++) {
+    const count = view.getUint32(24 + s * 8, true);
+    const curveType = CURVE_FRAME_TYPES[view.getUint8(24 + s * 8 + 4)] || 'unknown';
+    for (let end = i + count; i < end; i++) {
+      points[i] = { angle: angles[i], torque: torques[i], curve_type: curveType };
+    }
+  }
+  return points;
+}
+
 function makeMockHysteresis(count=240, T=10, backlash=0.6, k=0.8) {
   const pts = [];
   for (let i=0;i<count;i++){
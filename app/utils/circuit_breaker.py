@@ -0,0 +1,152 @@
+"""
+熔断器
+closed：正常放行，连续失败达到阈值后跳闸进入 open；
+open：直接拒绝调用，等待退避时间后进入 half_open；
+half_open：只放行一个探测请求，成功则恢复 closed，失败则退避时间翻倍后重新 open
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from app.utils.helpers import now_ms
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，调用被直接拒绝"""
+
+    def __init__(self, name: str, retry_in_ms: int):
+        super().__init__(f"{name} 熔断中，{retry_in_ms}ms 后重试")
+        self.name = name
+        self.retry_in_ms = retry_in_ms
+
+
+class CircuitBreaker:
+    """带指数退避探测的熔断器（线程安全）"""
+
+    def __init__(self, name: str, failure_threshold: int = 3, base_backoff_s: float = 1.0,
+                 max_backoff_s: float = 60.0, history_size: int = 20):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.base_backoff = max(0.01, float(base_backoff_s))
+        self.max_backoff = max(self.base_backoff, float(max_backoff_s))
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._backoff = self.base_backoff
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._last_failure: Optional[str] = None
+        self._history: deque = deque(maxlen=history_size)
+        self._stats = {'allowed': 0, 'rejected': 0, 'successes': 0, 'failures': 0, 'trips': 0, 'probes': 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """是否放行本次调用；open 状态退避结束后放行唯一的探测请求"""
+        with self._lock:
+            if self._state == STATE_CLOSED:
+                self._stats['allowed'] += 1
+                return True
+            if self._state == STATE_OPEN and time.monotonic() - self._opened_at >= self._backoff:
+                self._state = STATE_HALF_OPEN
+                self._probe_in_flight = False
+                logger.info(f"{self.name} 熔断器进入半开状态，发送探测请求")
+            if self._state == STATE_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self._stats['allowed'] += 1
+                self._stats['probes'] += 1
+                return True
+            self._stats['rejected'] += 1
+            return False
+
+    def retry_in_ms(self) -> int:
+        """距离下一次探测的剩余毫秒数"""
+        with self._lock:
+            if self._state != STATE_OPEN:
+                return 0
+            remaining = self._backoff - (time.monotonic() - self._opened_at)
+            return max(0, int(remaining * 1000))
+
+    def check(self) -> None:
+        """放行检查，被拒绝时抛出 CircuitOpenError"""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_in_ms())
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._stats['successes'] += 1
+            self._failures = 0
+            if self._state != STATE_CLOSED:
+                self._close()
+
+    def record_failure(self, reason: str = '') -> None:
+        with self._lock:
+            self._stats['failures'] += 1
+            self._failures += 1
+            self._last_failure = reason or None
+            if self._state == STATE_HALF_OPEN:
+                # 探测失败：退避时间翻倍后重新打开
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+                self._open(reason, probe_failed=True)
+            elif self._state == STATE_CLOSED and self._failures >= self.failure_threshold:
+                self._backoff = self.base_backoff
+                self._open(reason)
+
+    def _open(self, reason: str, probe_failed: bool = False) -> None:
+        if self._state != STATE_OPEN and not probe_failed:
+            self._stats['trips'] += 1
+            self._history.append({
+                'opened_at': now_ms(),
+                'reason': reason,
+                'failures': self._failures,
+                'closed_at': None,
+                'probes_failed': 0,
+            })
+            logger.warning(f"{self.name} 熔断器跳闸: {reason}（连续失败 {self._failures} 次），"
+                           f"{self._backoff:.1f}s 后探测")
+        elif probe_failed and self._history:
+            self._history[-1]['probes_failed'] += 1
+            logger.info(f"{self.name} 探测失败，{self._backoff:.1f}s 后重试")
+        self._state = STATE_OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def _close(self) -> None:
+        self._state = STATE_CLOSED
+        self._backoff = self.base_backoff
+        self._probe_in_flight = False
+        if self._history and self._history[-1]['closed_at'] is None:
+            self._history[-1]['closed_at'] = now_ms()
+            downtime = self._history[-1]['closed_at'] - self._history[-1]['opened_at']
+            logger.info(f"{self.name} 熔断器恢复闭合（中断 {downtime}ms）")
+
+    def reset(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._close()
+
+    def get_state(self) -> Dict[str, Any]:
+        retry_in = self.retry_in_ms()
+        with self._lock:
+            return {
+                'name': self.name,
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'backoff_s': round(self._backoff, 3),
+                'retry_in_ms': retry_in,
+                'last_failure': self._last_failure,
+                'stats': dict(self._stats),
+                'trips': [dict(trip) for trip in self._history],
+            }
@@ -0,0 +1,97 @@
+"""
+曲线数据二进制编解码
+角度/扭矩序列以小端 float64(f8) 或 float32(f4) 连续存储，
+可直接被 array / numpy.frombuffer / 浏览器 TypedArray 读取
+"""
+import struct
+import sys
+from array import array
+from typing import Iterable, Optional, Tuple
+
+DTYPE_FLOAT64 = 'f8'
+DTYPE_FLOAT32 = 'f4'
+
+_TYPECODES = {DTYPE_FLOAT64: 'd', DTYPE_FLOAT32: 'f'}
+_ITEMSIZES = {DTYPE_FLOAT64: 8, DTYPE_FLOAT32: 4}
+_BIG_ENDIAN = sys.byteorder == 'big'
+
+# 曲线帧（二进制响应）：头部 + 分段表 + 全部角度 + 全部扭矩，均为小端
+#   头部 24 字节: magic(4s) version(u8) itemsize(u8) segment_count(u16) point_count(u32) reserved(u32) ts(i64)
+#   分段表每段 8 字节: point_count(u32) curve_type(u8) 填充(3)
+# 头部与分段表长度均为 8 的倍数，角度数组可直接构造 Float32Array/Float64Array(buffer, offset, n)
+FRAME_MAGIC = b'HCRV'
+FRAME_VERSION = 1
+FRAME_CURVE_TYPES = {'hysteresis': 0, 'forward': 1, 'reverse': 2}
+FRAME_CURVE_TYPE_OTHER = 255
+_FRAME_HEADER = struct.Struct('<4sBBHIIq')
+_FRAME_SEGMENT = struct.Struct('<IB3x')
+
+
+def normalize_dtype(dtype: str) -> str:
+    """校验并返回数据类型代码"""
+    if dtype not in _TYPECODES:
+        raise ValueError(f"不支持的曲线数据类型: {dtype}")
+    return dtype
+
+
+def itemsize(dtype: str) -> int:
+    return _ITEMSIZES[normalize_dtype(dtype)]
+
+
+def pack_floats(values: Iterable[float], dtype: str = DTYPE_FLOAT64) -> bytes:
+    """将浮点序列打包为小端二进制"""
+    arr = array(_TYPECODES[normalize_dtype(dtype)], values)
+    if _BIG_ENDIAN:
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def unpack_floats(blob: bytes, dtype: str = DTYPE_FLOAT64) -> array:
+    """将小端二进制解包为 array"""
+    arr = array(_TYPECODES[normalize_dtype(dtype)])
+    if blob:
+        arr.frombytes(blob)
+        if _BIG_ENDIAN:
+            arr.byteswap()
+    return arr
+
+
+def unpack_floats_numpy(blob: bytes, dtype: str = DTYPE_FLOAT64):
+    """将小端二进制零拷贝解包为只读 numpy 数组（需要 numpy）"""
+    import numpy as np
+    return np.frombuffer(blob or b'', dtype='<' + normalize_dtype(dtype))
+
+
+def convert_blob(blob: bytes, src_dtype: str, dst_dtype: str) -> bytes:
+    """在 f8/f4 之间转换二进制序列，类型相同时原样返回"""
+    if src_dtype == dst_dtype:
+        return blob
+    return pack_floats(unpack_floats(blob, src_dtype), dst_dtype)
+
+
+def pack_curve_frame(curves: Iterable[Tuple[str, int, bytes, bytes, str]], dtype: Optional[str] = None,
+                     timestamp: int = 0) -> Tuple[bytes, str]:
+    """
+    将多条打包曲线拼接为一个二进制帧
+    curves: (curve_type, point_count, angles_blob, torques_blob, blob_dtype) 序列
+    dtype: 输出类型，缺省时沿用第一条曲线的存储类型（类型一致时不做任何浮点转换）
+    返回 (帧字节, 输出类型)
+    """
+    curves = list(curves)
+    dtype = normalize_dtype(dtype or (curves[0][4] if curves else DTYPE_FLOAT64))
+    total = sum(count for _type, count, _a, _t, _d in curves)
+    parts = [_FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, itemsize(dtype), len(curves), total, 0, int(timestamp))]
+    parts.extend(
+        _FRAME_SEGMENT.pack(count, FRAME_CURVE_TYPES.get(curve_type, FRAME_CURVE_TYPE_OTHER))
+        for curve_type, count, _a, _t, _d in curves
+    )
+    parts.extend(convert_blob(angles, src, dtype) for _type, _c, angles, _t, src in curves)
+    parts.extend(convert_blob(torques, src, dtype) for _type, _c, _a, torques, src in curves)
+    return b''.join(parts), dtype
+
+
+def bounds(values) -> Tuple[float, float]:
+    """返回序列的(最小值, 最大值)，空序列返回(None, None)"""
+    if not len(values):
+        return None, None
+    return min(values), max(values)
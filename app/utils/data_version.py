@@ -0,0 +1,217 @@
+"""
+数据版本号与条件请求
+按数据集维护进程内单调递增的版本号，写入提交后递增；读接口据此生成 ETag / Last-Modified，
+只读取单个键的接口（如某测量项的历史）可按键取版本，其他键的写入不会使其 ETag 失效；
+请求携带的 If-None-Match 与当前版本一致时直接返回 304，不查询数据库、不重新序列化。
+版本号只在本进程内有效，ETag 中带有进程启动标识，服务重启后旧 ETag 自动失效。
+另维护一个全局变化序号与变化日志，长轮询接口据此等待并只返回序号之后发生变化的数据集/键
+"""
+import hashlib
+import threading
+import time
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple, Union
+
+from flask import Response, request
+
+from app.utils.helpers import now_ms
+
+# 数据集
+DATASET_MEASUREMENTS = 'measurements'
+DATASET_HYSTERESIS = 'hysteresis'
+DATASET_MOTORS = 'motors'
+DATASET_SETTINGS = 'settings'
+
+# 表所属的数据集（按表删除的路径，如数据保留清理，据此递增版本）
+TABLE_DATASETS = {
+    'series': DATASET_MEASUREMENTS,
+    'samples': DATASET_MEASUREMENTS,
+    'latest_measurements': DATASET_MEASUREMENTS,
+    'measurement_rollups': DATASET_MEASUREMENTS,
+    'curves': DATASET_HYSTERESIS,
+    'test_runs': DATASET_HYSTERESIS,
+    'custom_motors': DATASET_MOTORS,
+}
+
+# 变化日志条数：长轮询客户端的 since 早于日志起点时需重新获取全量
+_CHANGE_LOG_SIZE = 1024
+
+_lock = threading.Lock()
+_changed = threading.Condition(_lock)
+_versions: Dict[str, int] = {}
+_modified_ms: Dict[str, int] = {}
+# 按键的版本：整个数据集失效（如按表删除）的次数 + 各键写入次数
+_generations: Dict[str, int] = {}
+_generation_ms: Dict[str, int] = {}
+_key_versions: Dict[Tuple[str, str], int] = {}
+_key_modified_ms: Dict[Tuple[str, str], int] = {}
+_started_ms = now_ms()
+_epoch = format(time.time_ns() & 0xFFFFFFFFFF, 'x')
+_seq = 0
+# (序号, 数据集, 变化的键；None 表示整个数据集)
+_changes: deque = deque(maxlen=_CHANGE_LOG_SIZE)
+
+Datasets = Union[str, Iterable[str]]
+
+
+def _names(datasets: Datasets) -> Tuple[str, ...]:
+    return (datasets,) if isinstance(datasets, str) else tuple(datasets)
+
+
+def _bump_locked(name: str, ts: int) -> None:
+    _versions[name] = _versions.get(name, 0) + 1
+    _modified_ms[name] = ts
+
+
+def _log_change_locked(name: str, keys: Optional[FrozenSet[str]]) -> None:
+    global _seq
+    _seq += 1
+    _changes.append((_seq, name, keys))
+    _changed.notify_all()
+
+
+def bump(*datasets: str) -> None:
+    """数据集有写入提交后调用：版本号加一、记录修改时间并通知等待变化的请求（所有键的版本同时失效）"""
+    ts = now_ms()
+    with _lock:
+        for name in datasets:
+            _bump_locked(name, ts)
+            _generations[name] = _generations.get(name, 0) + 1
+            _generation_ms[name] = ts
+            _log_change_locked(name, None)
+
+
+def bump_keys(dataset: str, changed_keys: Iterable[str], written_keys: Optional[Iterable[str]] = None) -> None:
+    """
+    按键记录变化：数据集版本与 written_keys（缺省同 changed_keys）各键的版本总是加一（写入后 ETag 必须失效），
+    只有 changed_keys 非空时才记入变化日志并唤醒长轮询（如数值未变化的重复采样不唤醒）
+    """
+    keys = frozenset(changed_keys)
+    written = keys if written_keys is None else frozenset(written_keys)
+    ts = now_ms()
+    with _lock:
+        _bump_locked(dataset, ts)
+        for key in written:
+            _key_versions[(dataset, key)] = _key_versions.get((dataset, key), 0) + 1
+            _key_modified_ms[(dataset, key)] = ts
+        if keys:
+            _log_change_locked(dataset, keys)
+
+
+def bump_table(table: str) -> None:
+    """按表名递增所属数据集的版本（不属于任何数据集的表忽略）"""
+    dataset = TABLE_DATASETS.get(table)
+    if dataset is not None:
+        bump(dataset)
+
+
+def on_config_changed(section: str, keys) -> None:
+    """配置缓存变化回调：settings.json 变化时递增设置数据集版本"""
+    from app.services.config_store import SECTION_SETTINGS
+    if section == SECTION_SETTINGS:
+        bump(DATASET_SETTINGS)
+
+
+def version(dataset: str) -> int:
+    with _lock:
+        return _versions.get(dataset, 0)
+
+
+def get_versions() -> Dict[str, int]:
+    with _lock:
+        return dict(_versions)
+
+
+def change_seq() -> int:
+    """当前全局变化序号"""
+    with _lock:
+        return _seq
+
+
+def _changes_since_locked(since: int, datasets: Tuple[str, ...]) -> Optional[Dict[str, Optional[FrozenSet[str]]]]:
+    # since 大于当前序号（服务已重启）或早于日志起点时无法给出增量
+    if since > _seq or (_changes and since < _changes[0][0] - 1):
+        return None
+    result: Dict[str, Optional[FrozenSet[str]]] = {}
+    for seq, name, keys in reversed(_changes):
+        if seq <= since:
+            break
+        if name not in datasets:
+            continue
+        if keys is None or result.get(name, frozenset()) is None:
+            result[name] = None
+        else:
+            result[name] = result.get(name, frozenset()) | keys
+    return result
+
+
+def wait_for_changes(since: int, datasets: Datasets,
+                     timeout: float) -> Tuple[int, Optional[Dict[str, Optional[FrozenSet[str]]]]]:
+    """
+    等待序号 since 之后指定数据集发生变化，超时返回空字典
+    返回 (当前序号, {数据集: 变化的键或 None 表示整个数据集})；无法给出增量时第二项为 None
+    """
+    names = _names(datasets)
+    deadline = time.monotonic() + max(0.0, timeout)
+    with _changed:
+        while True:
+            changes = _changes_since_locked(since, names)
+            if changes is None or changes:
+                return _seq, changes
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return _seq, changes
+            _changed.wait(remaining)
+
+
+def validators(datasets: Datasets, variant: str = '', key: Optional[str] = None) -> Tuple[str, int]:
+    """
+    当前版本对应的 (ETag, Last-Modified 毫秒时间戳)
+    variant 区分同一数据集的不同表示（路径、查询参数等）；
+    指定 key 时按各数据集中该键的版本计算；
+    应在查询数据之前调用，查询期间发生的写入会使下次请求的 ETag 不同
+    """
+    names = _names(datasets)
+    with _lock:
+        if key is None:
+            versions = [_versions.get(name, 0) for name in names]
+            modified_list = [_modified_ms.get(name, _started_ms) for name in names]
+        else:
+            versions = [f"{_generations.get(name, 0)}.{_key_versions.get((name, key), 0)}" for name in names]
+            modified_list = [max(_generation_ms.get(name, _started_ms), _key_modified_ms.get((name, key), _started_ms))
+                             for name in names]
+        # 本进程内未写入过的数据集，以进程启动时间作为修改时间
+        modified = max(modified_list or [_started_ms])
+    digest = hashlib.md5(variant.encode('utf-8')).hexdigest()[:8]
+    etag = f"{_epoch}-{'.'.join(str(v) for v in versions)}-{digest}"
+    return etag, modified
+
+
+def not_modified(etag: str, last_modified_ms: int) -> Optional[Response]:
+    """请求的 If-None-Match 与当前 ETag 一致时返回 304 响应，否则返回 None"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    return with_validators(Response(status=304), etag, last_modified_ms)
+
+
+def with_validators(response, etag: str, last_modified_ms: int):
+    """为响应设置 ETag / Last-Modified；no-cache 要求浏览器每次携带 ETag 重新验证而不是按启发式缓存"""
+    if isinstance(response, tuple):
+        with_validators(response[0], etag, last_modified_ms)
+        return response
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified_ms / 1000.0
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def conditional(datasets: Datasets, variant: Optional[str] = None,
+                key: Optional[str] = None) -> Tuple[str, int, Optional[Response]]:
+    """
+    读接口的条件请求入口：返回 (ETag, Last-Modified, 304响应或None)
+    variant 缺省为请求路径与查询字符串；key 见 validators
+    """
+    if variant is None:
+        variant = request.full_path
+    etag, modified = validators(datasets, variant, key)
+    return etag, modified, not_modified(etag, modified)
@@ -3,12 +3,270 @@
 """
 import sqlite3
 import logging
-from flask import g, current_app
+import threading
+import time
+import atexit
+from collections import deque
+from flask import g, current_app, has_app_context
 from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from app.utils.query_stats import get_query_stats, first_params
 
 logger = logging.getLogger(__name__)
 
 
+# 连接池默认参数（无应用上下文时使用）
+_POOL_DEFAULTS = {
+    'DB_POOL_SIZE': 8,
+    'DB_POOL_TIMEOUT': 10.0,
+    'DB_CONN_MAX_LIFETIME': 3600,
+    'DB_BUSY_TIMEOUT_MS': 5000,
+    'DB_MMAP_SIZE': 128 * 1024 * 1024,
+    'DB_CACHE_SIZE_KB': 16384,
+}
+
+
+class ConnectionPool:
+    """
+    SQLite连接池
+    连接长期保持打开，每个连接只在创建时配置一次PRAGMA（WAL、synchronous等）；
+    同一线程内嵌套获取连接时复用外层连接，避免连接池耗尽导致自锁
+    """
+
+    def __init__(self, db_path: str, max_size: int = 8, timeout: float = 10.0,
+                 max_lifetime: int = 3600, busy_timeout_ms: int = 5000,
+                 mmap_size: int = 0, cache_size_kb: int = 0):
+        self.db_path = db_path
+        self.is_memory = db_path == ':memory:'
+        # 内存数据库每个连接都是独立的库，只能使用单连接
+        self.max_size = 1 if self.is_memory else max(1, int(max_size))
+        self.timeout = float(timeout)
+        self.max_lifetime = 0 if self.is_memory else int(max_lifetime)
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self.mmap_size = int(mmap_size)
+        self.cache_size_kb = int(cache_size_kb)
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, created_at)
+        self._created_at: Dict[int, float] = {}
+        self._local = threading.local()
+        self._closed = False
+
+        self._stats = {
+            'created': 0,
+            'closed': 0,
+            'recycled': 0,
+            'checkouts': 0,
+            'reentrant_checkouts': 0,
+            'waits': 0,
+            'wait_time_ms': 0.0,
+            'timeouts': 0,
+            'max_in_use': 0,
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        """创建新连接并配置PRAGMA"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000.0,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        try:
+            # 新建的空库启用增量 VACUUM，便于清理数据后逐步归还磁盘空间
+            # （必须在切换WAL和建表之前设置才会生效）
+            if conn.execute('PRAGMA page_count').fetchone()[0] == 0:
+                conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            if not self.is_memory:
+                conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA busy_timeout={self.busy_timeout_ms}')
+            if self.mmap_size > 0:
+                conn.execute(f'PRAGMA mmap_size={self.mmap_size}')
+            if self.cache_size_kb > 0:
+                # 负数表示以KiB为单位
+                conn.execute(f'PRAGMA cache_size=-{self.cache_size_kb}')
+            conn.execute('PRAGMA temp_store=MEMORY')
+        except Exception as e:
+            logger.warning(f"配置数据库连接PRAGMA失败: {e}")
+        return conn
+
+    def _in_use(self) -> int:
+        return len(self._created_at) - len(self._idle)
+
+    def _close_conn(self, conn: sqlite3.Connection) -> None:
+        self._created_at.pop(id(conn), None)
+        self._stats['closed'] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _take_idle(self) -> Optional[sqlite3.Connection]:
+        """从空闲队列取出一个未过期的连接（调用方需持有锁）"""
+        while self._idle:
+            conn, created_at = self._idle.pop()
+            if self.max_lifetime and time.monotonic() - created_at > self.max_lifetime:
+                self._stats['recycled'] += 1
+                self._close_conn(conn)
+                continue
+            return conn
+        return None
+
+    def _acquire(self) -> sqlite3.Connection:
+        deadline = time.monotonic() + self.timeout
+        wait_start = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError('数据库连接池已关闭')
+                conn = self._take_idle()
+                if conn is None and len(self._created_at) < self.max_size:
+                    conn = self._connect()
+                    self._created_at[id(conn)] = time.monotonic()
+                    self._stats['created'] += 1
+                if conn is not None:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise TimeoutError(f'等待数据库连接超时 (> {self.timeout}s)')
+                if wait_start is None:
+                    wait_start = time.monotonic()
+                    self._stats['waits'] += 1
+                self._cond.wait(remaining)
+            if wait_start is not None:
+                self._stats['wait_time_ms'] += (time.monotonic() - wait_start) * 1000.0
+            self._stats['checkouts'] += 1
+            self._stats['max_in_use'] = max(self._stats['max_in_use'], self._in_use())
+            return conn
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        with self._cond:
+            if conn.in_transaction:
+                # 异常路径下未结束的事务不能带回池中
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+            if self._closed or id(conn) not in self._created_at:
+                self._close_conn(conn)
+            else:
+                self._idle.append((conn, self._created_at[id(conn)]))
+            self._cond.notify()
+
+    def current_depth(self) -> int:
+        """当前线程持有连接的嵌套层数（0表示未持有）"""
+        return getattr(self._local, 'depth', 0)
+
+    @contextmanager
+    def connection(self):
+        """
+        获取连接；同一线程内嵌套调用时返回外层连接，
+        由最外层负责归还
+        """
+        depth = self.current_depth()
+        if depth > 0:
+            with self._cond:
+                self._stats['reentrant_checkouts'] += 1
+            self._local.depth = depth + 1
+            try:
+                yield self._local.conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.depth = 0
+            self._local.conn = None
+            self._release(conn)
+
+    def close_all(self) -> None:
+        """关闭所有空闲连接并拒绝后续获取"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._close_conn(conn)
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """连接池统计信息"""
+        with self._cond:
+            now = time.monotonic()
+            ages = [now - created for created in self._created_at.values()]
+            stats = dict(self._stats)
+            stats.update({
+                'db_path': self.db_path,
+                'max_size': self.max_size,
+                'open': len(self._created_at),
+                'idle': len(self._idle),
+                'in_use': self._in_use(),
+                'wait_time_ms': round(stats['wait_time_ms'], 2),
+                'avg_wait_ms': round(stats['wait_time_ms'] / stats['waits'], 2) if stats['waits'] else 0.0,
+                'oldest_connection_age_s': round(max(ages), 1) if ages else 0.0,
+                'max_lifetime_s': self.max_lifetime,
+            })
+            return stats
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: Optional[str] = None) -> ConnectionPool:
+    """
+    获取（必要时创建）指定数据库路径的连接池
+    未指定路径时使用当前应用配置中的 DATABASE_PATH
+    """
+    cfg = current_app.config if has_app_context() else {}
+    if db_path is None:
+        db_path = cfg['DATABASE_PATH']
+    pool = _pools.get(db_path)
+    if pool is not None:
+        return pool
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            opts = {k: cfg.get(k, v) for k, v in _POOL_DEFAULTS.items()}
+            pool = ConnectionPool(
+                db_path,
+                max_size=opts['DB_POOL_SIZE'],
+                timeout=opts['DB_POOL_TIMEOUT'],
+                max_lifetime=opts['DB_CONN_MAX_LIFETIME'],
+                busy_timeout_ms=opts['DB_BUSY_TIMEOUT_MS'],
+                mmap_size=opts['DB_MMAP_SIZE'],
+                cache_size_kb=opts['DB_CACHE_SIZE_KB']
+            )
+            _pools[db_path] = pool
+            logger.info(f"已创建数据库连接池: {db_path} (max_size={pool.max_size})")
+        return pool
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """获取所有连接池的统计信息"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.db_path: pool.get_stats() for pool in pools}
+
+
+def close_pools() -> None:
+    """关闭所有连接池（进程退出时调用）"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
+
+
+atexit.register(close_pools)
+
+
 def get_db():
     """获取数据库连接"""
     if 'db' not in g:
@@ -25,20 +283,24 @@ def close_db(e=None):
 
 
 @contextmanager
-def get_db_connection():
-    """数据库连接上下文管理器"""
-    conn = sqlite3.connect(current_app.config['DATABASE_PATH'])
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"数据库操作错误: {e}")
-        raise
-    else:
-        conn.commit()
-    finally:
-        conn.close()
+def get_db_connection(db_path: Optional[str] = None):
+    """
+    数据库连接上下文管理器（连接来自连接池）
+    仅最外层调用负责提交或回滚；db_path 供无应用上下文的后台线程使用
+    """
+    pool = get_pool(db_path)
+    with pool.connection() as conn:
+        outermost = pool.current_depth() == 1
+        try:
+            yield conn
+        except Exception as e:
+            if outermost:
+                conn.rollback()
+                logger.error(f"数据库操作错误: {e}")
+            raise
+        else:
+            if outermost:
+                conn.commit()
 
 
 def init_db():
@@ -46,22 +308,46 @@ def init_db():
     try:
         with get_db_connection() as conn:
             conn.executescript('''
-                -- 测量数据表
-                CREATE TABLE IF NOT EXISTS measurements (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    ts INTEGER NOT NULL,
-                    key TEXT NOT NULL,
+                -- 测量序列字典表（key/addr/unit 只存一次，样本表引用整数ID）
+                CREATE TABLE IF NOT EXISTS series (
+                    id INTEGER PRIMARY KEY,
+                    key TEXT NOT NULL UNIQUE,
                     addr TEXT,
+                    unit TEXT
+                );
+                
+                -- 测量样本表（紧凑存储，按 (series_id, ts) 聚簇）
+                CREATE TABLE IF NOT EXISTS samples (
+                    series_id INTEGER NOT NULL,
+                    ts INTEGER NOT NULL,
+                    value REAL,
+                    PRIMARY KEY (series_id, ts)
+                ) WITHOUT ROWID;
+                
+                -- 最新值表（每个测量键一行，随写入同步维护）
+                CREATE TABLE IF NOT EXISTS latest_measurements (
+                    key TEXT PRIMARY KEY,
+                    ts INTEGER NOT NULL,
                     value REAL,
                     unit TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    addr TEXT
                 );
                 
-                -- 创建索引
-                CREATE INDEX IF NOT EXISTS idx_measurements_key_ts ON measurements(key, ts);
-                CREATE INDEX IF NOT EXISTS idx_measurements_created_at ON measurements(created_at);
+                -- 测量数据时间桶汇总表（1min/1h，随写入增量维护）
+                CREATE TABLE IF NOT EXISTS measurement_rollups (
+                    key TEXT NOT NULL,
+                    resolution_ms INTEGER NOT NULL,
+                    bucket_ts INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    value_sum REAL,
+                    value_min REAL,
+                    value_max REAL,
+                    value_last REAL,
+                    last_ts INTEGER NOT NULL,
+                    PRIMARY KEY (key, resolution_ms, bucket_ts)
+                ) WITHOUT ROWID;
                 
-                -- 滞回曲线数据表
+                -- 滞回曲线逐点数据表（旧格式，启动时迁移到 curves）
                 CREATE TABLE IF NOT EXISTS hysteresis_points (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     ts INTEGER NOT NULL,
@@ -75,6 +361,35 @@ def init_db():
                 CREATE INDEX IF NOT EXISTS idx_hysteresis_ts ON hysteresis_points(ts);
                 CREATE INDEX IF NOT EXISTS idx_hysteresis_created_at ON hysteresis_points(created_at);
                 
+                -- 测试运行表（同一时间戳下的多条曲线归属同一次测试）
+                CREATE TABLE IF NOT EXISTS test_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ts INTEGER NOT NULL UNIQUE,
+                    name TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                );
+                
+                -- 曲线表（每条曲线一行，角度/扭矩以小端浮点数组打包存储）
+                CREATE TABLE IF NOT EXISTS curves (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_id INTEGER NOT NULL REFERENCES test_runs(id),
+                    ts INTEGER NOT NULL,
+                    curve_type TEXT NOT NULL DEFAULT 'hysteresis',
+                    dtype TEXT NOT NULL DEFAULT 'f8',
+                    point_count INTEGER NOT NULL,
+                    angle_min REAL,
+                    angle_max REAL,
+                    torque_min REAL,
+                    torque_max REAL,
+                    angles BLOB NOT NULL,
+                    torques BLOB NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                );
+                
+                CREATE INDEX IF NOT EXISTS idx_curves_ts ON curves(ts);
+                CREATE INDEX IF NOT EXISTS idx_curves_curve_type_ts ON curves(curve_type, ts);
+                CREATE INDEX IF NOT EXISTS idx_curves_run_id ON curves(run_id);
+                
                 -- 命令日志表
                 CREATE TABLE IF NOT EXISTS command_logs (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -128,6 +443,22 @@ def init_db():
                     ('data_write_url', '', '数据写入地址');
             ''')
             
+            # 迁移：旧版 measurements 表先回填最新值表与汇总表，再一次性转换为 series/samples
+            # 整体在一个保存点中执行：任一步失败即全部回滚并中止启动，旧表保留，修复后重启会重新迁移
+            if _table_exists(conn, 'measurements'):
+                with _migration(conn, 'migrate_measurements'):
+                    has_latest = conn.execute('SELECT 1 FROM latest_measurements LIMIT 1').fetchone()
+                    if not has_latest:
+                        # SQLite 中与 MAX() 同时选取的列取自最大值所在行
+                        cur = conn.execute('''
+                            INSERT INTO latest_measurements (key, ts, value, unit, addr)
+                            SELECT key, MAX(ts), value, unit, addr FROM measurements GROUP BY key
+                        ''')
+                        if cur.rowcount > 0:
+                            logger.info(f"已回填 latest_measurements: {cur.rowcount} 个测量键")
+                    _backfill_measurement_rollups(conn)
+                    _migrate_measurements_to_samples(conn)
+            
             # 迁移：如果旧库缺少 curve_type 字段，则补充该列
             try:
                 cur = conn.execute("PRAGMA table_info(hysteresis_points)")
@@ -142,47 +473,237 @@ def init_db():
             except Exception as mig_err:
                 # 不影响整体初始化流程，但记录日志，便于排查
                 logger.warning(f"检查/迁移 hysteresis_points.curve_type 失败: {mig_err}")
+            
+            # 迁移：逐点存储的旧滞回数据一次性转换为打包曲线（失败时回滚并中止启动）
+            with _migration(conn, 'migrate_hysteresis_points'):
+                _migrate_hysteresis_points_to_curves(conn)
         logger.info("数据库初始化完成")
     except Exception as e:
         logger.error(f"数据库初始化失败: {e}")
         raise
 
 
+def _table_exists(conn, name):
+    """判断表是否存在"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", [name]
+    ).fetchone()
+    return row is not None
+
+
+@contextmanager
+def _migration(conn, name):
+    """在保存点中执行一次迁移：失败时回滚该迁移的全部改动并抛出异常"""
+    conn.execute(f'SAVEPOINT {name}')
+    try:
+        yield
+    except Exception as e:
+        conn.execute(f'ROLLBACK TO {name}')
+        conn.execute(f'RELEASE {name}')
+        logger.error(f"数据库迁移 {name} 失败，已回滚: {e}")
+        raise
+    else:
+        conn.execute(f'RELEASE {name}')
+
+
+def _migrate_measurements_to_samples(conn):
+    """
+    将旧版 measurements 表（每行重复 key/addr/unit 与 created_at）转换为 series + samples
+    同一 (key, ts) 的重复行保留最后写入的一条；迁移完成后删除旧表
+    """
+    # 每个键取最后写入行的 addr/unit（一次分组扫描，避免逐行相关子查询）
+    conn.execute('''
+        INSERT INTO series (key, addr, unit)
+        SELECT key, addr, unit FROM measurements
+        WHERE id IN (SELECT MAX(id) FROM measurements GROUP BY key)
+        ON CONFLICT(key) DO NOTHING
+    ''')
+    cur = conn.execute('''
+        INSERT OR REPLACE INTO samples (series_id, ts, value)
+        SELECT s.id, m.ts, m.value
+        FROM measurements m JOIN series s ON s.key = m.key
+        ORDER BY m.id
+    ''')
+    conn.execute('DROP TABLE measurements')
+    logger.info(f"已将 measurements 迁移为紧凑格式: {max(cur.rowcount, 0)} 条样本")
+
+
+def _backfill_measurement_rollups(conn):
+    """汇总表为空而历史数据存在时，按各分辨率一次性生成时间桶"""
+    from app.models.measurement import MeasurementModel
+
+    if conn.execute('SELECT 1 FROM measurement_rollups LIMIT 1').fetchone():
+        return
+    if not conn.execute('SELECT 1 FROM measurements LIMIT 1').fetchone():
+        return
+    for resolution in MeasurementModel.ROLLUP_RESOLUTIONS_MS:
+        conn.execute('''
+            INSERT INTO measurement_rollups
+                (key, resolution_ms, bucket_ts, count, value_sum, value_min, value_max, value_last, last_ts)
+            SELECT g.key, ?, g.bucket_ts, g.cnt, g.total, g.vmin, g.vmax,
+                   (SELECT m.value FROM measurements m
+                    WHERE m.key = g.key AND m.ts = g.last_ts ORDER BY m.id DESC LIMIT 1),
+                   g.last_ts
+            FROM (
+                SELECT key, (ts / ?) * ? AS bucket_ts, COUNT(*) AS cnt, SUM(value) AS total,
+                       MIN(value) AS vmin, MAX(value) AS vmax, MAX(ts) AS last_ts
+                FROM measurements
+                GROUP BY key, bucket_ts
+            ) g
+        ''', [resolution, resolution, resolution])
+    logger.info("已回填 measurement_rollups")
+
+
+def _migrate_hysteresis_points_to_curves(conn):
+    """
+    将 hysteresis_points 中的逐点数据按 (ts, curve_type) 合并为 curves 行
+    旧表非空即执行（已存在于 curves 的分组跳过）；迁移后清空旧表，避免重复迁移
+    """
+    from app.utils.curve_codec import DTYPE_FLOAT64, pack_floats, bounds
+
+    if not conn.execute('SELECT 1 FROM hysteresis_points LIMIT 1').fetchone():
+        return
+
+    groups = conn.execute('''
+        SELECT ts, COALESCE(curve_type, 'hysteresis') AS curve_type, MIN(id) AS first_id
+        FROM hysteresis_points hp
+        WHERE NOT EXISTS (
+            SELECT 1 FROM curves c
+            WHERE c.ts = hp.ts AND c.curve_type = COALESCE(hp.curve_type, 'hysteresis')
+        )
+        GROUP BY ts, COALESCE(curve_type, 'hysteresis')
+        ORDER BY ts, first_id
+    ''').fetchall()
+    for group in groups:
+        rows = conn.execute(
+            '''SELECT angle, torque FROM hysteresis_points
+               WHERE ts = ? AND COALESCE(curve_type, 'hysteresis') = ?
+               ORDER BY id''',
+            [group['ts'], group['curve_type']]
+        ).fetchall()
+        angles = [row['angle'] for row in rows]
+        torques = [row['torque'] for row in rows]
+        angle_min, angle_max = bounds(angles)
+        torque_min, torque_max = bounds(torques)
+        conn.execute('INSERT OR IGNORE INTO test_runs (ts) VALUES (?)', [group['ts']])
+        conn.execute(
+            '''INSERT INTO curves (run_id, ts, curve_type, dtype, point_count,
+                                    angle_min, angle_max, torque_min, torque_max, angles, torques)
+               VALUES ((SELECT id FROM test_runs WHERE ts = ?), ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            [group['ts'], group['ts'], group['curve_type'], DTYPE_FLOAT64, len(rows),
+             angle_min, angle_max, torque_min, torque_max,
+             pack_floats(angles, DTYPE_FLOAT64), pack_floats(torques, DTYPE_FLOAT64)]
+        )
+    conn.execute('DELETE FROM hysteresis_points')
+    logger.info(f"已将 hysteresis_points 迁移为 {len(groups)} 条打包曲线")
+
+
+def _explain(query, params, db_path=None):
+    """获取语句的 EXPLAIN QUERY PLAN（用于慢查询记录）"""
+    with get_db_connection(db_path) as conn:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params or []).fetchall()
+    return [row[3] for row in rows]
+
+
+def _record(query, started, params=None, error=False, db_path=None):
+    """记录语句耗时，超过慢查询阈值时附带执行计划"""
+    stats = get_query_stats()
+    if stats.enabled:
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        stats.record(query, elapsed_ms, params, error,
+                     explain=lambda q, p: _explain(q, p, db_path))
+
+
 def execute_query(query, params=None, fetch_one=False, fetch_all=False):
     """执行数据库查询"""
+    started = time.perf_counter()
     try:
         with get_db_connection() as conn:
             cursor = conn.execute(query, params or [])
             
             if fetch_one:
-                return cursor.fetchone()
+                result = cursor.fetchone()
             elif fetch_all:
-                return cursor.fetchall()
+                result = cursor.fetchall()
             else:
-                return cursor.rowcount
+                result = cursor.rowcount
+        _record(query, started, params)
+        return result
     except Exception as e:
+        _record(query, started, params, error=True)
         logger.error(f"查询执行失败: {query}, 参数: {params}, 错误: {e}")
         raise
 
 
 def execute_many(query, params_list):
     """批量执行数据库操作"""
+    started = time.perf_counter()
     try:
         with get_db_connection() as conn:
             cursor = conn.executemany(query, params_list)
-            return cursor.rowcount
+            result = cursor.rowcount
+        _record(query, started, first_params(params_list))
+        return result
     except Exception as e:
+        _record(query, started, first_params(params_list), error=True)
         logger.error(f"批量操作失败: {query}, 错误: {e}")
         raise
 
 
+def reserve_ids(table, count, db_path=None):
+    """
+    为 AUTOINCREMENT 表预留一段连续主键（count 个），返回段内第一个ID
+    在同一写事务中推进 sqlite_sequence：多进程各自预留的区间互不重叠，之后的自增插入也不会落入已预留区间
+    """
+    with get_db_connection(db_path) as conn:
+        cursor = conn.execute('UPDATE sqlite_sequence SET seq = seq + ? WHERE name = ?', (count, table))
+        if cursor.rowcount == 0:
+            row = conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}').fetchone()
+            conn.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (table, row[0] + count))
+        last = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,)).fetchone()[0]
+    return last - count + 1
+
+
 def execute_insert_return_id(query, params=None):
     """执行插入并返回生成的ID"""
+    started = time.perf_counter()
     try:
         with get_db_connection() as conn:
             cursor = conn.execute(query, params or [])
             # lastrowid 在成功插入时返回自增主键值
-            return int(cursor.lastrowid or 0)
+            result = int(cursor.lastrowid or 0)
+        _record(query, started, params)
+        return result
     except Exception as e:
+        _record(query, started, params, error=True)
         logger.error(f"插入执行失败: {query}, 参数: {params}, 错误: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+def execute_transaction(statements, db_path=None):
+    """
+    在单个事务中依次执行多组批量语句
+    statements: [(query, params_list), ...]，返回受影响的总行数
+    每条语句单独计时，提交耗时记为 COMMIT
+    """
+    current = None
+    started = time.perf_counter()
+    try:
+        total = 0
+        with get_db_connection(db_path) as conn:
+            for query, params_list in statements:
+                current = (query, params_list)
+                started = time.perf_counter()
+                cursor = conn.executemany(query, params_list)
+                total += max(cursor.rowcount, 0)
+                _record(query, started, first_params(params_list), db_path=db_path)
+            current = ('COMMIT', None)
+            started = time.perf_counter()
+        _record('COMMIT', started, db_path=db_path)
+        return total
+    except Exception as e:
+        if current is not None:
+            _record(current[0], started, first_params(current[1]) if current[1] else None,
+                    error=True, db_path=db_path)
+        logger.error(f"事务执行失败: 语句数 {len(statements)}, 错误: {e}")
+        raise
@@ -49,6 +49,36 @@ def normalize_measurement_data(data: Dict[str, Any]) -> Dict[str, Any]:
     return normalized
 
 
+# 滞回曲线点的候选键名（按优先级）
+_ANGLE_KEYS = ('angle', 'position_deg', 'position', 'theta', 'angle_deg', 'angular_position')
+_TORQUE_KEYS = ('torque', 'torque_nm', 'load_torque', 'current_torque', 'torque_Nm')
+
+
+def _pick_float(obj: Dict[str, Any], keys) -> Optional[float]:
+    for k in keys:
+        if k in obj:
+            try:
+                return float(obj[k])
+            except (TypeError, ValueError):
+                continue
+    return None
+
+
+def normalize_hysteresis_points(raw_points: Any) -> List[Dict[str, float]]:
+    """标准化滞回曲线点格式：兼容不同键名，转换为 {angle, torque}，缺少任一值的点丢弃"""
+    normalized = []
+    if not isinstance(raw_points, list):
+        return normalized
+    for p in raw_points:
+        if not isinstance(p, dict):
+            continue
+        angle_val = _pick_float(p, _ANGLE_KEYS)
+        torque_val = _pick_float(p, _TORQUE_KEYS)
+        if angle_val is not None and torque_val is not None:
+            normalized.append({'angle': angle_val, 'torque': torque_val})
+    return normalized
+
+
 def safe_json_loads(json_str: str, default: Any = None) -> Any:
     """安全的JSON解析"""
     try:
@@ -107,6 +137,21 @@ def log_api_call(endpoint: str, method: str, params: Dict[str, Any] = None,
     logger.info(f"API调用: {safe_json_dumps(log_data)}")
 
 
+def encode_cursor(*parts: int) -> str:
+    """将键集分页位置编码为游标字符串（如 "ts:id"）"""
+    return ':'.join(str(int(p)) for p in parts)
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[tuple]:
+    """解析游标字符串，空值返回 None，格式错误抛出 ValueError"""
+    if not cursor:
+        return None
+    parts = str(cursor).split(':')
+    if len(parts) != size:
+        raise ValueError(f"无效的游标: {cursor}")
+    return tuple(int(p) for p in parts)
+
+
 def chunk_list(lst: List[Any], chunk_size: int) -> List[List[Any]]:
     """将列表分块"""
     return [lst[i:i + chunk_size] for i in range(0, len(lst), chunk_size)]
@@ -0,0 +1,204 @@
+"""
+进程级共享HTTP会话
+所有对 Node-RED 的请求复用同一个 requests.Session 和连接池（HTTP keep-alive + TCP keepalive），
+避免每次轮询/命令都重新建立TCP连接；按主机统计请求数与连接复用情况
+"""
+import logging
+import socket
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+logger = logging.getLogger(__name__)
+
+# 连接池默认参数（未按应用配置初始化时使用）
+_HTTP_DEFAULTS = {
+    'HTTP_POOL_CONNECTIONS': 4,
+    'HTTP_POOL_MAXSIZE': 16,
+    'HTTP_POOL_BLOCK': False,
+    'HTTP_TCP_KEEPALIVE': True,
+    'NODE_RED_CONNECT_TIMEOUT': 2.0,
+    'NODE_RED_TIMEOUT': 5,
+}
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    """在默认套接字选项（TCP_NODELAY）基础上开启 TCP keepalive 的适配器"""
+
+    def __init__(self, tcp_keepalive: bool = True, **kwargs):
+        self._socket_options = list(HTTPConnection.default_socket_options)
+        if tcp_keepalive:
+            self._socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self._socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
+class HttpClient:
+    """共享会话封装：统一超时、连接池与按主机的调用统计"""
+
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 16, pool_block: bool = False,
+                 tcp_keepalive: bool = True, connect_timeout: float = 2.0, read_timeout: float = 5.0):
+        self.connect_timeout = float(connect_timeout)
+        self.read_timeout = float(read_timeout)
+        self.session = requests.Session()
+        # 重试由调用方决定（如 GET 失败后 POST 回退），适配器本身不重试
+        self._adapter = _KeepAliveAdapter(
+            tcp_keepalive=tcp_keepalive,
+            pool_connections=max(1, int(pool_connections)),
+            pool_maxsize=max(1, int(pool_maxsize)),
+            pool_block=pool_block,
+            max_retries=0
+        )
+        self.session.mount('http://', self._adapter)
+        self.session.mount('https://', self._adapter)
+        self.session.headers.update({'Connection': 'keep-alive'})
+        self._pool_maxsize = max(1, int(pool_maxsize))
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """默认 (连接超时, 读取超时)"""
+        return self.connect_timeout, self.read_timeout
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """发送请求；未指定 timeout 时使用 (connect, read) 默认值"""
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlsplit(url).netloc
+        started = time.perf_counter()
+        error = None
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self._record(host, (time.perf_counter() - started) * 1000.0, error)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def _record(self, host: str, elapsed_ms: float, error: Optional[str]) -> None:
+        with self._lock:
+            stats = self._hosts.get(host)
+            if stats is None:
+                stats = self._hosts[host] = {
+                    'requests': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'last_error': None, 'error_types': {}
+                }
+            stats['requests'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            if error:
+                stats['errors'] += 1
+                stats['last_error'] = error
+                stats['error_types'][error] = stats['error_types'].get(error, 0) + 1
+
+    def _pool_counters(self) -> Dict[str, Dict[str, int]]:
+        """读取 urllib3 连接池计数：新建连接数、经由该池的请求数、当前空闲连接数"""
+        counters: Dict[str, Dict[str, int]] = {}
+        try:
+            pools = self._adapter.poolmanager.pools
+            with pools.lock:
+                items = list(pools._container.values())
+        except Exception:
+            return counters
+        for pool in items:
+            port = pool.port
+            default_port = 443 if pool.scheme == 'https' else 80
+            host = pool.host if not port or port == default_port else f"{pool.host}:{port}"
+            num_requests = int(getattr(pool, 'num_requests', 0))
+            num_connections = int(getattr(pool, 'num_connections', 0))
+            try:
+                idle = sum(1 for conn in list(pool.pool.queue) if conn is not None)
+            except Exception:
+                idle = 0
+            counters[host] = {
+                'connections_opened': num_connections,
+                'pooled_requests': num_requests,
+                'reused_requests': max(0, num_requests - num_connections),
+                'idle_connections': idle,
+            }
+        return counters
+
+    def get_stats(self) -> Dict[str, Any]:
+        pools = self._pool_counters()
+        with self._lock:
+            hosts = {host: dict(stats, error_types=dict(stats['error_types']))
+                     for host, stats in self._hosts.items()}
+        for host, stats in hosts.items():
+            stats['avg_ms'] = round(stats['total_ms'] / stats['requests'], 2) if stats['requests'] else 0.0
+            stats['total_ms'] = round(stats['total_ms'], 2)
+            stats['max_ms'] = round(stats['max_ms'], 2)
+            pool = pools.get(host)
+            if pool:
+                stats.update(pool)
+                stats['reuse_ratio'] = round(pool['reused_requests'] / pool['pooled_requests'], 3) \
+                    if pool['pooled_requests'] else 0.0
+        return {
+            'connect_timeout': self.connect_timeout,
+            'read_timeout': self.read_timeout,
+            'pool_maxsize': self._pool_maxsize,
+            'hosts': hosts,
+        }
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def configure_http_client(config: Dict[str, Any]) -> HttpClient:
+    """按应用配置创建（或重建）共享会话"""
+    global _client
+
+    def _get(key):
+        return config.get(key, _HTTP_DEFAULTS[key])
+
+    client = HttpClient(
+        pool_connections=_get('HTTP_POOL_CONNECTIONS'),
+        pool_maxsize=_get('HTTP_POOL_MAXSIZE'),
+        pool_block=_get('HTTP_POOL_BLOCK'),
+        tcp_keepalive=_get('HTTP_TCP_KEEPALIVE'),
+        connect_timeout=_get('NODE_RED_CONNECT_TIMEOUT'),
+        read_timeout=_get('NODE_RED_TIMEOUT')
+    )
+    with _client_lock:
+        old, _client = _client, client
+    if old is not None:
+        old.close()
+    return client
+
+
+def get_http_client() -> HttpClient:
+    """获取共享会话，未初始化时按默认参数创建"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient(
+                    connect_timeout=_HTTP_DEFAULTS['NODE_RED_CONNECT_TIMEOUT'],
+                    read_timeout=_HTTP_DEFAULTS['NODE_RED_TIMEOUT']
+                )
+    return _client
+
+
+def close_http_client() -> None:
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
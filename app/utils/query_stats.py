@@ -0,0 +1,268 @@
+"""
+SQL执行统计
+按归一化SQL（字面量替换为 ?、空白折叠）聚合耗时直方图，
+超过慢查询阈值的语句记录日志并附带 EXPLAIN QUERY PLAN
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# 直方图桶上界（毫秒），最后一个桶收集所有更慢的语句
+HISTOGRAM_BOUNDS_MS = (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST_RE = re.compile(r"(VALUES\s*\([^()]*\))(?:\s*,\s*\([^()]*\))+", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+_INTERNAL_FILES = (os.path.join('app', 'utils', 'database.py'),
+                   os.path.join('app', 'utils', 'query_stats.py'))
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql: str) -> str:
+    """归一化SQL：折叠空白、字面量替换为 ?、IN (?, ?, ...) 列表合并为 IN (...)"""
+    text = _STRING_RE.sub('?', sql)
+    text = _NUMBER_RE.sub('?', text)
+    text = _SPACE_RE.sub(' ', text).strip()
+    text = _IN_LIST_RE.sub('IN (...)', text)
+    text = _VALUES_LIST_RE.sub(r'\1, ...', text)
+    return text
+
+
+def _find_caller() -> str:
+    """定位数据库工具模块之外的第一个调用方（文件:函数）"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.endswith(_INTERNAL_FILES) and 'contextlib' not in filename:
+            path = filename.replace(os.sep, '/')
+            idx = path.rfind('/app/')
+            short = path[idx + 1:] if idx >= 0 else os.path.basename(path)
+            return f"{short}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return ''
+
+
+class _StatementStats:
+    __slots__ = ('sql', 'caller', 'count', 'errors', 'total_ms', 'max_ms', 'buckets',
+                 'slow_count', 'last_plan_at')
+
+    def __init__(self, sql: str, caller: str):
+        self.sql = sql
+        self.caller = caller
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.slow_count = 0
+        self.last_plan_at = 0.0
+
+    def percentile(self, q: float) -> Optional[float]:
+        """按直方图估算分位数（返回所在桶的上界，最后一个桶返回最大值）"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return HISTOGRAM_BOUNDS_MS[i] if i < len(HISTOGRAM_BOUNDS_MS) else round(self.max_ms, 3)
+        return round(self.max_ms, 3)
+
+    def to_dict(self, with_histogram: bool = True) -> Dict[str, Any]:
+        data = {
+            'sql': self.sql,
+            'caller': self.caller,
+            'count': self.count,
+            'errors': self.errors,
+            'slow_count': self.slow_count,
+            'total_ms': round(self.total_ms, 3),
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+        }
+        if with_histogram:
+            labels = [f"<={b}" for b in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}"]
+            data['histogram_ms'] = {label: n for label, n in zip(labels, self.buckets) if n}
+        return data
+
+
+class QueryStats:
+    """SQL耗时统计与慢查询记录"""
+
+    def __init__(self, enabled: bool = True, slow_ms: float = 200.0,
+                 plan_interval_s: float = 60.0, max_statements: int = 500, slow_log_size: int = 50):
+        self.enabled = enabled
+        self.slow_ms = float(slow_ms)
+        self.plan_interval_s = float(plan_interval_s)
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _StatementStats] = {}
+        self._slow_log: deque = deque(maxlen=slow_log_size)
+        self._dropped = 0
+        self._since = time.time()
+
+    def configure(self, enabled: Optional[bool] = None, slow_ms: Optional[float] = None,
+                  plan_interval_s: Optional[float] = None) -> None:
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if slow_ms is not None:
+            self.slow_ms = float(slow_ms)
+        if plan_interval_s is not None:
+            self.plan_interval_s = float(plan_interval_s)
+
+    def record(self, sql: str, elapsed_ms: float, params: Any = None, error: bool = False,
+               explain: Optional[Callable[[str, Any], List[str]]] = None) -> None:
+        """
+        记录一次语句执行
+        explain: 慢查询时用于获取执行计划的回调 (sql, params) -> [plan行]
+        """
+        if not self.enabled:
+            return
+        key = normalize_sql(sql)
+        bucket = len(HISTOGRAM_BOUNDS_MS)
+        for i, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if elapsed_ms <= bound:
+                bucket = i
+                break
+
+        capture_plan = False
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= self.max_statements:
+                    self._dropped += 1
+                    return
+                entry = self._stats[key] = _StatementStats(key, _find_caller())
+            entry.count += 1
+            entry.total_ms += elapsed_ms
+            entry.buckets[bucket] += 1
+            if elapsed_ms > entry.max_ms:
+                entry.max_ms = elapsed_ms
+            if error:
+                entry.errors += 1
+            slow = self.slow_ms > 0 and elapsed_ms >= self.slow_ms
+            if slow:
+                entry.slow_count += 1
+                now = time.monotonic()
+                # 同一语句的执行计划按间隔采集，避免慢查询高发时反复 EXPLAIN
+                if explain is not None and not error and now - entry.last_plan_at >= self.plan_interval_s:
+                    entry.last_plan_at = now
+                    capture_plan = True
+            caller = entry.caller
+
+        if not slow:
+            return
+
+        plan: Optional[List[str]] = None
+        if capture_plan:
+            try:
+                plan = explain(sql, params)
+            except Exception as e:
+                plan = [f"EXPLAIN 失败: {e}"]
+
+        record = {
+            'timestamp': int(time.time() * 1000),
+            'sql': key,
+            'caller': caller,
+            'elapsed_ms': round(elapsed_ms, 3),
+            'params': _summarize_params(params),
+            'plan': plan,
+        }
+        with self._lock:
+            self._slow_log.append(record)
+        if plan:
+            logger.warning(f"慢查询 {elapsed_ms:.1f}ms ({caller}): {key}, 参数: {record['params']}, "
+                           f"执行计划: {' | '.join(plan)}")
+        else:
+            logger.warning(f"慢查询 {elapsed_ms:.1f}ms ({caller}): {key}, 参数: {record['params']}")
+
+    def top(self, n: int = 20, order_by: str = 'total_ms') -> List[Dict[str, Any]]:
+        """按指定字段返回前N条语句统计"""
+        with self._lock:
+            items = [entry.to_dict() for entry in self._stats.values()]
+        if order_by not in ('total_ms', 'avg_ms', 'max_ms', 'count', 'slow_count', 'errors'):
+            order_by = 'total_ms'
+        items.sort(key=lambda item: item[order_by], reverse=True)
+        return items[:max(0, n)]
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(reversed(self._slow_log))
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            total_ms = sum(e.total_ms for e in self._stats.values())
+            count = sum(e.count for e in self._stats.values())
+            return {
+                'enabled': self.enabled,
+                'slow_ms': self.slow_ms,
+                'statements': len(self._stats),
+                'dropped_statements': self._dropped,
+                'executions': count,
+                'total_ms': round(total_ms, 3),
+                'since': int(self._since * 1000),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._slow_log.clear()
+            self._dropped = 0
+            self._since = time.time()
+
+
+def _summarize_params(params: Any, limit: int = 10) -> Any:
+    """截断过长的参数，避免日志与慢查询记录膨胀"""
+    if params is None:
+        return None
+    if isinstance(params, (bytes, bytearray, memoryview)):
+        return f"<{len(params)} bytes>"
+    if isinstance(params, dict):
+        return {k: _summarize_params(v, limit) for k, v in list(params.items())[:limit]}
+    if isinstance(params, (list, tuple)):
+        items = [_summarize_params(p, limit) for p in list(params)[:limit]]
+        if len(params) > limit:
+            items.append(f"...(+{len(params) - limit})")
+        return items
+    if isinstance(params, str) and len(params) > 200:
+        return params[:200] + '...'
+    return params
+
+
+_query_stats = QueryStats()
+
+
+def get_query_stats() -> QueryStats:
+    return _query_stats
+
+
+def configure_query_stats(config: Dict[str, Any]) -> QueryStats:
+    """按应用配置设置统计开关与慢查询阈值"""
+    _query_stats.configure(
+        enabled=config.get('DB_QUERY_STATS_ENABLED', True),
+        slow_ms=config.get('DB_SLOW_QUERY_MS', 200),
+        plan_interval_s=config.get('DB_SLOW_QUERY_PLAN_INTERVAL_S', 60)
+    )
+    return _query_stats
+
+
+def first_params(params_list: Sequence[Any]) -> Any:
+    """取批量参数中的第一组（用于 EXPLAIN）"""
+    try:
+        return params_list[0] if params_list else None
+    except (TypeError, IndexError, KeyError):
+        return None
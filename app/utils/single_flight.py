@@ -0,0 +1,89 @@
+"""
+单飞（single-flight）调用合并
+同一键的并发调用只执行一次，其余调用方等待并共享结果；
+可选复用窗口：调用完成后的短时间内直接返回上次成功结果
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按键合并并发调用"""
+
+    def __init__(self, reuse_window_ms: int = 0):
+        self.reuse_window = max(0, int(reuse_window_ms)) / 1000.0
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._recent: Dict[Hashable, tuple] = {}
+        self._stats = {'calls': 0, 'executions': 0, 'shared': 0, 'reused': 0, 'errors': 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], reuse_ok: Callable[[Any], bool] = bool,
+           allow_reuse: bool = True) -> Any:
+        """
+        执行 fn 或加入同键的进行中调用
+        reuse_ok: 判断结果是否可在复用窗口内复用（默认仅复用真值结果）
+        allow_reuse: 为 False 时跳过复用窗口（仍会加入进行中的调用）
+        """
+        with self._lock:
+            self._stats['calls'] += 1
+            if self.reuse_window and allow_reuse:
+                recent = self._recent.get(key)
+                if recent is not None and time.monotonic() - recent[0] <= self.reuse_window:
+                    self._stats['reused'] += 1
+                    return recent[1]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['executions'] += 1
+            else:
+                call.waiters += 1
+                self._stats['shared'] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+                if call.error is None and self.reuse_window and reuse_ok(call.result):
+                    self._recent[key] = (time.monotonic(), call.result)
+            call.done.set()
+        return call.result
+
+    def forget(self, key: Optional[Hashable] = None) -> None:
+        """丢弃复用窗口内缓存的结果（key 为 None 时全部丢弃）"""
+        with self._lock:
+            if key is None:
+                self._recent.clear()
+            else:
+                self._recent.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        stats['reuse_window_ms'] = int(self.reuse_window * 1000)
+        stats['upstream_saved'] = stats['shared'] + stats['reused']
+        return stats
@@ -0,0 +1,31 @@
+"""
+测试公共夹具：每个测试使用独立的临时数据库文件，不启动后台线程
+"""
+import pytest
+
+from app import create_app
+from app.config import TestingConfig
+from app.utils.database import close_pools
+
+
+def make_config(db_path, **overrides):
+    """基于 TestingConfig 生成指定数据库路径的配置类"""
+    attrs = {'DATABASE_PATH': str(db_path), **overrides}
+    return type('TestConfig', (TestingConfig,), attrs)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / 'test.db'
+
+
+@pytest.fixture
+def app(db_path):
+    app = create_app(make_config(db_path))
+    yield app
+    close_pools()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
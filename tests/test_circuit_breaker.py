@@ -0,0 +1,130 @@
+"""
+熔断器状态转换，以及 Node-RED 采集对熔断计数的影响
+"""
+import time
+
+import pytest
+import requests
+
+from app.services import node_red_service
+from app.services.node_red_service import NodeRedService
+from app.utils.circuit_breaker import (
+    STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, CircuitBreaker, CircuitOpenError
+)
+
+
+def _breaker(**kwargs):
+    params = {'failure_threshold': 2, 'base_backoff_s': 0.05, 'max_backoff_s': 0.2}
+    params.update(kwargs)
+    return CircuitBreaker('test', **params)
+
+
+def test_trips_after_consecutive_failures():
+    breaker = _breaker()
+    breaker.record_failure('timeout')
+    breaker.record_success()
+    breaker.record_failure('timeout')
+    assert breaker.state == STATE_CLOSED
+
+    breaker.record_failure('timeout')
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    assert breaker.get_state()['stats']['trips'] == 1
+
+
+def test_half_open_allows_single_probe_and_closes_on_success():
+    breaker = _breaker(failure_threshold=1)
+    breaker.record_failure('timeout')
+    time.sleep(0.06)
+
+    assert breaker.allow()
+    assert breaker.state == STATE_HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.get_state()['trips'][-1]['closed_at'] is not None
+
+
+def test_failed_probe_doubles_backoff():
+    breaker = _breaker(failure_threshold=1)
+    breaker.record_failure('timeout')
+    time.sleep(0.06)
+    assert breaker.allow()
+
+    breaker.record_failure('timeout')
+    state = breaker.get_state()
+    assert state['state'] == STATE_OPEN
+    assert state['backoff_s'] == 0.1
+    assert state['trips'][-1]['probes_failed'] == 1
+    assert state['stats']['trips'] == 1
+
+
+class _Response:
+    def __init__(self, status_code=200, body=None):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        if self._body is None:
+            raise ValueError('not json')
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f'{self.status_code}', response=self)
+
+
+class _Client:
+    def __init__(self, get=None, post=None, error=None):
+        self._get = get or _Response()
+        self._post = post or _Response()
+        self._error = error
+
+    def get(self, url, **kwargs):
+        if self._error:
+            raise self._error
+        return self._get
+
+    def post(self, url, **kwargs):
+        if self._error:
+            raise self._error
+        return self._post
+
+
+@pytest.fixture
+def fetch(app, monkeypatch):
+    breaker = _breaker(failure_threshold=2, base_backoff_s=10)
+    monkeypatch.setattr(node_red_service, '_breaker', breaker)
+
+    def run(client, times=3):
+        monkeypatch.setattr(node_red_service, 'get_http_client', lambda: client)
+        with app.app_context():
+            return [NodeRedService._fetch_data('http://node-red/data') for _ in range(times)]
+
+    run.breaker = breaker
+    return run
+
+
+def test_non_json_post_fallback_counts_as_reachable(fetch):
+    assert fetch(_Client(post=_Response(200, None))) == [None, None, None]
+    assert fetch.breaker.state == STATE_CLOSED
+
+
+def test_connection_errors_trip_fetch_breaker(fetch):
+    fetch(_Client(error=requests.exceptions.ConnectionError('refused')))
+    assert fetch.breaker.state == STATE_OPEN
+
+
+def test_server_errors_trip_but_client_errors_do_not(fetch):
+    fetch(_Client(post=_Response(404)))
+    assert fetch.breaker.state == STATE_CLOSED
+    fetch(_Client(post=_Response(503)))
+    assert fetch.breaker.state == STATE_OPEN
+
+
+def test_fetch_learns_values(fetch):
+    values = fetch(_Client(get=_Response(200, {'values': {'speed': 1}})), times=1)
+    assert values == [{'speed': 1}]
@@ -0,0 +1,97 @@
+"""
+命令调度：同一地址的设定值合并，不可合并命令作为屏障保持执行顺序
+"""
+import time
+
+import pytest
+
+from app.services.command_dispatcher import (
+    STATUS_SUCCESS, STATUS_SUPERSEDED, CommandDispatcher, CommandTracker, PendingCommand
+)
+from app.services.node_red_service import NodeRedService
+
+
+@pytest.fixture
+def dispatch(app, monkeypatch):
+    sent = []
+
+    def fake_send(command, params=None, **kwargs):
+        sent.append((command, params))
+        return {'success': True, 'command': command}
+
+    monkeypatch.setattr(NodeRedService, 'send_command_to_node_red', staticmethod(fake_send))
+    monkeypatch.setattr(NodeRedService, 'complete_command_log', staticmethod(lambda *args, **kwargs: None))
+    tracker = CommandTracker()
+    dispatcher = CommandDispatcher(app, tracker, coalesce_commands=['set_speed_rpm'], coalesce_window_ms=100)
+
+    def run(commands):
+        entries = []
+        with app.app_context():
+            for log_id, (command, params) in enumerate(commands, start=1):
+                entry = PendingCommand(log_id, command, params)
+                tracker.add(entry)
+                assert dispatcher.enqueue(entry)
+                entries.append(entry)
+        dispatcher.start()
+        try:
+            for entry in entries:
+                assert tracker.wait(entry.log_id, 5).done
+        finally:
+            dispatcher.stop()
+        return entries
+
+    run.sent = sent
+    run.dispatcher = dispatcher
+    return run
+
+
+def test_setpoints_on_same_address_are_coalesced(dispatch):
+    entries = dispatch([('set_speed_rpm', {'value': v}) for v in (100, 200, 300)])
+
+    assert dispatch.sent == [('set_speed_rpm', {'value': 300})]
+    assert [e.status for e in entries] == [STATUS_SUPERSEDED, STATUS_SUPERSEDED, STATUS_SUCCESS]
+    assert [e.superseded_by for e in entries[:2]] == [2, 3]
+    assert dispatch.dispatcher.get_stats()['suppressed'] == 2
+
+
+def test_barrier_keeps_order_and_prevents_coalescing(dispatch):
+    entries = dispatch([
+        ('set_speed_rpm', {'value': 100}),
+        ('start', {}),
+        ('set_speed_rpm', {'value': 200}),
+        ('set_speed_rpm', {'value': 300}),
+    ])
+
+    assert dispatch.sent == [
+        ('set_speed_rpm', {'value': 100}),
+        ('start', {}),
+        ('set_speed_rpm', {'value': 300}),
+    ]
+    assert [e.status for e in entries] == [STATUS_SUCCESS, STATUS_SUCCESS, STATUS_SUPERSEDED, STATUS_SUCCESS]
+
+
+
+def test_barrier_is_not_delayed_by_hold_window(app, monkeypatch):
+    sent = []
+    monkeypatch.setattr(NodeRedService, 'send_command_to_node_red',
+                        staticmethod(lambda command, params=None, **kwargs: sent.append(command) or {'success': True}))
+    monkeypatch.setattr(NodeRedService, 'complete_command_log', staticmethod(lambda *args, **kwargs: None))
+    tracker = CommandTracker()
+    dispatcher = CommandDispatcher(app, tracker, coalesce_commands=['set_speed_rpm', 'set_load_level'],
+                                   coalesce_window_ms=2000)
+    dispatcher.start()
+    try:
+        with app.app_context():
+            for log_id, command in enumerate(['set_speed_rpm', 'set_load_level', 'start'], start=1):
+                entry = PendingCommand(log_id, command, {})
+                tracker.add(entry)
+                assert dispatcher.enqueue(entry)
+        started = time.monotonic()
+        assert tracker.wait(3, 5).done
+        elapsed = time.monotonic() - started
+    finally:
+        dispatcher.stop()
+
+    # 屏障命令不等待合并窗口：之前的设定值立即按顺序放出，随后发送屏障命令
+    assert sent == ['set_speed_rpm', 'set_load_level', 'start']
+    assert elapsed < 1.0
@@ -0,0 +1,59 @@
+"""
+命令日志：主键按段预留，插入与状态更新经写队列提交，先后顺序不影响结果
+"""
+import sqlite3
+
+from app.services import ingest_writer
+from app.services.node_red_service import NodeRedService, _COMMAND_LOG_INSERT
+from app.utils.database import execute_transaction, reserve_ids
+
+
+def test_reserved_blocks_do_not_overlap_other_writers(app, db_path):
+    app.config['COMMAND_LOG_ID_BLOCK'] = 10
+    with app.app_context():
+        first = NodeRedService.create_command_log('start', {'speed': 1})
+        # 其他进程预留的段与直接自增插入的行都落在本进程的段之外
+        other_first = reserve_ids('command_logs', 10, str(db_path))
+        conn = sqlite3.connect(str(db_path))
+        cursor = conn.execute("INSERT INTO command_logs (command, status) VALUES ('other', 'pending')")
+        direct_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        second = NodeRedService.create_command_log('stop')
+
+    assert first > 0
+    assert second == first + 1
+    assert other_first == first + 10
+    assert direct_id == other_first + 10
+
+
+def test_complete_after_create_through_writer(app, monkeypatch):
+    writer = ingest_writer.IngestWriter(app.config['DATABASE_PATH'], flush_interval_ms=50)
+    monkeypatch.setattr(ingest_writer, '_writer', writer)
+    writer.start()
+    with app.app_context():
+        log_id = NodeRedService.create_command_log('start', {'speed': 1})
+        NodeRedService.complete_command_log(log_id, {'success': True}, True, command='start', params={'speed': 1})
+        writer.stop()
+        log = NodeRedService.get_command_log(log_id)
+
+    assert log['status'] == 'success'
+    assert log['command'] == 'start'
+
+
+def test_complete_committed_before_create(app):
+    # 写队列满时的直接写入可能让状态更新先于插入提交
+    with app.app_context():
+        log_id = 4242
+        NodeRedService.complete_command_log(log_id, {'success': True}, True, command='start')
+        execute_transaction([(_COMMAND_LOG_INSERT, [(log_id, 'start', None, None, 'pending')])])
+        log = NodeRedService.get_command_log(log_id)
+
+    assert log['status'] == 'success'
+
+
+def test_create_with_final_status(app):
+    with app.app_context():
+        log_id = NodeRedService.create_command_log('estop', None, {'success': False}, 'failed')
+        log = NodeRedService.get_command_log(log_id)
+    assert log['status'] == 'failed'
@@ -0,0 +1,94 @@
+"""
+读接口条件请求：ETag/304 往返，写入后失效，读取失败不带 ETag
+"""
+import sqlite3
+
+from app.models import hysteresis
+from app.models.measurement import MeasurementModel
+
+
+def _save_curve(client, ts):
+    points = [{'angle': float(i), 'torque': float(i) / 2} for i in range(5)]
+    response = client.post('/api/data/hysteresis?durable=true', json={'points': points, 'timestamp': ts})
+    assert response.status_code == 200
+
+
+def test_hysteresis_etag_round_trip(client):
+    _save_curve(client, 1000)
+    first = client.get('/api/data/hysteresis')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert first.get_json()['count'] == 5
+
+    cached = client.get('/api/data/hysteresis', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.headers['ETag'] == etag
+
+    # JSON 与二进制表示的 ETag 不同
+    binary = client.get('/api/data/hysteresis', headers={'Accept': 'application/octet-stream',
+                                                          'If-None-Match': etag})
+    assert binary.status_code == 200
+    assert binary.headers['ETag'] != etag
+
+    _save_curve(client, 2000)
+    changed = client.get('/api/data/hysteresis', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_hysteresis_read_error_is_not_cached(client, monkeypatch):
+    def broken(*args, **kwargs):
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(hysteresis, 'execute_query', broken)
+    for headers in ({}, {'Accept': 'application/octet-stream'}):
+        response = client.get('/api/data/hysteresis', headers=headers)
+        assert response.status_code == 500
+        assert 'ETag' not in response.headers
+
+
+def test_stats_etag_round_trip(client):
+    first = client.get('/api/data/stats')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert client.get('/api/data/stats', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_stats_error_is_not_cached(client, monkeypatch):
+    def broken(*args, **kwargs):
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(hysteresis, 'execute_query', broken)
+    response = client.get('/api/data/stats')
+    assert 'error' in response.get_json()
+    assert 'ETag' not in response.headers
+
+
+def test_history_etag_is_per_series(app, client):
+    with app.app_context():
+        MeasurementModel.save_measurements({'speed': 1.0, 'torque': 2.0}, timestamp=1000)
+    url = '/api/data/history/speed?start_time=0&end_time=10000'
+    first = client.get(url)
+    etag = first.headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    # 其他测量项的写入不影响本序列的缓存
+    with app.app_context():
+        MeasurementModel.save_measurements({'torque': 3.0}, timestamp=2000)
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    with app.app_context():
+        MeasurementModel.save_measurements({'speed': 1.0}, timestamp=3000)
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 200
+
+
+
+def test_history_etag_includes_resolved_range(client, monkeypatch):
+    from app.api import data
+    clock = iter([100_000, 100_000, 200_000, 200_000, 300_000, 300_000])
+    monkeypatch.setattr(data, 'now_ms', lambda: next(clock, 400_000))
+    first = client.get('/api/data/history/speed?start_time=0')
+    # 缺省 end 为当前时间：时间推移后同一 URL 的 ETag 不同，不会返回旧窗口的 304
+    later = client.get('/api/data/history/speed?start_time=0', headers={'If-None-Match': first.headers['ETag']})
+    assert later.status_code == 200
+    assert later.headers['ETag'] != first.headers['ETag']
@@ -0,0 +1,134 @@
+"""
+入库写线程：组提交、失败重试与失败回调、停止时的剩余请求
+"""
+import sqlite3
+import threading
+
+import pytest
+
+from app.services import ingest_writer
+from app.services.ingest_writer import IngestWriter
+from app.utils.database import close_pools
+
+INSERT = ('INSERT INTO t (x) VALUES (?)', [(1,)])
+BAD = ('INSERT INTO missing (x) VALUES (?)', [(1,)])
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / 'writer.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE t (x INTEGER)')
+    conn.close()
+    yield path
+    close_pools()
+
+
+@pytest.fixture
+def writer(db):
+    writer = IngestWriter(db, flush_rows=1000, flush_interval_ms=50)
+    writer.start()
+    yield writer
+    writer.stop()
+
+
+def _count(db):
+    conn = sqlite3.connect(db)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM t').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_requests_are_group_committed(db, writer):
+    committed = []
+    for i in range(20):
+        writer.submit([INSERT], on_commit=lambda i=i: committed.append(i))
+    writer.submit([INSERT], wait=True, timeout=5)
+
+    assert _count(db) == 21
+    assert sorted(committed) == list(range(20))
+    stats = writer.get_stats()
+    assert stats['requests'] == 21
+    assert stats['commits'] < 21
+
+
+def test_failed_request_is_retried_alone_and_reported(db, writer):
+    committed, errors = [], []
+    writer.submit([INSERT], on_commit=lambda: committed.append('good'))
+    writer.submit([BAD], on_commit=lambda: committed.append('bad'), on_error=errors.append)
+    writer.submit([INSERT], wait=True, timeout=5)
+
+    assert _count(db) == 2
+    assert committed == ['good']
+    assert len(errors) == 1 and isinstance(errors[0], sqlite3.OperationalError)
+    stats = writer.get_stats()
+    assert stats['failed_requests'] == 1
+    assert 'missing' in stats['last_error']
+
+
+def test_durable_failure_raises(writer):
+    with pytest.raises(sqlite3.OperationalError):
+        writer.submit([BAD], wait=True, timeout=5)
+
+
+def test_stop_flushes_pending_requests(db):
+    writer = IngestWriter(db, flush_rows=1000, flush_interval_ms=10000)
+    writer.start()
+    for _ in range(5):
+        writer.submit([INSERT])
+    writer.stop()
+
+    assert _count(db) == 5
+    assert writer.get_stats()['flush_reasons']['shutdown'] == 1
+
+
+def test_stop_timeout_fails_unwritten_requests(db, monkeypatch):
+    release = threading.Event()
+    entered = threading.Event()
+    real_execute = ingest_writer.execute_transaction
+
+    def blocked(statements, db_path=None):
+        entered.set()
+        release.wait(5)
+        return real_execute(statements, db_path)
+
+    monkeypatch.setattr(ingest_writer, 'execute_transaction', blocked)
+    writer = IngestWriter(db, max_queue=2, flush_rows=1, flush_interval_ms=10, put_timeout=0.05)
+    writer.start()
+    committed, errors = [], []
+    writer.submit([INSERT], on_commit=lambda: committed.append(1))
+    assert entered.wait(5)
+    writer.submit([INSERT], on_commit=lambda: committed.append(2), on_error=errors.append)
+    writer.submit([INSERT], on_commit=lambda: committed.append(3), on_error=errors.append)
+
+    writer.stop(timeout=0.1)
+    assert len(errors) == 2
+    assert writer.get_stats()['abandoned_requests'] == 2
+
+    release.set()
+    writer._thread.join(5)
+    assert committed == [1]
+    assert _count(db) == 1
+
+
+def test_submit_while_stopping_writes_directly(db, writer):
+    writer._stop.set()
+    committed = []
+    writer.submit([INSERT], on_commit=lambda: committed.append(1))
+    assert committed == [1]
+    assert _count(db) == 1
+    assert writer.get_stats()['direct_writes'] == 1
+
+
+def test_timed_out_durable_request_is_cancelled(db):
+    writer = IngestWriter(db, flush_rows=1000, flush_interval_ms=50)
+    # 写线程尚未启动：请求留在队列中直到等待超时
+    with pytest.raises(TimeoutError):
+        writer.submit([INSERT], wait=True, timeout=0.05)
+    writer.start()
+    writer.submit([INSERT], wait=True, timeout=5)
+    writer.stop()
+
+    assert _count(db) == 1
+    assert writer.get_stats()['cancelled_requests'] == 1
@@ -0,0 +1,79 @@
+"""
+测量数据写入：样本、最新值与时间桶汇总保持一致
+"""
+import sqlite3
+
+from app.models.measurement import MeasurementModel
+from app.utils.database import execute_query
+
+
+def _rollup(key, resolution_ms=60_000):
+    return execute_query(
+        'SELECT count, value_sum, value_min, value_max FROM measurement_rollups '
+        'WHERE key = ? AND resolution_ms = ?',
+        (key, resolution_ms), fetch_all=True
+    )
+
+
+def test_duplicate_timestamp_is_not_double_counted(app):
+    with app.app_context():
+        MeasurementModel.save_measurements({'speed': 10.0}, timestamp=5000)
+        MeasurementModel.save_measurements({'speed': 99.0}, timestamp=5000)
+        MeasurementModel.save_measurements({'speed': 20.0}, timestamp=5500)
+
+        rollup = _rollup('speed')
+        samples = execute_query('SELECT ts, value FROM samples ORDER BY ts', fetch_all=True)
+        latest = MeasurementModel.get_latest_measurements(['speed'])
+
+    assert [tuple(row) for row in rollup] == [(2, 30.0, 10.0, 20.0)]
+    assert [tuple(row) for row in samples] == [(5000, 10.0), (5500, 20.0)]
+    assert latest['speed']['value'] == 20.0
+
+
+def test_rollups_cover_all_resolutions(app):
+    with app.app_context():
+        for i in range(3):
+            MeasurementModel.save_measurements({'torque': float(i)}, timestamp=60_000 + i * 1000)
+        per_second = _rollup('torque', 1000)
+        per_minute = _rollup('torque', 60_000)
+        per_hour = _rollup('torque', 3_600_000)
+
+    assert per_second == []
+    assert [tuple(row) for row in per_minute] == [(3, 3.0, 0.0, 2.0)]
+    assert [tuple(row) for row in per_hour] == [(3, 3.0, 0.0, 2.0)]
+
+
+def test_failed_async_commit_is_reported_and_not_versioned(app, monkeypatch):
+    from app.services import ingest_writer
+    from app.utils import data_version
+
+    def broken(statements, db_path=None):
+        raise sqlite3.OperationalError('disk I/O error')
+
+    writer = ingest_writer.IngestWriter(app.config['DATABASE_PATH'], flush_interval_ms=10)
+    monkeypatch.setattr(ingest_writer, '_writer', writer)
+    monkeypatch.setattr(ingest_writer, 'execute_transaction', broken)
+    writer.start()
+    errors = []
+    before = data_version.version(data_version.DATASET_MEASUREMENTS)
+    with app.app_context():
+        assert MeasurementModel.save_measurements({'speed': 1.0}, on_error=errors.append) == 1
+    writer.stop()
+
+    assert len(errors) == 1
+    assert data_version.version(data_version.DATASET_MEASUREMENTS) == before
+
+
+def test_sample_count_is_clamped_to_range(app):
+    with app.app_context():
+        for ts in range(3_400_000, 7_300_000, 7_000):
+            MeasurementModel.save_measurements({'load': 1.0}, timestamp=ts)
+        for start, end in ((3_590_000, 3_610_000), (3_450_123, 7_212_345), (3_600_000, 7_199_999), (0, 10_000_000)):
+            expected = execute_query('SELECT COUNT(*) AS cnt FROM samples WHERE ts BETWEEN ? AND ?',
+                                     (start, end), fetch_one=True)['cnt']
+            assert MeasurementModel._count_samples('load', start, end) == expected
+
+        # 区间外的同一小时内数据不计入估算：原始点数在预算内时返回原始数据
+        series = MeasurementModel.get_measurement_series('load', 3_590_000, 3_610_000, max_points=5)
+    assert series['resolution_ms'] == 0
+    assert series['count'] == 3
@@ -0,0 +1,159 @@
+"""
+旧版表结构迁移：measurements -> series/samples，hysteresis_points -> curves
+"""
+import sqlite3
+
+import pytest
+
+from app import create_app
+from app.utils import curve_codec
+from app.utils.database import close_pools
+from tests.conftest import make_config
+
+BASELINE_SCHEMA = '''
+    CREATE TABLE measurements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts INTEGER NOT NULL,
+        key TEXT NOT NULL,
+        addr TEXT,
+        value REAL,
+        unit TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX idx_measurements_key_ts ON measurements(key, ts);
+    CREATE TABLE hysteresis_points (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts INTEGER NOT NULL,
+        angle REAL NOT NULL,
+        torque REAL NOT NULL,
+        curve_type TEXT DEFAULT 'hysteresis',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+'''
+
+
+def _make_baseline_db(path, keys=('speed', 'torque'), rows_per_key=50):
+    conn = sqlite3.connect(str(path))
+    conn.executescript(BASELINE_SCHEMA)
+    for key in keys:
+        conn.executemany(
+            'INSERT INTO measurements (ts, key, addr, value, unit) VALUES (?, ?, ?, ?, ?)',
+            [(1000 + i, key, f'D{i % 3}', float(i), 'u') for i in range(rows_per_key)]
+        )
+    for ts, curve_type in ((100, 'hysteresis'), (100, 'forward'), (200, 'hysteresis')):
+        conn.executemany(
+            'INSERT INTO hysteresis_points (ts, angle, torque, curve_type) VALUES (?, ?, ?, ?)',
+            [(ts, float(i), float(-i), curve_type) for i in range(10)]
+        )
+    conn.commit()
+    conn.close()
+
+
+def _query(path, sql):
+    conn = sqlite3.connect(str(path))
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def _tables(path):
+    return {row[0] for row in _query(path, "SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+@pytest.fixture(autouse=True)
+def _close_pools():
+    yield
+    close_pools()
+
+
+def test_migrates_baseline_tables(db_path):
+    _make_baseline_db(db_path)
+    create_app(make_config(db_path))
+
+    assert 'measurements' not in _tables(db_path)
+    assert _query(db_path, 'SELECT key, addr FROM series ORDER BY key') == [('speed', 'D1'), ('torque', 'D1')]
+    assert _query(db_path, 'SELECT COUNT(*) FROM samples') == [(100,)]
+    assert _query(db_path, "SELECT ts, value FROM latest_measurements WHERE key = 'speed'") == [(1049, 49.0)]
+    assert _query(db_path, 'SELECT SUM(count) FROM measurement_rollups WHERE resolution_ms = 60000') == [(100,)]
+
+    assert _query(db_path, 'SELECT COUNT(*) FROM hysteresis_points') == [(0,)]
+    curves = _query(db_path, 'SELECT ts, curve_type, point_count FROM curves ORDER BY ts, curve_type')
+    assert curves == [(100, 'forward', 10), (100, 'hysteresis', 10), (200, 'hysteresis', 10)]
+
+
+def test_measurement_migration_failure_rolls_back_and_aborts_startup(db_path, monkeypatch):
+    _make_baseline_db(db_path)
+    from app.utils import database
+
+    def broken(conn):
+        conn.execute("INSERT INTO series (key) VALUES ('partial')")
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(database, '_migrate_measurements_to_samples', broken)
+    with pytest.raises(RuntimeError):
+        create_app(make_config(db_path))
+
+    # 回填与部分写入全部回滚，旧表保留
+    assert 'measurements' in _tables(db_path)
+    assert _query(db_path, 'SELECT COUNT(*) FROM series') == [(0,)]
+    assert _query(db_path, 'SELECT COUNT(*) FROM latest_measurements') == [(0,)]
+    assert _query(db_path, 'SELECT COUNT(*) FROM measurement_rollups') == [(0,)]
+
+    # 修复后重启重新迁移
+    monkeypatch.undo()
+    close_pools()
+    create_app(make_config(db_path))
+    assert 'measurements' not in _tables(db_path)
+    assert _query(db_path, 'SELECT COUNT(*) FROM samples') == [(100,)]
+
+
+def test_curve_migration_failure_leaves_no_partial_curves(db_path, monkeypatch):
+    _make_baseline_db(db_path)
+    calls = {'n': 0}
+    real_pack = curve_codec.pack_floats
+
+    def flaky_pack(values, dtype=curve_codec.DTYPE_FLOAT64):
+        calls['n'] += 1
+        if calls['n'] > 2:
+            raise RuntimeError('boom')
+        return real_pack(values, dtype)
+
+    monkeypatch.setattr(curve_codec, 'pack_floats', flaky_pack)
+    with pytest.raises(RuntimeError):
+        create_app(make_config(db_path))
+    assert _query(db_path, 'SELECT COUNT(*) FROM curves') == [(0,)]
+    assert _query(db_path, 'SELECT COUNT(*) FROM hysteresis_points') == [(30,)]
+
+    monkeypatch.undo()
+    close_pools()
+    create_app(make_config(db_path))
+    assert _query(db_path, 'SELECT COUNT(*) FROM curves') == [(3,)]
+    assert _query(db_path, 'SELECT COUNT(*) FROM hysteresis_points') == [(0,)]
+
+
+def test_curve_migration_resumes_after_partial_commit(db_path):
+    """早期版本迁移失败时可能已提交部分曲线：已存在的分组跳过，其余继续迁移"""
+    _make_baseline_db(db_path)
+    create_app(make_config(db_path))
+    close_pools()
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("DELETE FROM curves WHERE ts = 200")
+    conn.executemany(
+        'INSERT INTO hysteresis_points (ts, angle, torque, curve_type) VALUES (?, ?, ?, ?)',
+        [(ts, 1.0, 2.0, curve_type) for ts, curve_type in ((100, 'hysteresis'), (200, 'hysteresis'))]
+    )
+    conn.commit()
+    conn.close()
+
+    create_app(make_config(db_path))
+    curves = _query(db_path, 'SELECT ts, curve_type, point_count FROM curves ORDER BY ts, curve_type')
+    assert curves == [(100, 'forward', 10), (100, 'hysteresis', 10), (200, 'hysteresis', 1)]
+
+
+def test_series_migration_is_linear(db_path):
+    """每个键只取最后一行的 addr/unit，不随行数二次增长"""
+    _make_baseline_db(db_path, keys=[f'k{i}' for i in range(20)], rows_per_key=4000)
+    create_app(make_config(db_path))
+    assert _query(db_path, 'SELECT COUNT(*) FROM series') == [(20,)]
+    assert _query(db_path, 'SELECT COUNT(*) FROM samples') == [(80000,)]
@@ -0,0 +1,51 @@
+"""
+寄存器块合并与批量写入结果
+"""
+from app.services.node_red_service import NodeRedService, _register_blocks
+
+
+def test_contiguous_addresses_merge_into_blocks():
+    blocks, shadowed = _register_blocks([
+        ('b', 'D3002', 2), ('a', 'd3001', 1), ('c', 'D3004', 4), ('x', 'M10', 9), ('raw', 'tag/1', 5)
+    ])
+    assert shadowed == {}
+    assert [(b['addr'], b['count'], b['values'], b['names']) for b in blocks] == [
+        ('D3001', 2, [1, 2], ['a', 'b']),
+        ('D3004', 1, [4], ['c']),
+        ('M10', 1, [9], ['x']),
+        ('tag/1', 1, [5], ['raw']),
+    ]
+
+
+def test_duplicate_address_keeps_last_and_reports_shadowed():
+    blocks, shadowed = _register_blocks([
+        ('first', 'D3001', 1), ('next', 'D3002', 2), ('second', ' d3001 ', 3), ('t1', 'tag', 4), ('t2', 'tag', 5)
+    ])
+    assert shadowed == {'first': 'D3001', 't1': 'tag'}
+    assert [(b['addr'], b['values'], b['names']) for b in blocks] == [
+        ('D3001', [3, 2], ['second', 'next']),
+        ('tag', [5], ['t2']),
+    ]
+
+
+def test_write_registers_reports_duplicate_address(app, monkeypatch):
+    sent = []
+
+    def fake_send(command, params=None, **kwargs):
+        sent.append(params)
+        return {'success': True, 'response': {'results': {'D3002': False}}}
+
+    monkeypatch.setattr(NodeRedService, 'send_command_to_node_red', staticmethod(fake_send))
+    monkeypatch.setattr(NodeRedService, 'log_command', staticmethod(lambda *args, **kwargs: None))
+    with app.app_context():
+        summary = NodeRedService.write_registers({
+            'speed': ('D3001', 10), 'torque': ('D3002', 20), 'load': ('D3001', 30)
+        })
+
+    assert sent[0]['blocks'][0]['values'] == [30, 20]
+    assert summary['success'] is False
+    assert summary['results'] == {
+        'load': {'addr': 'D3001', 'status': 'success'},
+        'torque': {'addr': 'D3002', 'status': 'failed', 'error': '写入失败'},
+        'speed': {'addr': 'D3001', 'status': 'failed', 'error': 'duplicate_address'},
+    }
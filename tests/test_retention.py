@@ -0,0 +1,52 @@
+"""
+数据保留：试验记录按引用保护删除，覆盖天数不作用于永久保留的策略，清理接口校验参数
+"""
+import sqlite3
+
+from app.models.hysteresis import HysteresisModel
+from app.services.retention_service import RetentionEngine, build_default_policies
+from app.utils.helpers import now_ms
+
+
+def _query(db_path, sql):
+    conn = sqlite3.connect(str(db_path))
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def test_referenced_test_runs_are_kept(app, db_path):
+    conn = sqlite3.connect(str(db_path))
+    conn.execute('INSERT INTO test_runs (id, ts) VALUES (1, 1000), (2, 2000)')
+    # 旧试验记录仍被较新的曲线引用
+    conn.execute("INSERT INTO curves (run_id, ts, curve_type, dtype, point_count, angles, torques) "
+                 "VALUES (1, ?, 'hysteresis', 'f8', 0, x'', x'')", (now_ms(),))
+    conn.commit()
+    conn.close()
+
+    with app.app_context():
+        HysteresisModel.delete_old_hysteresis_data(days=1)
+
+    assert _query(db_path, 'SELECT id FROM test_runs') == [(1,)]
+
+
+def test_days_override_skips_keep_forever_policies(app, db_path):
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("INSERT INTO measurement_rollups (key, resolution_ms, bucket_ts, count, value_sum, value_min, "
+                 "value_max, value_last, last_ts) VALUES ('speed', 3600000, 0, 1, 1, 1, 1, 1, 0)")
+    conn.commit()
+    conn.close()
+
+    engine = RetentionEngine(str(db_path), build_default_policies(app.config), pause_ms=0)
+    report = engine.run(days_override=1)
+
+    assert report['policies']['rollups_1h']['skipped'] is True
+    assert _query(db_path, 'SELECT COUNT(*) FROM measurement_rollups') == [(1,)]
+
+
+def test_cleanup_rejects_invalid_days(client):
+    for days in ('abc', 0, -3, [1]):
+        response = client.post('/api/data/retention', json={'days': days})
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'invalid_days'
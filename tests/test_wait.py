@@ -0,0 +1,21 @@
+"""
+长轮询变化通知
+"""
+from app.models.measurement import MeasurementModel
+
+
+def test_wait_returns_changed_keys_only(app, client):
+    first = client.get('/api/data/wait?keys=speed,torque').get_json()
+    assert first['reset'] is True
+    # 测试配置不启动采样线程：客户端应退回周期轮询
+    assert first['writer_active'] is False
+
+    idle = client.get(f"/api/data/wait?since={first['version']}&timeout=0").get_json()
+    assert idle['changed'] is False and idle['reset'] is False
+
+    with app.app_context():
+        MeasurementModel.save_measurements({'speed': 12.5, 'noise': 1.0})
+    changed = client.get(f"/api/data/wait?since={idle['version']}&timeout=1&keys=speed,torque").get_json()
+    assert changed['changed'] is True
+    assert list(changed['measurements']) == ['speed']
+    assert changed['measurements']['speed']['value'] == 12.5